@@ -1,58 +1,103 @@
 import streamlit as st
-import boto3
 import pandas as pd
 from io import BytesIO
-from datetime import datetime, timedelta
+from datetime import datetime
 import pytz
 import re
-from config import cargar_configuracion
+import os
+import json
+import zipfile
+import threading
+import time
+import random
+from numbers import Number
+from concurrent.futures import ThreadPoolExecutor
+from config import cargar_configuracion, cargar_opciones
+from error_log import ErrorSink, current_error_sink, notify
+from parquet_output import parquet_available, parquet_key, dataframe_to_parquet
+from workbook_reader import open_workbook
+from parallel_sheets import should_process_in_parallel, map_sheets_in_pool
+from objetivos import OBJETIVO_COLUMNS, parse_objetivos
+from storage import open_storage, StorageKeyNotFound, StoragePreconditionFailed
+from csv_objects import write_csv_object, read_csv_object
+from s3_client import get_s3_client, client_stats
+from upload_cache import workbook_hash, session_prepared_cache, PreparedCache
+from current_view import update_current_view
+from compaction import list_upload_keys
+from background_uploads import list_pending_keys
+from ingest_queue import IngestQueue, IngestWorkers
+from object_cache import open_object_cache, cached_frame
+from metrics import (UploadMetrics, stage, merge_stages, set_upload_status, append_metrics_record, read_metrics_records,
+                     metrics_key, slowest_uploads, uploads_table, stages_table, requests_table)
+from form_rules import FORM_ROWS, TABLERO_RULES
 
 # Cargar configuración
 aws_access_key, aws_secret_key, region_name, bucket_name, valid_user, valid_password = cargar_configuracion()
+opciones = cargar_opciones()
 
-# Configuración de AWS S3
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key,
-    region_name=region_name
-)
+# Configuración del almacenamiento (S3 o una carpeta local, según la opción "almacenamiento").
+# El cliente de S3 se crea en el primer pedido y se comparte entre sesiones (ver s3_client.py)
+storage = open_storage(opciones, bucket_name, lambda: get_s3_client(aws_access_key, aws_secret_key, region_name, opciones))
 
-# Función para cargar un archivo en S3
-def upload_file_to_s3(file, filename, original_filename):
+# Cache en disco de los tableros ya leídos (al reconstruir índices y en los reportes se vuelven a leer los mismos)
+object_cache = open_object_cache(opciones)
+
+# Función para guardar un DataFrame como CSV en S3 (en streaming y comprimido con gzip si está activado)
+def upload_csv_to_s3(df, filename, original_filename, metadata=None):
     try:
-        s3.upload_fileobj(file, bucket_name, filename)
-        st.success(f"Archivo '{original_filename}' subido exitosamente.")
+        write_csv_object(storage, filename, df, compress=opciones["comprimir_csv"], metadata=metadata)
+        notify("success", f"Archivo '{original_filename}' subido exitosamente.")
+        return True
     except Exception as e:
-        st.error(f"Error al subir el archivo: {e}")
+        notify("error", f"Error al subir el archivo: {e}")
+        return False
 
-# Función para guardar errores en un archivo log en S3
-def log_error_to_s3(error_message, filename):
+# Función para guardar una copia tipada en Parquet, particionada por período y sucursal
+def upload_parquet_to_s3(df, dataset, original_filename, upload_stamp):
+    if not opciones["escribir_parquet"]:
+        return False
+    if not parquet_available():
+        notify("warning", "La salida Parquet está activada pero pyarrow no está instalado; solo se guardó el CSV.")
+        return False
     try:
-        log_filename = "Errores.txt"
-        now = datetime.now()
-        log_entry = pd.DataFrame([{
-            "Fecha": now.strftime('%Y-%m-%d'),
-            "Hora": now.strftime('%H:%M'),
-            "Error": error_message,
-            "NombreArchivo": filename
-        }])
-        
-        # Descargar el archivo log existente si existe
-        try:
-            log_obj = s3.get_object(Bucket=bucket_name, Key=log_filename)
-            log_df = pd.read_csv(BytesIO(log_obj['Body'].read()))
-            log_df = pd.concat([log_df, log_entry], ignore_index=True)
-        except s3.exceptions.NoSuchKey:
-            log_df = log_entry  # Crear un nuevo DataFrame si no existe el archivo
-
-        # Subir el archivo log actualizado
-        csv_buffer = BytesIO()
-        log_df.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-        csv_buffer.seek(0)
-        s3.put_object(Bucket=bucket_name, Key=log_filename, Body=csv_buffer.getvalue())
+        fecha, sucursal = extract_date_and_sucursal(original_filename)
+        key = parquet_key(dataset, fecha, sucursal, f"{upload_stamp}_{original_filename.split('.')[0]}")
+        body = dataframe_to_parquet(df, {'Fecha Horario Subida': '%d/%m/%Y_%H:%M:%S'})
+        storage.put(key, body, content_type="application/vnd.apache.parquet")
+        return True
+    except Exception as e:
+        error_message = f"Error al guardar la copia Parquet de '{original_filename}': {e}"
+        notify("error", error_message)
+        log_error_to_s3(error_message, original_filename)
+        return False
+
+# Función para guardar un lote de errores como un objeto nuevo en S3
+def write_error_log(key, log_df):
+    try:
+        write_csv_object(storage, key, log_df, compress=opciones["comprimir_csv"])
     except Exception as e:
-        st.error(f"Error al guardar el log en S3: {e}")
+        notify("error", f"Error al guardar el log en S3: {e}")
+
+# Función para guardar el registro de métricas de una carga (JSONL local y, si está activado, en el almacenamiento)
+def write_metrics(record):
+    append_metrics_record(opciones["metricas_archivo"], record)
+    if opciones["metricas_en_almacenamiento"]:
+        body = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")
+        storage.put(metrics_key(datetime.now()), body, content_type="application/json")
+
+# Métricas de una carga (tiempo y memoria por etapa, pedidos al almacenamiento); con save=False no se guardan
+def upload_metrics(original_filename, save=True):
+    writer = write_metrics if save and opciones["registrar_metricas"] else None
+    return UploadMetrics(original_filename, "tableros", writer, opciones["medir_memoria"])
+
+# Función para registrar un error (se acumula en la carga en curso y se guarda una sola vez al final)
+def log_error_to_s3(error_message, filename):
+    sink = current_error_sink()
+    if sink is not None:
+        sink.add(error_message, filename)
+        return
+    with ErrorSink(write_error_log) as sink:
+        sink.add(error_message, filename)
 
 # Verificar formato del nombre del archivo
 def validate_filename(filename):
@@ -87,7 +132,7 @@ def validate_file_date(filename):
 
         return False
     except Exception as e:
-        st.error(f"Error al validar la fecha del archivo: {e}")
+        notify("error", f"Error al validar la fecha del archivo: {e}")
         return False
 
 # Extraer el nombre del líder del archivo
@@ -107,65 +152,32 @@ def extract_date_and_sucursal(filename):
     except IndexError:
         return None, None
 
-# Verificar celdas del formulario
-def validate_form_cells(sheet_data, sheet_name, filename):
-    try:
-        required_cells = ['B1', 'B2', 'B3', 'B4']
-        for cell in required_cells:
-            if pd.isna(sheet_data.at[int(cell[1])-1, 1]):
-                error_message = f"Error: La celda {cell} en la hoja '{sheet_name}' está vacía."
-                st.error(error_message)
-                log_error_to_s3(error_message, filename)
-                return False
-
-        cuil = str(sheet_data.at[1, 1])
-        if not re.match(r"^\d{11}$", cuil):
-            error_message = f"Error: La celda B2 en la hoja '{sheet_name}' debe contener 11 números."
-            st.error(error_message)
-            log_error_to_s3(error_message, filename)
-            return False
-
-        # Validar que los campos de comisiones y horas extra sean números o nulos
-        comisiones_accesorias = sheet_data.at[0, 10]
-        hs_extras_50 = sheet_data.at[1, 10]
-        hs_extras_100 = sheet_data.at[2, 10]
-        incentivo_productividad = sheet_data.at[3, 10]
-        ajuste_incentivo = sheet_data.at[4, 10]
-
-        if not (pd.isna(comisiones_accesorias) or (isinstance(comisiones_accesorias, (int, float)) and float(comisiones_accesorias).is_integer())):
-            error_message = f"Error: La celda K1 en la hoja '{sheet_name}' debe contener un número entero."
-            st.error(error_message)
+# Función para mostrar y registrar juntos todos los errores de formulario de un informe {hoja: [errores]}
+def report_form_errors(report, filename):
+    for errors in report.values():
+        for error_message in errors:
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
-            return False
-
-        if not (pd.isna(hs_extras_50) or isinstance(hs_extras_50, (int, float))):
-            error_message = f"Error: La celda K2 en la hoja '{sheet_name}' debe contener solo números."
-            st.error(error_message)
-            log_error_to_s3(error_message, filename)
-            return False
-
-        if not (pd.isna(hs_extras_100) or isinstance(hs_extras_100, (int, float))):
-            error_message = f"Error: La celda K3 en la hoja '{sheet_name}' debe contener solo números."
-            st.error(error_message)
-            log_error_to_s3(error_message, filename)
-            return False
-
-        if not (pd.isna(incentivo_productividad) or (isinstance(incentivo_productividad, (int, float)) and float(incentivo_productividad).is_integer())):
-            error_message = f"Error: La celda K4 en la hoja '{sheet_name}' debe contener un número entero."
-            st.error(error_message)
-            log_error_to_s3(error_message, filename)
-            return False
-
-        if not (pd.isna(ajuste_incentivo) or (isinstance(ajuste_incentivo, (int, float)) and float(ajuste_incentivo).is_integer())):
-            error_message = f"Error: La celda K5 en la hoja '{sheet_name}' debe contener un número entero."
-            st.error(error_message)
-            log_error_to_s3(error_message, filename)
-            return False
+    return not report
 
-        return True
+# Verificar celdas del formulario de una hoja (informa todos los errores de la hoja)
+def validate_form_cells(sheet_data, sheet_name, filename):
+    try:
+        return report_form_errors(TABLERO_RULES.validate({sheet_name: sheet_data}), filename)
     except Exception as e:
         error_message = f"Error al validar las celdas del formulario en la hoja '{sheet_name}': {e}"
-        st.error(error_message)
+        notify("error", error_message)
+        log_error_to_s3(error_message, filename)
+        return False
+
+# Verificar celdas del formulario de todas las hojas en una sola pasada (informa todos los errores juntos)
+def validate_all_form_cells(excel_data, filename):
+    try:
+        forms = {sheet_name: excel_data.parse(sheet_name, header=None, nrows=FORM_ROWS) for sheet_name in excel_data.sheet_names}
+        return report_form_errors(TABLERO_RULES.validate(forms), filename)
+    except Exception as e:
+        error_message = f"Error al validar las celdas del formulario: {e}"
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
 
@@ -186,7 +198,7 @@ def validate_required_columns(data):
 def validate_ponderacion(data, filename):
     if (data['Ponderacion'] == 0).any():
         error_message = "Error: Existen filas con Ponderacion 0%."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -196,7 +208,7 @@ def validate_ponderacion_sum(data, filename, sheet_name):
     ponderacion_sum = data['Ponderacion'].sum()
     if not (0.99 <= ponderacion_sum <= 1.1):
         error_message = f"Error: La suma de la columna Ponderacion en la hoja '{sheet_name}' es {ponderacion_sum * 100:.2f}%, no es 100%."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -205,7 +217,7 @@ def validate_ponderacion_sum(data, filename, sheet_name):
 def verify_sheet_structure(sheet_data, sheet_name, filename):
     if sheet_data.empty or sheet_data.shape[1] < 1:
         error_message = f"Error: La hoja '{sheet_name}' está vacía o no tiene suficientes columnas."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -233,7 +245,7 @@ def count_rows_until_empty(data, column_name="Indicadores de Gestion"):
         relevant_rows = data.iloc[header_index + 1:, 2]
         return relevant_rows.isna().idxmax() - (header_index + 1)
     except Exception as e:
-        st.error(f"Error contando filas hasta vacío: {e}")
+        notify("error", f"Error contando filas hasta vacío: {e}")
         return 0
 
 # Función para limpiar y reestructurar datos
@@ -244,7 +256,7 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
 
         if rows_to_process == 0:
             error_message = "Error: No se encontraron filas válidas después del encabezado."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame()
 
@@ -271,61 +283,21 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
         valid_columns, missing_columns = validate_required_columns(data)
         if not valid_columns:
             error_message = f"Error: Faltan las siguientes columnas requeridas: {', '.join(missing_columns)}"
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame()
 
-        # Validar que los objetivos sean numéricos (entero, decimal o porcentaje)
-        objetivo_cols = [
-            'Objetivo Aceptable (70%)',
-            'Objetivo Muy Bueno (90%)',
-            'Objetivo Excelente (120%)'
-        ]
-        for col in objetivo_cols:
-            # Intentar convertir a numérico, si falla o hay texto, marcar error
-            def is_valid_objetivo(x):
-                if pd.isna(x) or isinstance(x, (int, float)):
-                    return True
-                if isinstance(x, str):
-                    return bool(re.match(r"^\s*-?\d+(\.\d+)?\s*%?\s*$", x))
-                return False
-            invalid_mask = ~data[col].apply(is_valid_objetivo)
-            if invalid_mask.any():
+        # Validar que los objetivos sean numéricos (entero, decimal o porcentaje) y convertirlos a float
+        parsed_objetivos, invalid_objetivos = parse_objetivos(data)
+        for col in OBJETIVO_COLUMNS:
+            if invalid_objetivos[col].any():
                 error_message = (f"Error: La columna '{col}' contiene valores no numéricos o texto en la hoja '{sheet_name}'.")
-                st.error(error_message)
-                log_error_to_s3(error_message, filename)
-                return pd.DataFrame()
-            # Convertir strings con % o números a float
-            def parse_objetivo(val):
-                if pd.isna(val):
-                    return val
-                if isinstance(val, (int, float)):
-                    return float(val)
-                if isinstance(val, str):
-                    val = val.strip().replace(",", ".")
-                    if val.endswith("%"):
-                        try:
-                            return float(val.rstrip("%").strip()) / 100
-                        except:
-                            return None
-                    try:
-                        return float(val)
-                    except:
-                        return None
-                return None
-            data[col] = data[col].apply(parse_objetivo)
-            # Si después de convertir hay algún valor que NO sea numérico y NO sea nulo, es error
-            if not data[col].dropna().apply(lambda x: isinstance(x, float)).all():
-                error_message = (f"Error: La columna '{col}' contiene valores no numéricos válidos en la hoja '{sheet_name}'.")
-                st.error(error_message)
+                notify("error", error_message)
                 log_error_to_s3(error_message, filename)
                 return pd.DataFrame()
+        data[OBJETIVO_COLUMNS] = parsed_objetivos
 
-        if not validate_ponderacion(data, filename):
-            return pd.DataFrame()
-
-        if not validate_ponderacion_sum(data, filename, sheet_name):
-            return pd.DataFrame()
+        # Las ponderaciones y fechas se validan después, con todas las hojas juntas (validate_workbook_rows)
 
         data['Cargo'] = cargo
         data['CUIL'] = cuil
@@ -352,48 +324,133 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
         return data[desired_columns]
     except Exception as e:
         error_message = f"Error al limpiar y reestructurar: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return pd.DataFrame()
 
-# Función para verificar si hay CUILs repetidos en diferentes hojas
-def validate_unique_cuils(dataframes):
-    cuils = []
-    for df in dataframes:
-        cuils.extend(df['CUIL'].unique())
-    if len(cuils) != len(set(cuils)):
+# Función para verificar si hay CUILs repetidos en diferentes hojas (data: todas las hojas juntas, indexadas por "Hoja")
+def validate_unique_cuils(data):
+    cuils = pd.DataFrame({'Hoja': data.index.get_level_values('Hoja'), 'CUIL': data['CUIL'].to_numpy()}).drop_duplicates()
+    return not cuils['CUIL'].duplicated().any()
+
+# Función para encontrar, en una sola pasada sobre todas las hojas juntas, las hojas con ponderaciones o fechas de
+# actualización inválidas. Devuelve esas hojas y la columna de fechas ya convertida
+def sheets_failing_validation(data):
+    argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
+    today = pd.to_datetime(datetime.now(argentina_tz).strftime('%Y-%m-%d'))
+    hojas = data.index.get_level_values('Hoja')
+
+    ponderacion = data['Ponderacion']
+    valores = pd.to_numeric(ponderacion, errors='coerce')
+    # Con un valor no numérico la suma de la hoja falla: esas hojas se revisan con validate_sheet_rows
+    no_numericas = pd.Series(False, index=data.index)
+    if not pd.api.types.is_numeric_dtype(ponderacion):
+        no_numericas = ponderacion.notna() & ~ponderacion.map(lambda value: isinstance(value, Number))
+    fuera_de_rango = ~valores.groupby(hojas, sort=False).sum().between(0.99, 1.1)
+
+    fechas = pd.to_datetime(data['Ultima Fecha de Actualización'], format='%d/%m/%Y', errors='coerce')
+    filas_invalidas = no_numericas | (valores == 0) | fechas.isna() | (fechas > today)
+    invalidas = filas_invalidas.groupby(hojas, sort=False).any() | fuera_de_rango
+    return set(invalidas[invalidas].index), fechas
+
+# Función para validar ponderaciones y fechas de una sola hoja, con los mensajes de siempre.
+# Solo se usa con las hojas que sheets_failing_validation encontró con errores
+def validate_sheet_rows(data, sheet_name, filename):
+    try:
+        if not validate_ponderacion(data, filename) or not validate_ponderacion_sum(data, filename, sheet_name):
+            return False
+    except Exception as e:
+        error_message = f"Error al limpiar y reestructurar: {e}"
+        notify("error", error_message)
+        log_error_to_s3(error_message, filename)
         return False
-    return True
+    return validate_update_dates(data, filename, sheet_name)
 
-# Función para procesar hojas del Excel
-def process_sheets_until_empty(excel_data, filename, upload_datetime):
-    final_data = pd.DataFrame()
+# Función para procesar una hoja del Excel (devuelve los datos de la hoja y si es válida)
+def process_sheet(excel_data, sheet_name, filename, upload_datetime):
     leader_name = extract_leader_name(filename)
     fecha, sucursal = extract_date_and_sucursal(filename)
-    dataframes = []
-    for sheet_name in excel_data.sheet_names:
+    with stage("lectura", sheet_name):
         sheet_data = excel_data.parse(sheet_name, header=None)
-        if not verify_sheet_structure(sheet_data, sheet_name, filename):
+    if not verify_sheet_structure(sheet_data, sheet_name, filename):
+        return pd.DataFrame(), False  # Return empty DataFrame and error state
+    # El formulario ya se validó para todas las hojas en validate_all_form_cells
+    cargo, cuil, segmento, area_influencia, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo = extract_data_from_form(sheet_data)
+    if cargo and cuil and segmento and area_influencia:
+        with stage("reestructura", sheet_name):
+            processed_data = clean_and_restructure_until_empty(sheet_data, cargo, cuil, segmento, area_influencia, leader_name, fecha, sucursal, filename, upload_datetime, sheet_name, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo)
+        if processed_data.empty:
             return pd.DataFrame(), False  # Return empty DataFrame and error state
-        if not validate_form_cells(sheet_data, sheet_name, filename):
+        return processed_data, True
+    return pd.DataFrame(), True  # Hoja sin formulario completo: se omite
+
+# Función para recorrer las hojas procesadas; con muchas hojas se reparten en un pool de procesos.
+# Devuelve (hoja, resultado, errores, mensajes) sin mostrar los mensajes: se muestran al validar el archivo completo
+def iter_processed_sheets(excel_data, filename, upload_datetime):
+    sheet_names = list(excel_data.sheet_names)
+    if should_process_in_parallel(len(sheet_names), opciones):
+        try:
+            results = map_sheets_in_pool(process_sheet, excel_data, sheet_names, (filename, upload_datetime), opciones["procesos_hojas"])
+        except Exception:
+            results = None  # Si el pool falla se procesa en forma secuencial
+        if results is not None:
+            for sheet_name, (result, errors, displayed, stages) in zip(sheet_names, results):
+                merge_stages(stages)
+                yield sheet_name, result, errors, displayed
+            return
+    for sheet_name in sheet_names:
+        with ErrorSink(None, quiet=True) as sink:
+            result = process_sheet(excel_data, sheet_name, filename, upload_datetime)
+        yield sheet_name, result, sink.messages(), sink.displayed
+        if not result[-1]:
+            return
+
+# Función para mostrar y registrar los mensajes guardados de una hoja
+def replay_sheet_messages(errors, displayed, filename):
+    for kind, message in displayed:
+        notify(kind, message)
+    for error_message in errors:
+        log_error_to_s3(error_message, filename)
+
+# Función para procesar hojas del Excel. Cada hoja se reestructura por separado y después se validan todas juntas
+# (ponderaciones, fechas y CUILs) sobre un único DataFrame; los mensajes salen en el mismo orden que hoja por hoja
+def process_sheets_until_empty(excel_data, filename, upload_datetime):
+    with stage("formulario"):
+        forms_ok = validate_all_form_cells(excel_data, filename)
+    if not forms_ok:
+        return pd.DataFrame(), False  # Return empty DataFrame and error state
+
+    sheets = list(iter_processed_sheets(excel_data, filename, upload_datetime))
+    frames = {sheet_name: result[0] for sheet_name, result, _, _ in sheets if result[-1] and not result[0].empty}
+    if not frames:
+        for _, result, errors, displayed in sheets:
+            replay_sheet_messages(errors, displayed, filename)
+        return pd.DataFrame(), all(result[-1] for _, result, _, _ in sheets)
+
+    data = pd.concat(frames, names=['Hoja', None])
+    with stage("validacion"):
+        try:
+            failing, fechas = sheets_failing_validation(data)
+        except Exception:
+            failing, fechas = set(frames), None  # Se valida hoja por hoja
+
+    for sheet_name, result, errors, displayed in sheets:
+        replay_sheet_messages(errors, displayed, filename)
+        if not result[-1]:
             return pd.DataFrame(), False  # Return empty DataFrame and error state
-        cargo, cuil, segmento, area_influencia, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo = extract_data_from_form(sheet_data)
-        if cargo and cuil and segmento and area_influencia:
-            processed_data = clean_and_restructure_until_empty(sheet_data, cargo, cuil, segmento, area_influencia, leader_name, fecha, sucursal, filename, upload_datetime, sheet_name, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo)
-            if processed_data.empty:
-                return pd.DataFrame(), False  # Return empty DataFrame and error state
-            if not validate_update_dates(processed_data, filename, sheet_name):
-                return pd.DataFrame(), False  # Return empty DataFrame and error state
-            dataframes.append(processed_data)
-            final_data = pd.concat([final_data, processed_data], ignore_index=True)
-    
-    if not validate_unique_cuils(dataframes):
+        if sheet_name in failing and not validate_sheet_rows(data.loc[sheet_name].copy(), sheet_name, filename):
+            return pd.DataFrame(), False  # Return empty DataFrame and error state
+
+    if not validate_unique_cuils(data):
         error_message = "Error: Existen CUILs repetidos en diferentes hojas del archivo."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return pd.DataFrame(), False  # Return empty DataFrame and error state
 
-    return final_data, True  # Return DataFrame and success state
+    if fechas is None:
+        fechas = pd.to_datetime(data['Ultima Fecha de Actualización'], format='%d/%m/%Y', errors='coerce')
+    data['Ultima Fecha de Actualización'] = fechas
+    return data.reset_index(drop=True), True  # Return DataFrame and success state
 
 # Función para determinar si el tablero es "Ajuste" o "Normal"
 def determine_tablero_type(fecha, upload_datetime):
@@ -433,14 +490,14 @@ def validate_update_dates(data, filename, sheet_name):
         # Verificar si la columna existe
         if 'Ultima Fecha de Actualización' not in data.columns:
             error_message = f"Error: La columna 'Ultima Fecha de Actualización' no existe en la hoja '{sheet_name}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
         # Verificar valores nulos
         if data['Ultima Fecha de Actualización'].isna().any():
             error_message = f"Error: Existen valores nulos en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
@@ -450,7 +507,7 @@ def validate_update_dates(data, filename, sheet_name):
         )
         if data['Ultima Fecha de Actualización'].isna().any():
             error_message = f"Error: Existen valores en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}' que no tienen el formato de fecha válido (%d/%m/%Y)."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
@@ -458,125 +515,544 @@ def validate_update_dates(data, filename, sheet_name):
         invalid_dates = data[data['Ultima Fecha de Actualización'] > now]
         if not invalid_dates.empty:
             error_message = f"Error: Existen fechas en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}' que son posteriores a la fecha actual."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
         return True
     except Exception as e:
         error_message = f"Error al validar las fechas en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}': {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
 
-# Función para verificar duplicados en S3
-def check_for_duplicates(cuil, fecha, leader_name):
+# Clave del índice de CUILs de un período (fuera del prefijo del período para no mezclarse con los tableros)
+def cuil_index_key(fecha_carpeta):
+    return f"indices/cuils/{fecha_carpeta}.json"
+
+# Veces que se reintenta la escritura del índice cuando otra carga lo cambió al mismo tiempo
+CUIL_INDEX_ATTEMPTS = 8
+CUIL_INDEX_RETRY_WAIT = 0.05
+
+# Función para leer el índice de CUILs de un período y su ETag. El índice es {"fuentes": [claves de los tableros
+# incluidos], "ignorados": [claves que no se pudieron leer], "cuils": {CUIL: {...}}} y tiene "desactualizado": True
+# si falló su actualización después de una subida. Devuelve None si no existe o si es de la versión anterior (sin "fuentes")
+def load_cuil_index(fecha_carpeta):
+    try:
+        body, etag = storage.get_with_etag(cuil_index_key(fecha_carpeta))
+    except StorageKeyNotFound:
+        return None, None
+    index = json.loads(body.decode("utf-8"))
+    if "fuentes" not in index or "cuils" not in index:
+        return None, etag
+    index.setdefault("ignorados", [])
+    return index, etag
+
+# Indica si hay que volver a armar el índice recorriendo el período (no existe o quedó marcado como desactualizado)
+def cuil_index_needs_scan(index):
+    return index is None or index.get("desactualizado", False)
+
+# Función para guardar el índice si sigue siendo la versión leída (etag=None: solo si no existe).
+# Si otra carga lo cambió se lanza StoragePreconditionFailed
+def save_cuil_index(fecha_carpeta, index, etag):
+    body = json.dumps(index, ensure_ascii=False).encode("utf-8")
+    storage.put_if(cuil_index_key(fecha_carpeta), body, etag, content_type="application/json")
+
+# Función para registrar en el índice los CUILs de un tablero (CUIL -> líder, archivo, fecha de subida).
+# Las claves empiezan con la fecha de subida: un tablero no pisa a un CUIL que ya viene de una subida posterior
+def add_to_cuil_index(index, df, source_key):
+    if source_key not in index["fuentes"]:
+        index["fuentes"].append(source_key)
+    if df.empty or 'CUIL' not in df.columns or 'Nombre Lider' not in df.columns:
+        return index
+    subida = df['Fecha Horario Subida'] if 'Fecha Horario Subida' in df.columns else pd.Series(None, index=df.index)
+    registros = pd.DataFrame({'CUIL': df['CUIL'].astype(str), 'Nombre Lider': df['Nombre Lider'], 'Subida': subida})
+    for cuil, lider, fecha_subida in registros.drop_duplicates('CUIL').itertuples(index=False):
+        existing = index["cuils"].get(cuil)
+        if existing is not None and existing["archivo"] > source_key:
+            continue
+        index["cuils"][cuil] = {
+            "lider": lider,
+            "archivo": source_key,
+            "subida": None if pd.isna(fecha_subida) else str(fecha_subida)
+        }
+    return index
+
+# Columnas de un tablero que usa el índice de CUILs
+CUIL_INDEX_COLUMNS = ['CUIL', 'Nombre Lider', 'Fecha Horario Subida']
+
+# Función para decodificar de un tablero solo las columnas del índice de CUILs
+def decode_cuil_index_columns(body):
+    return read_csv_object(body, usecols=lambda col: col in CUIL_INDEX_COLUMNS, dtype={'CUIL': str})
+
+# Limita los recorridos completos de un período que se hacen a la vez (a fin de mes se reconstruyen varios juntos)
+_scan_slots = threading.BoundedSemaphore(max(1, opciones["escaneos_simultaneos"]))
+
+# Función para armar el índice de CUILs recorriendo todos los tableros del período (sin los de cargas sin confirmar)
+def scan_cuil_index(fecha_carpeta):
+    index = {"fuentes": [], "ignorados": [], "cuils": {}}
+    with stage("espera_escaneo"):
+        _scan_slots.acquire()
+    try:
+        pending = list_pending_keys(storage)
+        for obj in storage.list(f"{fecha_carpeta}/"):
+            obj_key = obj['Key']
+            if not obj_key.endswith('.csv') or obj_key in pending:
+                continue
+            try:
+                df = cached_frame(object_cache, storage, obj_key, "indice_cuils", decode_cuil_index_columns, etag=obj['ETag'])
+            except Exception:
+                # Si el archivo no es un CSV válido, lo ignora (queda anotado para no tomar el índice como incompleto)
+                index["ignorados"].append(obj_key)
+                continue
+            add_to_cuil_index(index, df, obj_key)
+    finally:
+        _scan_slots.release()
+    return index
+
+# Función para reconstruir el índice de CUILs de un período. Devuelve {CUIL: {...}}
+def rebuild_cuil_index(fecha_carpeta, save=True):
+    index = scan_cuil_index(fecha_carpeta)
+    if save:
+        modify_cuil_index(fecha_carpeta, lambda current: merge_cuil_indexes(index, current), rebuild=False)
+    return index["cuils"]
+
+# Función para juntar en index lo que tiene other (por ejemplo, una subida registrada durante un recorrido)
+def merge_cuil_indexes(index, other):
+    if other is None:
+        return index
+    for lista in ("fuentes", "ignorados"):
+        conocidas = set(index[lista])
+        index[lista].extend(key for key in other.get(lista, []) if key not in conocidas)
+    for cuil, entry in other["cuils"].items():
+        existing = index["cuils"].get(cuil)
+        if existing is None or entry["archivo"] > existing["archivo"]:
+            index["cuils"][cuil] = entry
+    return index
+
+# Función para cambiar el índice con una escritura condicional: change(index) devuelve el índice nuevo a partir
+# del guardado (None si no existe y rebuild=False). Si otra carga lo escribió en el medio se vuelve a leer y se reintenta
+def modify_cuil_index(fecha_carpeta, change, rebuild=True):
+    for attempt in range(CUIL_INDEX_ATTEMPTS):
+        index, etag = load_cuil_index(fecha_carpeta)
+        if cuil_index_needs_scan(index) and rebuild:
+            # Período sin índice (o con uno anterior a "fuentes", o desactualizado): se arma con todos sus tableros
+            index = merge_cuil_indexes(scan_cuil_index(fecha_carpeta), index)
+        index = change(index)
+        try:
+            save_cuil_index(fecha_carpeta, index, etag)
+            return index
+        except StoragePreconditionFailed:
+            # Otra carga actualizó el índice: se espera un poco (al azar, para no volver a chocar) y se lee la versión nueva
+            time.sleep(random.uniform(0, CUIL_INDEX_RETRY_WAIT * 2 ** attempt))
+    raise RuntimeError(f"No se pudo actualizar el índice '{cuil_index_key(fecha_carpeta)}' después de {CUIL_INDEX_ATTEMPTS} intentos.")
+
+# Función para actualizar el índice del período después de una subida exitosa. Si no se puede, el índice queda
+# marcado como desactualizado y la próxima verificación de duplicados lo vuelve a armar
+def update_cuil_index(fecha_carpeta, df, source_key):
+    try:
+        modify_cuil_index(fecha_carpeta, lambda index: add_to_cuil_index(index, df, source_key))
+    except Exception as e:
+        notify("error", f"Error al actualizar el índice de CUILs: {e}")
+        mark_cuil_index_stale(fecha_carpeta)
+
+# Función para marcar el índice de un período como desactualizado. Se escribe sin condición: lo que tenía se
+# recupera al recorrer el período
+def mark_cuil_index_stale(fecha_carpeta):
+    try:
+        body = json.dumps({"fuentes": [], "ignorados": [], "cuils": {}, "desactualizado": True}).encode("utf-8")
+        storage.put(cuil_index_key(fecha_carpeta), body, content_type="application/json")
+    except Exception as e:
+        notify("error", f"Error al marcar el índice de CUILs como desactualizado: {e}")
+
+# Función para obtener el índice de CUILs de un período con un solo pedido. Solo se recorre el período si el índice
+# no existe o quedó marcado como desactualizado
+def current_cuil_index(fecha_carpeta, save=True):
+    index, etag = load_cuil_index(fecha_carpeta)
+    if not cuil_index_needs_scan(index):
+        return index
+    index = merge_cuil_indexes(scan_cuil_index(fecha_carpeta), index)
+    if save:
+        try:
+            save_cuil_index(fecha_carpeta, index, etag)
+        except StoragePreconditionFailed:
+            # Otra carga lo actualizó mientras tanto; se vuelve a verificar en la próxima consulta
+            pass
+    return index
+
+# Función para comparar el índice de un período con los tableros guardados (fuera de las cargas, ver
+# rebuild_cuil_index.py). Devuelve las claves que faltan en el índice; si falta alguna, se reconstruye
+def reconcile_cuil_index(fecha_carpeta):
+    index, _ = load_cuil_index(fecha_carpeta)
+    conocidas = set() if index is None else set(index["fuentes"]) | set(index["ignorados"])
+    faltantes = [key for key in list_upload_keys(storage, fecha_carpeta) if key not in conocidas]
+    if faltantes or cuil_index_needs_scan(index):
+        rebuild_cuil_index(fecha_carpeta)
+    return faltantes
+
+# Función para actualizar la vista de tableros vigentes del período (ver current_view.py)
+def update_tablero_view(fecha_carpeta, df, source_key, original_filename):
+    try:
+        update_current_view(storage, fecha_carpeta, df, source_key, compress=opciones["comprimir_csv"])
+    except Exception as e:
+        error_message = f"Error al actualizar la vista de tableros vigentes: {e}"
+        notify("error", error_message)
+        log_error_to_s3(error_message, original_filename)
+
+# Clave del registro de un Excel ya subido, por hash de su contenido
+def upload_hash_key(content_hash):
+    return f"indices/hashes/{content_hash}.json"
+
+# Función para buscar si este mismo archivo (mismos bytes y mismo nombre) ya se subió. Devuelve el registro o None
+def find_previous_upload(content_hash, original_filename):
+    try:
+        entry = json.loads(storage.get(upload_hash_key(content_hash)).decode("utf-8"))
+    except StorageKeyNotFound:
+        return None
+    except Exception as e:
+        notify("error", f"Error al buscar cargas anteriores del archivo: {e}")
+        return None
+    return entry if entry.get("archivo") == original_filename else None
+
+# Función para registrar el hash del Excel subido (archivo, clave del CSV y fecha de subida)
+def record_upload_hash(content_hash, original_filename, csv_key, subida):
+    try:
+        entry = {"archivo": original_filename, "clave": csv_key, "subida": subida}
+        storage.put(upload_hash_key(content_hash), json.dumps(entry, ensure_ascii=False).encode("utf-8"), content_type="application/json")
+    except Exception as e:
+        notify("error", f"Error al registrar el hash del archivo: {e}")
+
+# Función para verificar duplicados en S3 (con save_index=False no se escribe nada, por ejemplo en una validación de prueba)
+def check_for_duplicates(cuil, fecha, leader_name, save_index=True):
     try:
         cuil = str(cuil)
-        # Normalizar la fecha a "01-MM-YYYY" para buscar en la carpeta correcta
+        # Normalizar la fecha a "01-MM-YYYY" para buscar el índice del período correcto
         fecha_carpeta = normalize_fecha_to_first_day(fecha)
-        prefix = f"{fecha_carpeta}/"
-        response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                obj_key = obj['Key']
-                obj_data = s3.get_object(Bucket=bucket_name, Key=obj_key)
-                try:
-                    df = pd.read_csv(BytesIO(obj_data['Body'].read()))
-                except Exception:
-                    # Si el archivo no es un CSV válido, lo ignora
-                    continue
-                if df.empty or 'CUIL' not in df.columns or 'Fecha_Nombre_Archivo' not in df.columns:
-                    continue
-                df['CUIL'] = df['CUIL'].astype(str)
-                df['Fecha_Nombre_Archivo'] = df['Fecha_Nombre_Archivo'].astype(str)
-                if not df.empty and df['CUIL'].str.contains(cuil).any() and df['Fecha_Nombre_Archivo'].str.contains(fecha).any():
-                    existing_leader = df.loc[df['CUIL'] == cuil, 'Nombre Lider'].values[0]
-                    if existing_leader != leader_name:
-                        return True, existing_leader, cuil  # Block upload if the leader is different
+        index = current_cuil_index(fecha_carpeta, save=save_index)
+        entry = index["cuils"].get(cuil)
+        if entry and entry["lider"] != leader_name:
+            return True, entry["lider"], cuil  # Block upload if the leader is different
         return False, None, None
     except Exception as e:
-        st.error(f"Error al verificar duplicados en S3: {e}")
+        notify("error", f"Error al verificar duplicados en S3: {e}")
         return False, None, None
 
-# Función para procesar y subir el Excel
-def process_and_upload_excel(file, original_filename):
+# Estados posibles de un archivo procesado
+ESTADOS_CARGA = {
+    "error": "Con errores",
+    "duplicado": "Duplicado",
+    "validado": "Validado",
+    "ajuste_pendiente": "Ajuste pendiente",
+    "subido": "Subido",
+    "repetido": "Ya subido",
+    "en cola": "En cola",
+    "procesando": "Procesando",
+    "descartado": "Descartado",
+}
+
+# Función para validar y procesar un archivo sin subirlo (valida, verifica duplicados y clasifica el tablero).
+# Devuelve un diccionario con el estado y, si es válido, el DataFrame listo para guardar
+def prepare_excel(file, original_filename, dry_run=False, content_hash=None):
+    result = {"archivo": original_filename, "estado": "error", "datos": None, "tipo": None, "subida": None, "clave": None}
     try:
-        if not validate_filename(original_filename):
+        # Un archivo idéntico al que ya se subió no se vuelve a procesar ni a guardar
+        with stage("archivo_repetido"):
+            result["hash"] = content_hash or workbook_hash(file)
+            previous = find_previous_upload(result["hash"], original_filename)
+        if previous is not None:
+            notify("warning", f"El archivo '{original_filename}' ya se subió el {previous['subida']} ({previous['clave']}). No se vuelve a cargar.")
+            result.update({"estado": "repetido", "clave": previous["clave"]})
+            return result
+
+        with stage("validar_nombre"):
+            filename_ok = validate_filename(original_filename)
+            date_ok = filename_ok and validate_file_date(original_filename)
+        if not filename_ok:
             error_message = "El nombre del archivo no cumple con el formato requerido (dd-mm-aaaa+empresa+nombre lider.xlsx)."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
+            return result
 
-        if not validate_file_date(original_filename):
+        if not date_ok:
             error_message = "La fecha del nombre del archivo solo puede ser de un mes anterior, o de dos meses atrás (hasta el día 10)."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
+            return result
 
-        excel_data = pd.ExcelFile(file)
+        with stage("abrir_excel"):
+            excel_data = open_workbook(file, opciones["lector_excel"])
         argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
         now = datetime.now(argentina_tz)
         upload_datetime = now.strftime('%d/%m/%Y_%H:%M:%S')
-        cleaned_df, success = process_sheets_until_empty(excel_data, original_filename, upload_datetime)
+        with stage("hojas"):
+            cleaned_df, success = process_sheets_until_empty(excel_data, original_filename, upload_datetime)
 
         if not success:
             error_message = "El archivo contiene errores en su estructura y no se cargará"
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
+            return result
 
         if cleaned_df.empty:
             error_message = "El archivo no tiene datos válidos después de la limpieza."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
+            return result
 
         # Verificar duplicados
         cuil = cleaned_df['CUIL'].iloc[0]
         fecha, _ = extract_date_and_sucursal(original_filename)
         fecha_normalizada = normalize_fecha_to_first_day(fecha)
         leader_name = cleaned_df['Nombre Lider'].iloc[0]
-        is_duplicate, existing_leader, duplicate_cuil = check_for_duplicates(cuil, fecha_normalizada, leader_name)
+        with stage("duplicados"):
+            is_duplicate, existing_leader, duplicate_cuil = check_for_duplicates(cuil, fecha_normalizada, leader_name, save_index=not dry_run)
         if is_duplicate:
             error_message = f"No se puede subir el archivo porque el líder '{existing_leader}' ya lo subió anteriormente. El CUIL duplicado es '{duplicate_cuil}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
-
-        # Contar la cantidad de CUILs únicos
-        unique_cuils_count = cleaned_df['CUIL'].nunique()
-        st.info(f"Se subieron {unique_cuils_count} tableros.")
+            result["estado"] = "duplicado"
+            return result
 
         upload_datetime_obj = datetime.strptime(upload_datetime, '%d/%m/%Y_%H:%M:%S')
         tablero_type = determine_tablero_type(fecha, upload_datetime_obj)
         ajuste_value = "SI" if tablero_type == "Ajuste" else "NO"
         cleaned_df["Ajuste"] = ajuste_value
 
-        if tablero_type == "Ajuste":
-            st.warning("El tablero se va a cargar como ajuste, ¿desea guardarlo igualmente?")
-            guardar = st.button("Guardar")
-            cancelar = st.button("Cancelar")
-            if cancelar:
-                st.info("El archivo no se guardó.")
-                return
-            if not guardar:
-                return
+        result.update({
+            "estado": "ajuste_pendiente" if tablero_type == "Ajuste" else "validado",
+            "datos": cleaned_df,
+            "tipo": tablero_type,
+            "subida": now,
+        })
+        return result
+    except Exception as e:
+        error_message = f"Error al procesar el archivo Excel: {e}"
+        notify("error", error_message)
+        log_error_to_s3(error_message, original_filename)
+        return result
 
+# Función para guardar en S3 un archivo ya validado por prepare_excel
+def upload_prepared(result):
+    original_filename = result["archivo"]
+    cleaned_df = result["datos"]
+    now = result["subida"]
+    try:
         # Extraer la fecha del archivo (ej: "03-04-2025" o "01-04-2025")
         fecha_archivo = original_filename.split('+')[0]
         fecha_carpeta = normalize_fecha_to_first_day(fecha_archivo)
         csv_filename = f"{fecha_carpeta}/{now.strftime('%Y-%m-%d_%H-%M-%S')}_{original_filename.split('.')[0]}.csv"
 
-        csv_buffer = BytesIO()
-        cleaned_df.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-
-        csv_buffer.seek(0)
-        upload_file_to_s3(csv_buffer, csv_filename, original_filename)
+        # El CSV se serializa y se sube en la misma etapa (en streaming)
+        with stage("subida"):
+            uploaded = upload_csv_to_s3(cleaned_df, csv_filename, original_filename, metadata={"sha256": result["hash"]})
+        if uploaded:
+            record_upload_hash(result["hash"], original_filename, csv_filename, now.strftime('%d/%m/%Y %H:%M:%S'))
+            with stage("indice"):
+                update_cuil_index(fecha_carpeta, cleaned_df, csv_filename)
+            with stage("vista"):
+                update_tablero_view(fecha_carpeta, cleaned_df, csv_filename, original_filename)
+            with stage("parquet"):
+                upload_parquet_to_s3(cleaned_df, "tableros", original_filename, now.strftime('%Y-%m-%d_%H-%M-%S'))
+            result["estado"] = "subido"
+            result["clave"] = csv_filename
     except Exception as e:
         error_message = f"Error al procesar el archivo Excel: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, original_filename)
+    return result
+
+# Función para procesar y subir el Excel
+def process_and_upload_excel(file, original_filename):
+    # Todos los errores de esta carga se guardan juntos en un único objeto al terminar
+    with ErrorSink(write_error_log), upload_metrics(original_filename):
+        # Si el mismo archivo ya se validó en una ejecución anterior (por ejemplo, antes de confirmar un Ajuste)
+        # se usa ese resultado en lugar de volver a procesarlo
+        cache = session_prepared_cache(st.session_state, opciones["cache_tableros_mb"] * 1024 * 1024)
+        content_hash = workbook_hash(file)
+        result = cache.get(content_hash, original_filename)
+        if result is None:
+            result = prepare_excel(file, original_filename, content_hash=content_hash)
+            if result["estado"] in ("validado", "ajuste_pendiente"):
+                cache.put(content_hash, original_filename, result)
+        set_upload_status(result["estado"])
+        if result["estado"] not in ("validado", "ajuste_pendiente"):
+            return
+
+        # Contar la cantidad de CUILs únicos
+        unique_cuils_count = result["datos"]['CUIL'].nunique()
+        st.info(f"Se subieron {unique_cuils_count} tableros.")
+
+        if result["estado"] == "ajuste_pendiente":
+            st.warning("El tablero se va a cargar como ajuste, ¿desea guardarlo igualmente?")
+            guardar = st.button("Guardar")
+            cancelar = st.button("Cancelar")
+            if cancelar:
+                cache.discard(content_hash, original_filename)
+                st.info("El archivo no se guardó.")
+                return
+            if not guardar:
+                return
+
+        upload_prepared(result)
+        set_upload_status(result["estado"])
+        if result["estado"] == "subido":
+            cache.discard(content_hash, original_filename)
+
+# Función para obtener los Excel de una carga múltiple (varios .xlsx o un .zip con .xlsx)
+def expand_batch_files(uploaded_files):
+    files = []
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(BytesIO(uploaded_file.getvalue())) as zip_file:
+                for info in zip_file.infolist():
+                    name = os.path.basename(info.filename)
+                    # Se omiten carpetas, archivos temporales de Excel y metadatos de macOS
+                    if info.is_dir() or not name.lower().endswith(".xlsx") or name.startswith("~$") or info.filename.startswith("__MACOSX"):
+                        continue
+                    files.append((name, BytesIO(zip_file.read(info))))
+        else:
+            files.append((uploaded_file.name, BytesIO(uploaded_file.getvalue())))
+    return files
+
+# Función para procesar un archivo del lote de forma aislada: sus mensajes y errores quedan en su propio resultado.
+# Con dry_run=True solo se valida: no se sube el archivo ni se guardan errores o índices
+def process_batch_file(original_filename, file, subir_ajustes=False, dry_run=False):
+    with ErrorSink(None if dry_run else write_error_log, quiet=True) as sink, upload_metrics(original_filename, save=not dry_run):
+        result = prepare_excel(file, original_filename, dry_run=dry_run)
+        if dry_run:
+            pass
+        elif result["estado"] == "validado" or (result["estado"] == "ajuste_pendiente" and subir_ajustes):
+            upload_prepared(result)
+        set_upload_status(result["estado"])
+    result["mensajes"] = [message for kind, message in sink.displayed if kind in ("error", "warning")]
+    return result
+
+# Función para procesar varios archivos con concurrencia acotada (el orden de los resultados es el de los archivos)
+def process_batch(files, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_batch_file, name, file) for name, file in files]
+        results = []
+        for (name, _), future in zip(files, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"archivo": name, "estado": "error", "datos": None, "mensajes": [f"Error al procesar el archivo Excel: {e}"]})
+        return results
+
+# Tableros de la cola que quedaron como ajuste pendiente, ya validados: al confirmarlos se suben sin volver a procesar
+# el Excel (igual que la cache de la sesión en la carga de un archivo). Compartida por los hilos de la cola
+_queued_prepared = PreparedCache(opciones["cache_tableros_mb"] * 1024 * 1024)
+_queued_prepared_lock = threading.Lock()
+
+# Resultado serializable de un archivo de la cola
+def queued_result(result):
+    datos = result.get("datos")
+    return {
+        "estado": result["estado"],
+        "tableros": int(datos['CUIL'].nunique()) if datos is not None else 0,
+        "tipo": result.get("tipo"),
+        "clave": result.get("clave"),
+        "hash": result.get("hash"),
+        "mensajes": result.get("mensajes", []),
+    }
+
+# Función para procesar un Excel de la cola de carga (ver ingest_queue.py). Devuelve un resultado serializable
+def process_queued_workbook(original_filename, contenido, subir_ajustes):
+    result = process_batch_file(original_filename, BytesIO(contenido), subir_ajustes=subir_ajustes)
+    if result["estado"] == "ajuste_pendiente":
+        with _queued_prepared_lock:
+            _queued_prepared.put(result["hash"], original_filename, result)
+    return queued_result(result)
+
+# Función para subir un ajuste de la cola ya confirmado. Si su resultado validado sigue en memoria se sube
+# directamente; si no (se descartó de la cache o lo validó otro proceso) el Excel se vuelve a encolar.
+# Devuelve el id del trabajo con el que sigue la carga
+def confirm_queued_adjustment(workers, job_id, status):
+    resultado = status["resultado"] or {}
+    with _queued_prepared_lock:
+        result = _queued_prepared.get(resultado.get("hash"), status["archivo"])
+        _queued_prepared.discard(resultado.get("hash"), status["archivo"])
+    if result is None:
+        return workers.submit_adjustment(job_id) or job_id
+    with ErrorSink(write_error_log, quiet=True) as sink, upload_metrics(status["archivo"]):
+        upload_prepared(result)
+        set_upload_status(result["estado"])
+    result["mensajes"] = [message for kind, message in sink.displayed if kind in ("error", "warning")]
+    workers.queue.finish(job_id, queued_result(result))
+    return job_id
+
+# Cola de carga y su grupo fijo de hilos (uno por proceso, compartido entre sesiones)
+@st.cache_resource(show_spinner=False)
+def ingest_workers():
+    return IngestWorkers(IngestQueue(opciones["cola_archivo"]), process_queued_workbook, opciones["cola_workers"])
+
+# Función para encolar archivos (nombre, BytesIO) y recordarlos en la sesión
+def enqueue_files(files):
+    workers = ingest_workers()
+    for name, file in files:
+        st.session_state.setdefault("cola_trabajos", []).append(workers.submit(name, file.getvalue()))
+
+# Tabla de estado de los archivos encolados por esta sesión
+def queue_status_table(statuses):
+    rows = []
+    for status in statuses:
+        resultado = status["resultado"] or {}
+        estado = "En cola" if status["posicion"] else ESTADOS_CARGA.get(status["estado"], status["estado"])
+        rows.append({
+            "Archivo": status["archivo"],
+            "Estado": f"{estado} (posición {status['posicion']})" if status["posicion"] else estado,
+            "Tableros": resultado.get("tableros", 0),
+            "Detalle": " | ".join(resultado.get("mensajes", [])),
+        })
+    return pd.DataFrame(rows)
+
+# Estado de los archivos que esta sesión mandó a la cola; se vuelve a consultar cada 2 segundos mientras haya pendientes
+def show_queue_status():
+    workers = ingest_workers()
+    job_ids = st.session_state.get("cola_trabajos", [])
+    statuses = workers.queue.status(job_ids)
+    ordered = [statuses[job_id] for job_id in job_ids if job_id in statuses]
+    if not ordered:
+        return
+    counts = workers.queue.counts()
+    st.caption(f"Cola de carga: {counts.get('en cola', 0)} en espera, {counts.get('procesando', 0)} procesando")
+    st.dataframe(queue_status_table(ordered), hide_index=True, use_container_width=True)
+
+    # Los ajustes no se guardan automáticamente: se confirman todos juntos
+    pendientes = [job_id for job_id in job_ids if statuses.get(job_id, {}).get("estado") == "ajuste_pendiente"]
+    if pendientes:
+        st.warning(f"Hay {len(pendientes)} tableros que se van a cargar como ajuste, ¿desea guardarlos igualmente?")
+        guardar, cancelar = st.columns(2)
+        if guardar.button("Guardar ajustes"):
+            nuevos = {job_id: confirm_queued_adjustment(workers, job_id, statuses[job_id]) for job_id in pendientes}
+            st.session_state["cola_trabajos"] = [nuevos.get(job_id, job_id) for job_id in job_ids]
+            st.rerun()
+        if cancelar.button("Cancelar ajustes"):
+            for job_id in pendientes:
+                workers.queue.discard(job_id)
+                with _queued_prepared_lock:
+                    _queued_prepared.discard((statuses[job_id]["resultado"] or {}).get("hash"), statuses[job_id]["archivo"])
+            st.rerun()
+
+    # Cuando terminan todos se vuelve a dibujar la página para dejar de consultar
+    if st.session_state.get("cola_consultando") and all(s["estado"] not in ("en cola", "procesando") for s in ordered):
+        st.session_state["cola_consultando"] = False
+        st.rerun()
+
+# Función para mostrar el estado de la cola de esta sesión (consultando solo mientras haya archivos sin terminar)
+def queue_status():
+    statuses = ingest_workers().queue.status(st.session_state.get("cola_trabajos", []))
+    st.session_state["cola_consultando"] = any(s["estado"] in ("en cola", "procesando") for s in statuses.values())
+    st.fragment(run_every=2 if st.session_state["cola_consultando"] else None)(show_queue_status)()
+
+# Tabla de estado por archivo de una carga múltiple
+def batch_status_table(results):
+    return pd.DataFrame([{
+        "Archivo": r["archivo"],
+        "Estado": ESTADOS_CARGA[r["estado"]],
+        "Tableros": r["datos"]['CUIL'].nunique() if r.get("datos") is not None else 0,
+        "Detalle": " | ".join(r.get("mensajes", [])),
+    } for r in results])
 
 def normalize_fecha_to_first_day(fecha_str):
     """Convierte cualquier fecha dd-mm-aaaa a 01-mm-aaaa"""
@@ -586,13 +1062,102 @@ def normalize_fecha_to_first_day(fecha_str):
     except Exception:
         return fecha_str  # Si falla, devuelve la original
     
+# Carga múltiple: varios Excel o un .zip procesados en paralelo, con una tabla de estado por archivo
+def batch_upload():
+    uploaded_files = st.file_uploader("Selecciona varios archivos Excel o un .zip", type=["xlsx", "zip"], accept_multiple_files=True)
+
+    if opciones["cola_de_carga"]:
+        if uploaded_files and st.button("Procesar archivos"):
+            enqueue_files(expand_batch_files(uploaded_files))
+        queue_status()
+        return
+
+    if uploaded_files and st.button("Procesar archivos"):
+        files = expand_batch_files(uploaded_files)
+        with st.spinner(f"Procesando {len(files)} archivos..."):
+            st.session_state["lote"] = process_batch(files, opciones["cargas_simultaneas"])
+
+    results = st.session_state.get("lote")
+    if not results:
+        return
+
+    st.dataframe(batch_status_table(results), hide_index=True, use_container_width=True)
+
+    # Los ajustes no se guardan automáticamente: se confirman todos juntos
+    pendientes = [r for r in results if r["estado"] == "ajuste_pendiente"]
+    if pendientes:
+        st.warning(f"Hay {len(pendientes)} tableros que se van a cargar como ajuste, ¿desea guardarlos igualmente?")
+        if st.button("Guardar ajustes"):
+            for result in pendientes:
+                with ErrorSink(write_error_log), upload_metrics(result["archivo"]):
+                    upload_prepared(result)
+                    set_upload_status(result["estado"])
+            st.rerun()
+
+# Función para verificar usuario y contraseña de administrador (listas "users" y "passwords" de la configuración)
+def is_admin(user, password):
+    return any(user == u and password == p for u, p in zip(valid_user or [], valid_password or []))
+
+# Panel de administración: las cargas más lentas de los últimos registros de métricas
+def admin_panel():
+    with st.sidebar.expander("Administración"):
+        user = st.text_input("Usuario", key="admin_user")
+        password = st.text_input("Contraseña", type="password", key="admin_password")
+    if not user or not is_admin(user, password):
+        return
+
+    # Contadores del cliente de S3 compartido desde que arrancó el proceso
+    stats = client_stats.snapshot()
+    pedidos, reintentos, throttles = st.columns(3)
+    pedidos.metric("Pedidos a S3", stats["pedidos"])
+    reintentos.metric("Reintentos", stats["reintentos"])
+    throttles.metric("Limitados (throttling)", stats["throttles"])
+
+    # Cache en disco de los tableros leídos por este proceso
+    if object_cache is not None:
+        cache = object_cache.stats()
+        aciertos, ahorrado, en_disco = st.columns(3)
+        aciertos.metric("Aciertos de la cache", f"{cache['proporcion_aciertos']:.0%}", help=f"{cache['aciertos']} aciertos, {cache['fallos']} fallos")
+        ahorrado.metric("Descargas evitadas (MB)", round(cache["bytes_ahorrados"] / 1024 / 1024, 1))
+        en_disco.metric("Cache en disco (MB)", round(cache["bytes_en_disco"] / 1024 / 1024, 1), help=f"{cache['entradas']} entradas")
+
+    st.header("Cargas más lentas")
+    records = read_metrics_records(opciones["metricas_archivo"])
+    if not records:
+        st.info("Todavía no hay métricas de cargas registradas.")
+        return
+    cantidad = st.slider("Cantidad", min_value=5, max_value=50, value=10)
+    slowest = slowest_uploads(records, cantidad)
+    st.dataframe(uploads_table(slowest), hide_index=True, use_container_width=True)
+
+    elegido = st.selectbox("Detalle de la carga", range(len(slowest)),
+                           format_func=lambda i: f"{slowest[i]['inicio']} - {slowest[i]['archivo']}")
+    st.dataframe(stages_table(slowest[elegido]), hide_index=True, use_container_width=True)
+    st.dataframe(requests_table(slowest[elegido]), hide_index=True, use_container_width=True)
+
 # Función principal de la aplicación
 def main():
     st.title("Gestión de Tableros")
 
+    admin_panel()
+
     st.header("Sube un Tablero")
+    modo = st.radio("Modo de carga", ["Un archivo", "Varios archivos"], horizontal=True)
+
+    if modo == "Varios archivos":
+        batch_upload()
+        return
+
     uploaded_file = st.file_uploader("Selecciona un archivo Excel", type=["xlsx"])
 
+    if opciones["cola_de_carga"]:
+        # Cada archivo elegido se encola una sola vez, aunque la página se vuelva a dibujar
+        if uploaded_file is not None and st.session_state.get("encolado") != uploaded_file.file_id:
+            st.session_state["encolado"] = uploaded_file.file_id
+            enqueue_files([(uploaded_file.name, BytesIO(uploaded_file.getvalue()))])
+        queue_status()
+        return
+
     if uploaded_file is not None:
         process_and_upload_excel(uploaded_file, uploaded_file.name)
 
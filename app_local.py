@@ -1,20 +1,15 @@
 import streamlit as st
-import os
 from datetime import datetime
+from storage import LocalStorage
 
-# Configuración de directorio local
+# Configuración de directorio local (para probar el flujo completo sin bucket usar app.py con almacenamiento = "local")
 UPLOAD_FOLDER = "uploads"
-
-# Crear el directorio local si no existe
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+storage = LocalStorage(UPLOAD_FOLDER)
 
 # Función para guardar archivo localmente
 def save_file_locally(file, filename):
     try:
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        with open(file_path, "wb") as f:
-            f.write(file.getbuffer())
+        storage.put(filename, file.getvalue())
         st.success(f"Archivo '{filename}' guardado exitosamente en '{UPLOAD_FOLDER}'.")
     except Exception as e:
         st.error(f"Error al guardar el archivo: {e}")
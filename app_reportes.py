@@ -0,0 +1,83 @@
+import streamlit as st
+from app import storage, opciones, is_admin, object_cache
+from reporting import recent_periods, list_period_uploads, query_tableros, DEFAULT_COLUMNS
+
+# Página de reportes: consulta de los tableros ya subidos, con acceso restringido a los usuarios de la configuración.
+# Solo se leen los períodos elegidos, las subidas de las sucursales y líderes elegidos y las columnas que se muestran
+# (ver reporting.py). Los listados y resultados se guardan en cache durante "reportes_ttl_segundos" y los tableros
+# ya leídos quedan en la cache en disco (object_cache.py), así que volver a consultarlos no los descarga.
+# Uso: streamlit run app_reportes.py
+
+TTL = opciones["reportes_ttl_segundos"]
+
+# Función para listar las subidas de un período (en cache, así cambiar de filtro no vuelve a listar)
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_period_uploads(periodo):
+    return list_period_uploads(storage, periodo)
+
+# Función para consultar los tableros (en cache por período, filtros y columnas)
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_query(periodos, columnas, filtros, solo_vigentes):
+    entries = [entry for periodo in periodos for entry in cached_period_uploads(periodo)]
+    return query_tableros(storage, entries, list(columnas), dict(filtros), solo_vigentes, opciones["s3_max_conexiones"], object_cache)
+
+# Función para obtener los cargos de las subidas elegidas (solo se lee la columna Cargo)
+@st.cache_data(ttl=TTL, show_spinner=False)
+def cached_cargos(periodos, sucursales, lideres):
+    filtros = (("Sucursal", sucursales), ("Nombre Lider", lideres))
+    df = cached_query(periodos, ("Cargo",), filtros, False)
+    return sorted(df["Cargo"].dropna().unique().tolist())
+
+# Función para pedir usuario y contraseña; devuelve True si son válidos
+def login():
+    if st.session_state.get("reportes_usuario"):
+        return True
+    with st.form("login_reportes"):
+        user = st.text_input("Usuario")
+        password = st.text_input("Contraseña", type="password")
+        ingresar = st.form_submit_button("Ingresar")
+    if ingresar:
+        if is_admin(user, password):
+            st.session_state["reportes_usuario"] = user
+            st.rerun()
+        st.error("Usuario o contraseña incorrectos.")
+    return False
+
+# Función principal de la página
+def main():
+    st.title("Reportes de Tableros")
+    if not login():
+        return
+
+    periodos = st.multiselect("Períodos", recent_periods(24), default=recent_periods(1))
+    if not periodos:
+        st.info("Elegí al menos un período.")
+        return
+
+    # Sucursales y líderes salen de las claves de las subidas: no hace falta descargar ningún tablero
+    entries = [entry for periodo in periodos for entry in cached_period_uploads(periodo)]
+    if not entries:
+        st.info("No hay tableros subidos en los períodos elegidos.")
+        return
+    sucursales = st.multiselect("Sucursal", sorted({e["sucursal"] for e in entries if e["sucursal"]}))
+    lideres = st.multiselect("Nombre Lider", sorted({e["lider"] for e in entries if e["lider"]
+                                                     and (not sucursales or e["sucursal"] in sucursales)}))
+    cargos = st.multiselect("Cargo", cached_cargos(tuple(periodos), tuple(sucursales), tuple(lideres)))
+    ajuste = st.multiselect("Ajuste", ["SI", "NO"])
+    solo_vigentes = st.checkbox("Solo el último tablero de cada CUIL", value=True)
+    columnas = st.multiselect("Columnas", DEFAULT_COLUMNS, default=DEFAULT_COLUMNS)
+
+    filtros = (("Sucursal", tuple(sucursales)), ("Nombre Lider", tuple(lideres)), ("Cargo", tuple(cargos)), ("Ajuste", tuple(ajuste)))
+    with st.spinner("Consultando tableros..."):
+        df = cached_query(tuple(periodos), tuple(columnas or DEFAULT_COLUMNS), filtros, solo_vigentes)
+
+    st.caption(f"{len(df)} filas, {df['CUIL'].nunique() if 'CUIL' in df.columns else 0} CUILs")
+    st.dataframe(df, hide_index=True, use_container_width=True)
+    st.download_button("Descargar CSV", df.to_csv(index=False).encode("utf-8-sig"), "reporte_tableros.csv", "text/csv")
+
+    if st.button("Actualizar datos"):
+        st.cache_data.clear()
+        st.rerun()
+
+if __name__ == "__main__":
+    main()
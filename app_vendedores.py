@@ -1,59 +1,90 @@
 import streamlit as st
-import boto3
 import pandas as pd
-from io import BytesIO
 from datetime import datetime, timedelta
 import pytz
 import re
-from config import cargar_configuracion
+import json
+from concurrent.futures import ThreadPoolExecutor
+from config import cargar_configuracion, cargar_opciones
+from error_log import ErrorSink, current_error_sink, notify
+from parquet_output import parquet_available, parquet_key, dataframe_to_parquet
+from workbook_reader import open_workbook
+from parallel_sheets import should_process_in_parallel, map_sheets_in_pool
+from storage import open_storage, StorageKeyNotFound
+from csv_objects import write_csv_object, read_csv_object
+from s3_client import get_s3_client
+from upload_cache import workbook_hash
+from object_cache import open_object_cache, cached_frame
+from background_uploads import UploadWorker, commit_upload, list_pending_keys
+from metrics import UploadMetrics, stage, merge_stages, set_upload_status, bind_metrics, hand_off, append_metrics_record, metrics_key
+from form_rules import FORM_ROWS, FORM_ONLY_RULES, VENDEDORES_RULES
 
 # Cargar configuración
 aws_access_key, aws_secret_key, region_name, bucket_name, valid_user, valid_password = cargar_configuracion()
+opciones = cargar_opciones()
 
-# Configuración de AWS S3
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key,
-    region_name=region_name
-)
+# Configuración del almacenamiento (S3 o una carpeta local, según la opción "almacenamiento").
+# El cliente de S3 se crea en el primer pedido y se comparte entre sesiones (ver s3_client.py)
+storage = open_storage(opciones, bucket_name, lambda: get_s3_client(aws_access_key, aws_secret_key, region_name, opciones))
 
-# Función para cargar un archivo en S3
-def upload_file_to_s3(file, filename, original_filename):
+# Cache en disco de los tableros ya leídos (los de la verificación de duplicados se vuelven a leer en cada carga)
+object_cache = open_object_cache(opciones)
+
+# Función para guardar un DataFrame como CSV en S3 (en streaming y comprimido con gzip si está activado)
+def upload_csv_to_s3(df, filename, original_filename, metadata=None):
     try:
-        s3.upload_fileobj(file, bucket_name, filename)
+        write_csv_object(storage, filename, df, compress=opciones["comprimir_csv"], metadata=metadata)
         return True
     except Exception as e:
-        st.error(f"Error al subir el archivo: {e}")
+        notify("error", f"Error al subir el archivo: {e}")
         return False
 
-# Función para guardar errores en un archivo log en S3
-def log_error_to_s3(error_message, filename):
+# Función para guardar una copia tipada en Parquet, particionada por período y sucursal
+def upload_parquet_to_s3(df, dataset, original_filename, upload_stamp):
+    if not opciones["escribir_parquet"]:
+        return False
+    if not parquet_available():
+        notify("warning", "La salida Parquet está activada pero pyarrow no está instalado; solo se guardó el CSV.")
+        return False
     try:
-        log_filename = "Errores.txt"
-        now = datetime.now()
-        log_entry = pd.DataFrame([{
-            "Fecha": now.strftime('%Y-%m-%d'),
-            "Hora": now.strftime('%H:%M'),
-            "Error": error_message,
-            "NombreArchivo": filename
-        }])
-        
-        # Descargar el archivo log existente si existe
-        try:
-            log_obj = s3.get_object(Bucket=bucket_name, Key=log_filename)
-            log_df = pd.read_csv(BytesIO(log_obj['Body'].read()))
-            log_df = pd.concat([log_df, log_entry], ignore_index=True)
-        except s3.exceptions.NoSuchKey:
-            log_df = log_entry  # Crear un nuevo DataFrame si no existe el archivo
-
-        # Subir el archivo log actualizado
-        csv_buffer = BytesIO()
-        log_df.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-        csv_buffer.seek(0)
-        s3.put_object(Bucket=bucket_name, Key=log_filename, Body=csv_buffer.getvalue())
+        fecha, sucursal = extract_date_and_sucursal(original_filename)
+        key = parquet_key(dataset, fecha, sucursal, f"{upload_stamp}_{original_filename.split('.')[0]}")
+        body = dataframe_to_parquet(df, {'Fecha Horario Subida': '%Y-%m-%d_%H-%M-%S'})
+        storage.put(key, body, content_type="application/vnd.apache.parquet")
+        return True
+    except Exception as e:
+        error_message = f"Error al guardar la copia Parquet de '{original_filename}': {e}"
+        notify("error", error_message)
+        log_error_to_s3(error_message, original_filename)
+        return False
+
+# Función para guardar un lote de errores como un objeto nuevo en S3
+def write_error_log(key, log_df):
+    try:
+        write_csv_object(storage, key, log_df, compress=opciones["comprimir_csv"])
     except Exception as e:
-        st.error(f"Error al guardar el log en S3: {e}")
+        notify("error", f"Error al guardar el log en S3: {e}")
+
+# Función para guardar el registro de métricas de una carga (JSONL local y, si está activado, en el almacenamiento)
+def write_metrics(record):
+    append_metrics_record(opciones["metricas_archivo"], record)
+    if opciones["metricas_en_almacenamiento"]:
+        body = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")
+        storage.put(metrics_key(datetime.now()), body, content_type="application/json")
+
+# Métricas de una carga (tiempo y memoria por etapa, pedidos al almacenamiento)
+def upload_metrics(original_filename):
+    writer = write_metrics if opciones["registrar_metricas"] else None
+    return UploadMetrics(original_filename, "vendedores", writer, opciones["medir_memoria"])
+
+# Función para registrar un error (se acumula en la carga en curso y se guarda una sola vez al final)
+def log_error_to_s3(error_message, filename):
+    sink = current_error_sink()
+    if sink is not None:
+        sink.add(error_message, filename)
+        return
+    with ErrorSink(write_error_log) as sink:
+        sink.add(error_message, filename)
 
 # Verificar formato del nombre del archivo
 def validate_filename(filename):
@@ -77,7 +108,7 @@ def validate_file_date(filename):
 
         return False
     except Exception as e:
-        st.error(f"Error al validar la fecha del archivo: {e}")
+        notify("error", f"Error al validar la fecha del archivo: {e}")
         return False
 
 # Extraer el nombre del líder del archivo
@@ -97,41 +128,40 @@ def extract_date_and_sucursal(filename):
     except IndexError:
         return None, None
 
-# Verificar celdas del formulario
-def validate_form_cells(sheet_data, sheet_name, filename, is_vendedores):
-    try:
-        if is_vendedores:
-            # Omitir validación de B1 si la hoja es "Resumen RRHH"
-            if sheet_name == "Resumen RRHH":
-                return True
-
-            # Validar formulario de vendedores
-            if pd.isna(sheet_data.at[0, 1]) or not re.match(r"^\d{11}$", str(sheet_data.at[0, 1])):
-                error_message = f"Error: La celda B1 en la hoja '{sheet_name}' debe contener un CUIL válido (11 dígitos)."
-                st.error(error_message)
-                log_error_to_s3(error_message, filename)
-                return False
-        else:
-            # Validar formulario de no vendedores
-            required_cells = ['B1', 'B2', 'B3', 'B4']
-            for cell in required_cells:
-                if pd.isna(sheet_data.at[int(cell[1]) - 1, 1]):
-                    error_message = f"Error: La celda {cell} en la hoja '{sheet_name}' está vacía."
-                    st.error(error_message)
-                    log_error_to_s3(error_message, filename)
-                    return False
+# Reglas del formulario según el tipo de tablero
+def form_rules_for(is_vendedores):
+    return VENDEDORES_RULES if is_vendedores else FORM_ONLY_RULES
 
-            cuil = str(sheet_data.at[1, 1])
-            if not re.match(r"^\d{11}$", cuil):
-                error_message = f"Error: La celda B2 en la hoja '{sheet_name}' debe contener 11 números."
-                st.error(error_message)
-                log_error_to_s3(error_message, filename)
-                return False
+# Función para mostrar y registrar juntos todos los errores de formulario de un informe {hoja: [errores]}
+def report_form_errors(report, filename):
+    for errors in report.values():
+        for error_message in errors:
+            notify("error", error_message)
+            log_error_to_s3(error_message, filename)
+    return not report
 
-        return True
+# Verificar celdas del formulario de una hoja (la hoja "Resumen RRHH" de vendedores se omite)
+def validate_form_cells(sheet_data, sheet_name, filename, is_vendedores):
+    try:
+        return report_form_errors(form_rules_for(is_vendedores).validate({sheet_name: sheet_data}), filename)
     except Exception as e:
         error_message = f"Error al validar las celdas del formulario en la hoja '{sheet_name}': {e}"
-        st.error(error_message)
+        notify("error", error_message)
+        log_error_to_s3(error_message, filename)
+        return False
+
+# Verificar celdas del formulario de todas las hojas en una sola pasada (informa todos los errores juntos)
+def validate_all_form_cells(excel_data, filename, is_vendedores):
+    try:
+        rules = form_rules_for(is_vendedores)
+        forms = {
+            sheet_name: excel_data.parse(sheet_name, header=None, nrows=FORM_ROWS)
+            for sheet_name in excel_data.sheet_names if sheet_name not in rules.skip_sheets
+        }
+        return report_form_errors(rules.validate(forms), filename)
+    except Exception as e:
+        error_message = f"Error al validar las celdas del formulario: {e}"
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
 
@@ -152,7 +182,7 @@ def validate_required_columns(data):
 def validate_ponderacion(data, filename):
     if (data['Ponderacion'] == 0).any():
         error_message = "Error: Existen filas con Ponderacion 0%."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -162,7 +192,7 @@ def validate_ponderacion_sum(data, filename, sheet_name):
     ponderacion_sum = data['Ponderacion'].sum()
     if not (0.99 <= ponderacion_sum <= 1.1):
         error_message = f"Error: La suma de la columna Ponderacion en la hoja '{sheet_name}' es {ponderacion_sum * 100:.2f}%, no es 100%."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -171,7 +201,7 @@ def validate_ponderacion_sum(data, filename, sheet_name):
 def verify_sheet_structure(sheet_data, sheet_name, filename):
     if sheet_data.empty or sheet_data.shape[1] < 1:
         error_message = f"Error: La hoja '{sheet_name}' está vacía o no tiene suficientes columnas."
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
     return True
@@ -199,7 +229,7 @@ def count_rows_until_empty(data, column_name="Indicadores de Gestion"):
         relevant_rows = data.iloc[header_index + 1:, 2]
         return relevant_rows.isna().idxmax() - (header_index + 1)
     except Exception as e:
-        st.error(f"Error contando filas hasta vacío: {e}")
+        notify("error", f"Error contando filas hasta vacío: {e}")
         return 0
 
 # Función para limpiar y reestructurar datos
@@ -210,7 +240,7 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
 
         if rows_to_process == 0:
             error_message = "Error: No se encontraron filas válidas después del encabezado."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame()
 
@@ -237,7 +267,7 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
         valid_columns, missing_columns = validate_required_columns(data)
         if not valid_columns:
             error_message = f"Error: Faltan las siguientes columnas requeridas: {', '.join(missing_columns)}"
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame()
 
@@ -272,7 +302,7 @@ def clean_and_restructure_until_empty(data, cargo, cuil, segmento, area_influenc
         return data[desired_columns]
     except Exception as e:
         error_message = f"Error al limpiar y reestructurar: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return pd.DataFrame()
 
@@ -285,60 +315,103 @@ def validate_unique_cuils(dataframes):
         return False
     return True
 
+# Función para procesar una hoja del Excel.
+# Devuelve (datos, aceleradores, resumen RRHH, válida); el resumen solo viene en la hoja "Resumen RRHH"
+def process_sheet(excel_data, sheet_name, filename, upload_datetime, is_vendedores):
+    with stage("lectura", sheet_name):
+        sheet_data = excel_data.parse(sheet_name, header=None)
+
+    # Si es la hoja "Resumen RRHH" y es un tablero de vendedores, validar columnas requeridas
+    if is_vendedores and sheet_name == "Resumen RRHH":
+        with stage("resumen_rrhh", sheet_name):
+            valid_rrhh, resumen_rrhh_data = validate_resumen_rrhh_sheet(excel_data, filename)
+        return pd.DataFrame(), pd.DataFrame(), resumen_rrhh_data, valid_rrhh
+
+    if not verify_sheet_structure(sheet_data, sheet_name, filename):
+        return pd.DataFrame(), pd.DataFrame(), None, False
+
+    # El formulario ya se validó para todas las hojas en validate_all_form_cells
+
+    if is_vendedores:
+        # Procesar hojas de vendedores
+        with stage("reestructura", sheet_name):
+            processed_data, aceleradores_sheet_data = process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name)
+        return processed_data, aceleradores_sheet_data, None, True
+
+    # Procesar hojas de no vendedores
+    leader_name = extract_leader_name(filename)
+    fecha, sucursal = extract_date_and_sucursal(filename)
+    cargo, cuil, segmento, area_influencia, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo = extract_data_from_form(sheet_data)
+    if not all([cargo, cuil, segmento, area_influencia]):
+        error_message = f"Error: El formulario en la hoja '{sheet_name}' no contiene todos los datos requeridos."
+        notify("error", error_message)
+        log_error_to_s3(error_message, filename)
+        return pd.DataFrame(), pd.DataFrame(), None, False
+
+    with stage("reestructura", sheet_name):
+        processed_data = clean_and_restructure_until_empty(
+            sheet_data, cargo, cuil, segmento, area_influencia, leader_name, fecha, sucursal, filename,
+            upload_datetime, sheet_name, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo
+        )
+    return processed_data, pd.DataFrame(), None, True
+
+# Función para recorrer las hojas procesadas; con muchas hojas se reparten en un pool de procesos
+def iter_processed_sheets(excel_data, filename, upload_datetime, is_vendedores):
+    sheet_names = list(excel_data.sheet_names)
+    if should_process_in_parallel(len(sheet_names), opciones):
+        try:
+            results = map_sheets_in_pool(process_sheet, excel_data, sheet_names, (filename, upload_datetime, is_vendedores), opciones["procesos_hojas"])
+        except Exception:
+            results = None  # Si el pool falla se procesa en forma secuencial
+        if results is not None:
+            # Los mensajes de cada hoja se muestran en el mismo orden que en el modo secuencial
+            for result, errors, displayed, stages in results:
+                merge_stages(stages)
+                for kind, message in displayed:
+                    notify(kind, message)
+                for error_message in errors:
+                    log_error_to_s3(error_message, filename)
+                yield result
+            return
+    for sheet_name in sheet_names:
+        yield process_sheet(excel_data, sheet_name, filename, upload_datetime, is_vendedores)
+
 # Función para procesar hojas del Excel
 def process_sheets_until_empty(excel_data, filename, upload_datetime, is_vendedores):
-    final_data = pd.DataFrame()
-    aceleradores_data = pd.DataFrame()
     resumen_rrhh_data = None
-    leader_name = extract_leader_name(filename)
-    fecha, sucursal = extract_date_and_sucursal(filename)
+    # Las hojas se juntan una sola vez al final (concatenar en cada hoja copia todo lo anterior de nuevo)
     dataframes = []
+    aceleradores_frames = []
 
     try:
-        for sheet_name in excel_data.sheet_names:
-            sheet_data = excel_data.parse(sheet_name, header=None)
-
-            # Si es la hoja "Resumen RRHH" y es un tablero de vendedores, validar columnas requeridas
-            if is_vendedores and sheet_name == "Resumen RRHH":
-                valid_rrhh, resumen_rrhh_data = validate_resumen_rrhh_sheet(excel_data, filename)
-                if not valid_rrhh:
-                    return pd.DataFrame(), pd.DataFrame(), None, False  # Return empty DataFrames and error state
-                continue  # No procesar más esta hoja
+        with stage("formulario"):
+            forms_ok = validate_all_form_cells(excel_data, filename, is_vendedores)
+        if not forms_ok:
+            return pd.DataFrame(), pd.DataFrame(), None, False  # Return empty DataFrames and error state
 
-            if not verify_sheet_structure(sheet_data, sheet_name, filename):
+        for processed_data, aceleradores_sheet_data, resumen_sheet_data, success in iter_processed_sheets(excel_data, filename, upload_datetime, is_vendedores):
+            if not success:
                 return pd.DataFrame(), pd.DataFrame(), None, False  # Return empty DataFrames and error state
 
-            if not validate_form_cells(sheet_data, sheet_name, filename, is_vendedores):
-                return pd.DataFrame(), pd.DataFrame(), None, False  # Return empty DataFrames and error state
+            if resumen_sheet_data is not None:
+                resumen_rrhh_data = resumen_sheet_data
+                continue  # No procesar más esta hoja
 
             if is_vendedores:
-                # Procesar hojas de vendedores
-                processed_data, aceleradores_sheet_data = process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name)
-                aceleradores_data = pd.concat([aceleradores_data, aceleradores_sheet_data], ignore_index=True)
-            else:
-                # Procesar hojas de no vendedores
-                cargo, cuil, segmento, area_influencia, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo = extract_data_from_form(sheet_data)
-                if not all([cargo, cuil, segmento, area_influencia]):
-                    error_message = f"Error: El formulario en la hoja '{sheet_name}' no contiene todos los datos requeridos."
-                    st.error(error_message)
-                    log_error_to_s3(error_message, filename)
-                    return pd.DataFrame(), pd.DataFrame(), None, False
-
-                processed_data = clean_and_restructure_until_empty(
-                    sheet_data, cargo, cuil, segmento, area_influencia, leader_name, fecha, sucursal, filename,
-                    upload_datetime, sheet_name, comisiones_accesorias, hs_extras_50, hs_extras_100, incentivo_productividad, ajuste_incentivo
-                )
+                aceleradores_frames.append(aceleradores_sheet_data)
 
             if processed_data.empty:
                 return pd.DataFrame(), pd.DataFrame(), None, False  # Return empty DataFrames and error state
 
             dataframes.append(processed_data)
-            final_data = pd.concat([final_data, processed_data], ignore_index=True)
 
+        final_data = pd.concat(dataframes, ignore_index=True) if dataframes else pd.DataFrame()
+        aceleradores_frames = [frame for frame in aceleradores_frames if not frame.empty]
+        aceleradores_data = pd.concat(aceleradores_frames, ignore_index=True) if aceleradores_frames else pd.DataFrame()
         return final_data, aceleradores_data, resumen_rrhh_data, True  # Return DataFrames and success state
     except Exception as e:
         error_message = f"Error al procesar las hojas del archivo: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return pd.DataFrame(), pd.DataFrame(), None, False
 
@@ -360,14 +433,14 @@ def validate_update_dates(data, filename, sheet_name):
         # Verificar si la columna existe
         if 'Ultima Fecha de Actualización' not in data.columns:
             error_message = f"Error: La columna 'Ultima Fecha de Actualización' no existe en la hoja '{sheet_name}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
         # Verificar valores nulos
         if data['Ultima Fecha de Actualización'].isna().any():
             error_message = f"Error: Existen valores nulos en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
@@ -377,7 +450,7 @@ def validate_update_dates(data, filename, sheet_name):
         )
         if data['Ultima Fecha de Actualización'].isna().any():
             error_message = f"Error: Existen valores en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}' que no tienen el formato de fecha válido (%d/%m/%Y)."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
@@ -385,99 +458,198 @@ def validate_update_dates(data, filename, sheet_name):
         invalid_dates = data[data['Ultima Fecha de Actualización'] > now]
         if not invalid_dates.empty:
             error_message = f"Error: Existen fechas en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}' que son posteriores a la fecha actual."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False
 
         return True
     except Exception as e:
         error_message = f"Error al validar las fechas en la columna 'Ultima Fecha de Actualización' en la hoja '{sheet_name}': {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False
 
-# Función para verificar duplicados en S3
-def check_for_duplicates(cuil, fecha, leader_name):
+# Tableros principales: "{AAAA-MM-DD_HH-MM-SS}_{dd-mm-aaaa}+{sucursal}+{lider}.csv" (excluye RRHH-, Aceleradores- y Errores.txt)
+TABLERO_KEY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_(\d{2}-\d{2}-\d{4})\+.+\.csv$")
+DUPLICATE_COLUMNS = ['CUIL', 'Fecha_Nombre_Archivo', 'Nombre Lider']
+DUPLICATE_SCAN_WORKERS = 8
+
+# Prefijos de las claves de los tableros con fecha dd-mm-aaaa. Solo se aceptan archivos del mes en curso
+# (validate_file_date), así que se subieron en el mes de su fecha: la clave empieza con "aaaa-mm-". Como la hora
+# de la clave es la de Argentina y la validación usa la del servidor, también se revisa el mes anterior
+def tablero_prefixes(fecha):
+    mes = datetime.strptime(fecha, '%d-%m-%Y').replace(day=1)
+    anterior = mes - timedelta(days=1)
+    return [anterior.strftime('%Y-%m-'), mes.strftime('%Y-%m-')]
+
+# Función para listar los tableros candidatos (paginado y filtrado por nombre antes de descargar).
+# Se omiten los de cargas que todavía no se confirmaron
+def list_tablero_objects(fecha):
+    pending = list_pending_keys(storage)
+    for prefix in tablero_prefixes(fecha):
+        for obj in storage.list(prefix):
+            match = TABLERO_KEY_PATTERN.match(obj['Key'])
+            if match and match.group(1) == fecha and obj['Key'] not in pending:
+                yield obj
+
+# Función para decodificar solo las columnas necesarias para detectar duplicados
+def decode_duplicate_columns(body):
+    try:
+        df = read_csv_object(
+            body,
+            usecols=lambda col: col in DUPLICATE_COLUMNS,
+            dtype=str,
+            encoding="utf-8-sig"
+        )
+    except Exception:
+        # Si el archivo no es un CSV válido, lo ignora
+        return pd.DataFrame()
+    if not set(DUPLICATE_COLUMNS).issubset(df.columns):
+        return pd.DataFrame()
+    return df
+
+# Función para leer las columnas de duplicados de un tablero (de la cache en disco si no cambió su ETag)
+def read_duplicate_columns(obj):
+    return cached_frame(object_cache, storage, obj['Key'], "duplicados", decode_duplicate_columns, etag=obj['ETag'])
+
+# Función para verificar duplicados en S3: si otro líder ya subió, con la misma fecha, el tablero de alguno de
+# los CUILs del archivo. Devuelve (duplicado, líder anterior, CUIL duplicado)
+def check_for_duplicates(cuils, fecha, leader_name):
     try:
-        cuil = str(cuil)
+        cuils = {str(cuil) for cuil in cuils}
         fecha = str(fecha)
-        response = s3.list_objects_v2(Bucket=bucket_name)
-        if 'Contents' in response:
-            for obj in response['Contents']:
-                obj_key = obj['Key']
-                obj_data = s3.get_object(Bucket=bucket_name, Key=obj_key)
-                df = pd.read_csv(BytesIO(obj_data['Body'].read()))
-                if 'CUIL' in df.columns and 'Fecha_Nombre_Archivo' in df.columns:
-                    df['CUIL'] = df['CUIL'].astype(str)
-                    df['Fecha_Nombre_Archivo'] = df['Fecha_Nombre_Archivo'].astype(str)
-                    if not df.empty and df['CUIL'].str.contains(cuil).any() and df['Fecha_Nombre_Archivo'].str.contains(fecha).any():
-                        existing_leader = df.loc[df['CUIL'] == cuil, 'Nombre Lider'].values[0]
-                        if existing_leader != leader_name:
-                            return True, existing_leader, cuil  # Block upload if the leader is different
+        objects = list(list_tablero_objects(fecha))
+        with ThreadPoolExecutor(max_workers=DUPLICATE_SCAN_WORKERS) as executor:
+            # map devuelve los resultados en el orden de las claves aunque se descarguen en paralelo
+            for df in executor.map(bind_metrics(read_duplicate_columns), objects):
+                if df.empty:
+                    continue
+                matches = df[df['CUIL'].isin(cuils) & (df['Fecha_Nombre_Archivo'] == fecha) & (df['Nombre Lider'] != leader_name)]
+                if not matches.empty:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return True, matches['Nombre Lider'].iloc[0], matches['CUIL'].iloc[0]  # Block upload if the leader is different
         return False, None, None
     except Exception as e:
-        st.error(f"Error al verificar duplicados en S3: {e}")
+        notify("error", f"Error al verificar duplicados en S3: {e}")
         return False, None, None
 
-# Función para procesar y subir el Excel
-def process_and_upload_excel(file, original_filename):
-    try:
-        if not validate_filename(original_filename):
-            error_message = "El nombre del archivo no cumple con el formato requerido (dd-mm-aaaa+empresa+nombre lider.xlsx)."
-            st.error(error_message)
-            log_error_to_s3(error_message, original_filename)
-            return
+# Clave del registro de un Excel ya subido, por hash de su contenido
+def upload_hash_key(content_hash):
+    return f"indices/hashes/{content_hash}.json"
 
-        if not validate_file_date(original_filename):
-            error_message = "La fecha del nombre del archivo solo puede ser del mes  al actual."
-            st.error(error_message)
-            log_error_to_s3(error_message, original_filename)
-            return
-
-        is_vendedores = is_vendedores_tablero(original_filename)
-        excel_data = pd.ExcelFile(file)
-        argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
-        now = datetime.now(argentina_tz)
-        upload_datetime = now.strftime('%Y-%m-%d_%H-%M-%S')
+# Función para buscar si este mismo archivo (mismos bytes y mismo nombre) ya se subió. Devuelve el registro o None
+def find_previous_upload(content_hash, original_filename):
+    try:
+        entry = json.loads(storage.get(upload_hash_key(content_hash)).decode("utf-8"))
+    except StorageKeyNotFound:
+        return None
+    except Exception as e:
+        notify("error", f"Error al buscar cargas anteriores del archivo: {e}")
+        return None
+    return entry if entry.get("archivo") == original_filename else None
 
-        # Extraer el nombre del líder desde el nombre del archivo
-        leader_name = extract_leader_name(original_filename)
+# Función para registrar el hash del Excel subido (archivo, clave del CSV y fecha de subida)
+def record_upload_hash(content_hash, original_filename, csv_key, subida):
+    try:
+        entry = {"archivo": original_filename, "clave": csv_key, "subida": subida}
+        storage.put(upload_hash_key(content_hash), json.dumps(entry, ensure_ascii=False).encode("utf-8"), content_type="application/json")
+    except Exception as e:
+        notify("error", f"Error al registrar el hash del archivo: {e}")
 
-        # Procesar las hojas del archivo
-        cleaned_df, aceleradores_data, resumen_rrhh_data, success = process_sheets_until_empty(
-            excel_data, original_filename, upload_datetime, is_vendedores
-        )
+# Función para procesar y subir el Excel
+def process_and_upload_excel(file, original_filename):
+    # Todos los errores de esta carga se guardan juntos en un único objeto al terminar
+    with ErrorSink(write_error_log), upload_metrics(original_filename):
+        set_upload_status("error")
+        try:
+            # Un archivo idéntico al que ya se subió no se vuelve a procesar ni a guardar
+            with stage("archivo_repetido"):
+                content_hash = workbook_hash(file)
+                previous = find_previous_upload(content_hash, original_filename)
+            if previous is not None:
+                notify("warning", f"El archivo '{original_filename}' ya se subió el {previous['subida']} ({previous['clave']}). No se vuelve a cargar.")
+                set_upload_status("repetido")
+                return
+
+            with stage("validar_nombre"):
+                filename_ok = validate_filename(original_filename)
+                date_ok = filename_ok and validate_file_date(original_filename)
+            if not filename_ok:
+                error_message = "El nombre del archivo no cumple con el formato requerido (dd-mm-aaaa+empresa+nombre lider.xlsx)."
+                notify("error", error_message)
+                log_error_to_s3(error_message, original_filename)
+                return
+
+            if not date_ok:
+                error_message = "La fecha del nombre del archivo solo puede ser del mes  al actual."
+                notify("error", error_message)
+                log_error_to_s3(error_message, original_filename)
+                return
+
+            is_vendedores = is_vendedores_tablero(original_filename)
+            with stage("abrir_excel"):
+                excel_data = open_workbook(file, opciones["lector_excel"])
+            argentina_tz = pytz.timezone("America/Argentina/Buenos_Aires")
+            now = datetime.now(argentina_tz)
+            upload_datetime = now.strftime('%Y-%m-%d_%H-%M-%S')
+
+            # Extraer el nombre del líder desde el nombre del archivo
+            leader_name = extract_leader_name(original_filename)
+
+            # Procesar las hojas del archivo
+            with stage("hojas"):
+                cleaned_df, aceleradores_data, resumen_rrhh_data, success = process_sheets_until_empty(
+                    excel_data, original_filename, upload_datetime, is_vendedores
+                )
 
-        if not success:
-            error_message = "El archivo contiene errores en su estructura y no se cargará"
-            st.error(error_message)
+            if not success:
+                error_message = "El archivo contiene errores en su estructura y no se cargará"
+                notify("error", error_message)
+                log_error_to_s3(error_message, original_filename)
+                return
+
+            # Verificar duplicados
+            if not cleaned_df.empty:
+                fecha, _ = extract_date_and_sucursal(original_filename)
+                with stage("duplicados"):
+                    is_duplicate, existing_leader, duplicate_cuil = check_for_duplicates(cleaned_df['CUIL'].unique(), fecha, leader_name)
+                if is_duplicate:
+                    error_message = f"No se puede subir el archivo porque el líder '{existing_leader}' ya lo subió anteriormente. El CUIL duplicado es '{duplicate_cuil}'."
+                    notify("error", error_message)
+                    log_error_to_s3(error_message, original_filename)
+                    set_upload_status("duplicado")
+                    return
+
+            # Los archivos se preparan acá (los errores se ven enseguida) y se guardan juntos, en segundo plano si está activado
+            artifacts = []
+            if is_vendedores and resumen_rrhh_data is not None:
+                resumen_rrhh_df = prepare_resumen_rrhh(resumen_rrhh_data, original_filename)
+                if resumen_rrhh_df is not None:
+                    artifacts.append((rrhh_csv_key(original_filename, upload_datetime), resumen_rrhh_df, "resumen_rrhh", None, "subida_rrhh"))
+            if not cleaned_df.empty:
+                csv_filename = f"{upload_datetime}_{original_filename.split('.')[0]}.csv"
+                artifacts.append((csv_filename, cleaned_df, "tableros_vendedores", {"sha256": content_hash}, "subida"))
+            if not aceleradores_data.empty:
+                aceleradores_df = prepare_aceleradores(aceleradores_data, original_filename)
+                if aceleradores_df is not None:
+                    artifacts.append((aceleradores_csv_key(original_filename, upload_datetime), aceleradores_df, "aceleradores", None, "subida_aceleradores"))
+            if not artifacts:
+                return
+
+            save = lambda: save_upload_artifacts(artifacts, original_filename, upload_datetime, content_hash,
+                                                 now.strftime('%d/%m/%Y %H:%M:%S'), is_vendedores)
+            if opciones["subir_en_segundo_plano"]:
+                # Las etapas del guardado se suman a las métricas de esta carga (un solo registro por archivo)
+                set_upload_status("validado")
+                job = upload_worker().submit(original_filename, hand_off(save), error_writer=write_error_log)
+                st.session_state.setdefault("subidas", []).append(job.id)
+                notify("info", f"El archivo '{original_filename}' pasó la validación y se está guardando.")
+            else:
+                save()
+        except Exception as e:
+            error_message = f"Error al procesar el archivo Excel: {e}"
+            notify("error", error_message)
             log_error_to_s3(error_message, original_filename)
-            return
-
-        # Guardar la tabla "Resumen RRHH" solo si no hubo errores
-        if is_vendedores and resumen_rrhh_data is not None:
-            if save_resumen_rrhh_to_csv(resumen_rrhh_data, original_filename, upload_datetime):
-                st.success(f"Archivo 'Resumen RRHH' guardado correctamente.csv'")
-
-        if not cleaned_df.empty:
-            # Guardar el archivo principal en S3
-            csv_buffer = BytesIO()
-            cleaned_df.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-            csv_filename = f"{now.strftime('%Y-%m-%d_%H-%M-%S')}_{original_filename.split('.')[0]}.csv"
-            csv_buffer.seek(0)
-            if upload_file_to_s3(csv_buffer, csv_filename, original_filename):
-                st.success(f"Archivo '{original_filename}' subido exitosamente.")
-                # Mostrar mensaje emergente con el recuento de CUILs si es vendedores
-                if is_vendedores:
-                    num_cuils = cleaned_df['CUIL'].nunique()
-                    st.info(f"Se cargaron {num_cuils} tableros de colaboradores.")
-
-        if not aceleradores_data.empty:
-            save_aceleradores_to_csv(aceleradores_data, original_filename, upload_datetime)
-    except Exception as e:
-        error_message = f"Error al procesar el archivo Excel: {e}"
-        st.error(error_message)
-        log_error_to_s3(error_message, original_filename)
 
 def is_vendedores_tablero(filename):
     try:
@@ -486,7 +658,7 @@ def is_vendedores_tablero(filename):
             return True
         return False
     except Exception as e:
-        st.error(f"Error al determinar el tipo de tablero: {e}")
+        notify("error", f"Error al determinar el tipo de tablero: {e}")
         return False
 
 def validate_resumen_rrhh_sheet(excel_data, filename):
@@ -496,7 +668,7 @@ def validate_resumen_rrhh_sheet(excel_data, filename):
 
         if "Resumen RRHH" not in excel_data.sheet_names:
             error_message = "Error: La hoja 'Resumen RRHH' no está presente en el archivo."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False, None
 
@@ -523,14 +695,14 @@ def validate_resumen_rrhh_sheet(excel_data, filename):
         missing_columns = [col for col in required_columns if col not in resumen_rrhh_data.columns]
         if missing_columns:
             error_message = f"Error: Faltan las siguientes columnas en la hoja 'Resumen RRHH': {', '.join(missing_columns)}"
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return False, None
 
         return True, resumen_rrhh_data
     except Exception as e:
         error_message = f"Error al validar la hoja 'Resumen RRHH': {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return False, None
 
@@ -556,7 +728,7 @@ def process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name
         header_row = sheet_data[sheet_data.iloc[:, 0] == 'Tipo Indicador'].index
         if header_row.empty:
             error_message = f"Error: No se encontró el encabezado 'Tipo Indicador' en la hoja '{sheet_name}'."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame(), aceleradores_data
 
@@ -565,7 +737,7 @@ def process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name
 
         if rows_to_process == 0:
             error_message = "Error: No se encontraron filas válidas después del encabezado."
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame(), aceleradores_data
 
@@ -577,7 +749,7 @@ def process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name
         valid_columns, missing_columns = validate_required_columns(sheet_data)
         if not valid_columns:
             error_message = f"Error: Faltan las siguientes columnas requeridas: {', '.join(missing_columns)}"
-            st.error(error_message)
+            notify("error", error_message)
             log_error_to_s3(error_message, filename)
             return pd.DataFrame(), aceleradores_data
 
@@ -612,11 +784,12 @@ def process_vendedores_tablero(sheet_data, filename, upload_datetime, sheet_name
         return sheet_data[desired_columns], aceleradores_data
     except Exception as e:
         error_message = f"Error al procesar el tablero de vendedores: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, filename)
         return pd.DataFrame(), pd.DataFrame()
 
-def save_resumen_rrhh_to_csv(resumen_rrhh_data, original_filename, upload_datetime):
+# Función para preparar la tabla "Resumen RRHH" (agrega "Lider" y "Fecha"). Devuelve None si hubo un error
+def prepare_resumen_rrhh(resumen_rrhh_data, original_filename):
     try:
         # Extraer "Lider" y "Fecha" del nombre del archivo
         parts = original_filename.split('+')
@@ -637,21 +810,17 @@ def save_resumen_rrhh_to_csv(resumen_rrhh_data, original_filename, upload_dateti
         # Agregar las columnas "Lider" y "Fecha" al DataFrame
         resumen_rrhh_data.insert(0, 'Lider', lider)
         resumen_rrhh_data.insert(1, 'Fecha', fecha)
-
-        # Crear el nombre del archivo CSV
-        csv_filename = f"RRHH-{upload_datetime}_{original_filename.split('.')[0]}.csv"
-        csv_buffer = BytesIO()
-        resumen_rrhh_data.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-        csv_buffer.seek(0)
-
-        # Subir el archivo CSV a S3
-        upload_file_to_s3(csv_buffer, csv_filename, original_filename)
-        return True
+        return resumen_rrhh_data
     except Exception as e:
-        st.error(f"Error al guardar el archivo 'Resumen RRHH': {e}")
-        return False
+        notify("error", f"Error al guardar el archivo 'Resumen RRHH': {e}")
+        return None
+
+# Clave del CSV "Resumen RRHH" de una carga
+def rrhh_csv_key(original_filename, upload_datetime):
+    return f"RRHH-{upload_datetime}_{original_filename.split('.')[0]}.csv"
 
-def save_aceleradores_to_csv(aceleradores_data, original_filename, upload_datetime):
+# Función para preparar la tabla de aceleradores (agrega "Lider" y "Fecha"). Devuelve None si hubo un error
+def prepare_aceleradores(aceleradores_data, original_filename):
     try:
         # Extraer "Lider" y "Fecha" del nombre del archivo
         parts = original_filename.split('+')
@@ -661,22 +830,79 @@ def save_aceleradores_to_csv(aceleradores_data, original_filename, upload_dateti
         # Agregar las columnas "Lider" y "Fecha" al DataFrame
         aceleradores_data.insert(0, 'Lider', lider)
         aceleradores_data.insert(1, 'Fecha', fecha)
-
-        # Crear el nombre del archivo CSV
-        csv_filename = f"Aceleradores-{upload_datetime}_{original_filename.split('.')[0]}.csv"
-
-        # Guardar el DataFrame en un archivo CSV
-        csv_buffer = BytesIO()
-        aceleradores_data.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-        csv_buffer.seek(0)
-
-        # Subir el archivo CSV a S3
-        upload_file_to_s3(csv_buffer, csv_filename, original_filename)
-        st.success(f"Archivo de aceleradores guardado correctamente.")
+        return aceleradores_data
     except Exception as e:
         error_message = f"Error al guardar el archivo de aceleradores: {e}"
-        st.error(error_message)
+        notify("error", error_message)
         log_error_to_s3(error_message, original_filename)
+        return None
+
+# Clave del CSV de aceleradores de una carga
+def aceleradores_csv_key(original_filename, upload_datetime):
+    return f"Aceleradores-{upload_datetime}_{original_filename.split('.')[0]}.csv"
+
+# Mensajes al confirmar cada archivo de una carga
+ARTIFACT_MESSAGES = {
+    "resumen_rrhh": "Archivo 'Resumen RRHH' guardado correctamente.",
+    "aceleradores": "Archivo de aceleradores guardado correctamente.",
+}
+
+# Función para guardar los CSV de una carga validada (RRHH, tablero y aceleradores) en paralelo y confirmarlos
+# juntos con un manifiesto; las copias Parquet se guardan solo si la carga quedó confirmada.
+# artifacts: lista de (clave, DataFrame, dataset Parquet, metadatos, etapa). Devuelve True si se confirmó
+def save_upload_artifacts(artifacts, original_filename, upload_datetime, content_hash, subida, is_vendedores):
+    def writer(key, df, metadata, stage_name):
+        def write():
+            with stage(stage_name):
+                return upload_csv_to_s3(df, key, original_filename, metadata=metadata)
+        return write
+
+    upload_id = f"{upload_datetime}_{original_filename.split('.')[0]}"
+    writers = {key: writer(key, df, metadata, stage_name) for key, df, _, metadata, stage_name in artifacts}
+    manifest = commit_upload(storage, upload_id, original_filename, writers)
+    if manifest is None:
+        set_upload_status("error")
+        error_message = f"No se pudo guardar el archivo '{original_filename}' completo; no se cargó ninguna de sus tablas."
+        notify("error", error_message)
+        log_error_to_s3(error_message, original_filename)
+        return False
+
+    set_upload_status("subido")
+    for key, df, dataset, _, _ in artifacts:
+        if dataset == "tableros_vendedores":
+            record_upload_hash(content_hash, original_filename, key, subida)
+            notify("success", f"Archivo '{original_filename}' subido exitosamente.")
+            # Mostrar mensaje con el recuento de CUILs si es vendedores
+            if is_vendedores:
+                notify("info", f"Se cargaron {df['CUIL'].nunique()} tableros de colaboradores.")
+        else:
+            notify("success", ARTIFACT_MESSAGES[dataset])
+        with stage("parquet"):
+            upload_parquet_to_s3(df, dataset, original_filename, upload_datetime)
+    return True
+
+# Pool de hilos para guardar las cargas en segundo plano (uno por proceso, compartido entre sesiones)
+@st.cache_resource(show_spinner=False)
+def upload_worker():
+    return UploadWorker(opciones["subidas_en_segundo_plano"])
+
+# Función para mostrar el estado de las cargas en segundo plano de esta sesión y sus mensajes al terminar
+def show_upload_status():
+    jobs = [job for job in (upload_worker().get(job_id) for job_id in st.session_state.get("subidas", [])) if job is not None]
+    if not jobs:
+        return
+    st.subheader("Estado de las cargas")
+    for job in reversed(jobs):
+        if not job.terminada:
+            st.info(f"'{job.archivo}': {job.estado}...")
+            continue
+        with st.expander(f"'{job.archivo}': {job.estado} ({job.terminado.strftime('%H:%M:%S')})", expanded=job.estado == "error"):
+            for kind, message in job.mensajes:
+                getattr(st, kind)(message)
+    # Cuando terminan todas se vuelve a dibujar la página para dejar de consultar
+    if st.session_state.get("subidas_consultando") and all(job.terminada for job in jobs):
+        st.session_state["subidas_consultando"] = False
+        st.rerun()
 
 # Función principal de la aplicación
 def main():
@@ -691,5 +917,10 @@ def main():
             st.session_state["uploaded_file"] = uploaded_file.name
             process_and_upload_excel(uploaded_file, uploaded_file.name)
 
+    # Mientras haya cargas guardándose, el estado se vuelve a consultar cada 2 segundos (solo esta parte de la página)
+    jobs = [upload_worker().get(job_id) for job_id in st.session_state.get("subidas", [])]
+    st.session_state["subidas_consultando"] = any(job is not None and not job.terminada for job in jobs)
+    st.fragment(run_every=2 if st.session_state["subidas_consultando"] else None)(show_upload_status)()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import json
+import threading
+import uuid
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from storage import StorageKeyNotFound
+from error_log import ErrorSink, bind_error_sink, notify
+from metrics import bind_metrics
+
+# Cargas en segundo plano: cuando un Excel pasa la validación, sus archivos se guardan en un pool de hilos del
+# proceso y la pantalla vuelve enseguida; cada sesión consulta después el estado de sus cargas.
+# Los archivos de una carga se confirman juntos: antes de escribirlos se guarda un aviso en subidas/pendientes/
+# con sus claves y, cuando todos se guardaron, el manifiesto en subidas/confirmadas/. Mientras el aviso exista
+# los lectores ignoran esas claves (ver list_pending_keys), así nunca ven media carga.
+
+PENDING_PREFIX = "subidas/pendientes/"
+COMMITTED_PREFIX = "subidas/confirmadas/"
+
+# Segundos que se conserva el estado de una carga terminada para mostrarlo en la sesión
+JOB_RETENTION = 3600
+
+# Clave del aviso de una carga que se está guardando
+def pending_key(upload_id):
+    return f"{PENDING_PREFIX}{upload_id}.json"
+
+# Clave del manifiesto de una carga confirmada
+def committed_key(upload_id):
+    return f"{COMMITTED_PREFIX}{upload_id}.json"
+
+def _json_body(entry):
+    return json.dumps(entry, ensure_ascii=False).encode("utf-8")
+
+# Función para listar las claves de las cargas que todavía no se confirmaron (o que se cortaron a mitad de camino).
+# Normalmente no hay ningún aviso, así que cuesta un solo listado
+def list_pending_keys(storage):
+    keys = set()
+    for obj in storage.list(PENDING_PREFIX):
+        upload_id = obj['Key'][len(PENDING_PREFIX):-len('.json')]
+        # Si se escribió el manifiesto pero no se llegó a borrar el aviso, la carga está confirmada
+        if storage.head(committed_key(upload_id)) is not None:
+            continue
+        try:
+            keys.update(json.loads(storage.get(obj['Key']).decode("utf-8"))["claves"])
+        except StorageKeyNotFound:
+            # El aviso se borró entre el listado y la lectura: la carga terminó
+            continue
+    return keys
+
+# Función para guardar juntos los archivos de una carga. writers: {clave: función que guarda ese archivo y
+# devuelve True si pudo}; se ejecutan en paralelo. Devuelve el manifiesto, o None si algún archivo falló
+# (en ese caso se borran los que sí se guardaron y la carga no queda visible)
+def commit_upload(storage, upload_id, archivo, writers, max_workers=3):
+    claves = list(writers)
+    storage.put(pending_key(upload_id), _json_body({"archivo": archivo, "claves": claves}), content_type="application/json")
+
+    def write(key):
+        try:
+            return bool(writers[key]())
+        except Exception as e:
+            notify("error", f"Error al guardar '{key}': {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(claves)))) as executor:
+        results = dict(zip(claves, executor.map(bind_error_sink(bind_metrics(write)), claves)))
+
+    if not all(results.values()):
+        for key in [key for key, ok in results.items() if ok]:
+            storage.delete(key)
+        storage.delete(pending_key(upload_id))
+        return None
+
+    manifest = {"archivo": archivo, "claves": claves, "confirmado": datetime.now().isoformat(timespec="seconds")}
+    storage.put(committed_key(upload_id), _json_body(manifest), content_type="application/json")
+    storage.delete(pending_key(upload_id))
+    return manifest
+
+# Estado de una carga en segundo plano: "en cola", "guardando", "subido" o "error"
+class UploadJob:
+    def __init__(self, archivo):
+        self.id = uuid.uuid4().hex[:12]
+        self.archivo = archivo
+        self.estado = "en cola"
+        # Mensajes de la carga como (tipo, mensaje), para mostrarlos en la sesión que la envió
+        self.mensajes = []
+        self.enviado = datetime.now()
+        self.terminado = None
+
+    @property
+    def terminada(self):
+        return self.estado in ("subido", "error")
+
+# Pool de hilos para guardar las cargas, compartido por todas las sesiones del proceso
+class UploadWorker:
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="subidas")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    # func() guarda la carga y devuelve True si quedó confirmada. Corre con su propio acumulador de errores,
+    # silencioso (error_writer guarda el log al terminar y los mensajes quedan en la carga)
+    def submit(self, archivo, func, error_writer=None):
+        job = UploadJob(archivo)
+        with self._lock:
+            self._forget_old_jobs()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func, error_writer)
+        return job
+
+    def _run(self, job, func, error_writer):
+        job.estado = "guardando"
+        with ErrorSink(error_writer, quiet=True) as sink:
+            try:
+                ok = func()
+            except Exception as e:
+                notify("error", f"Error al guardar el archivo '{job.archivo}': {e}")
+                ok = False
+        job.mensajes = sink.displayed
+        job.terminado = datetime.now()
+        job.estado = "subido" if ok else "error"
+
+    def _forget_old_jobs(self):
+        now = datetime.now()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.terminada and (now - job.terminado).total_seconds() > JOB_RETENTION]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
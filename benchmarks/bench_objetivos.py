@@ -0,0 +1,65 @@
+import os
+import re
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from objetivos import OBJETIVO_COLUMNS, parse_objetivos
+
+# Implementación anterior (apply por celda y por columna), solo como referencia para comparar
+def legacy_parse_objetivos(data):
+    data = data.copy()
+    for col in OBJETIVO_COLUMNS:
+        def is_valid_objetivo(x):
+            if pd.isna(x) or isinstance(x, (int, float)):
+                return True
+            if isinstance(x, str):
+                return bool(re.match(r"^\s*-?\d+(\.\d+)?\s*%?\s*$", x))
+            return False
+        if (~data[col].apply(is_valid_objetivo)).any():
+            return None
+
+        def parse_objetivo(val):
+            if pd.isna(val):
+                return val
+            if isinstance(val, (int, float)):
+                return float(val)
+            val = val.strip().replace(",", ".")
+            if val.endswith("%"):
+                return float(val.rstrip("%").strip()) / 100
+            return float(val)
+        data[col] = data[col].apply(parse_objetivo)
+        data[col].dropna().apply(lambda x: isinstance(x, float)).all()
+    return data[OBJETIVO_COLUMNS]
+
+# Genera filas de indicadores con la mezcla habitual de valores: enteros, decimales, porcentajes y vacíos
+def sample_objetivos(rows):
+    patterns = [70, 0.9, "85%", "120 %", None, "1.5", 3]
+    values = [patterns[i % len(patterns)] for i in range(rows)]
+    return pd.DataFrame({col: pd.Series(values, dtype=object) for col in OBJETIVO_COLUMNS})
+
+def best_of(func, data, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el parseo de objetivos por apply contra el vectorizado.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8} {'apply (ms)':>12} {'vectorizado (ms)':>18} {'mejora':>8}")
+    for rows in args.rows:
+        data = sample_objetivos(rows)
+        legacy = best_of(legacy_parse_objetivos, data, args.repeat)
+        vectorized = best_of(parse_objetivos, data, args.repeat)
+        print(f"{rows:>8} {legacy * 1000:>12.2f} {vectorized * 1000:>18.2f} {legacy / vectorized:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from io import BytesIO
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from tableros_sinteticos import generate_tablero, tablero_filename, BASE_CUIL
+
+# Benchmark del flujo completo por etapas (lectura del Excel, formulario, reestructura, validación, duplicados y CSV)
+# contra un almacenamiento local precargado. Cada corrida agrega una línea por tamaño a un archivo JSONL
+# para comparar entre commits.
+# Uso: python benchmarks/bench_pipeline.py --hojas 1 10 40 --filas 10 50 --tableros-previos 200
+
+STAGES = ["lectura", "formulario", "reestructura", "validacion", "duplicados", "duplicados_sin_indice", "csv"]
+
+# Configuración temporal: almacenamiento local y sin procesos en paralelo, para medir cada etapa sola
+def configure(carpeta):
+    config_path = os.path.join(carpeta, "config.json")
+    with open(config_path, "w") as f:
+        json.dump({"almacenamiento": "local", "carpeta_local": os.path.join(carpeta, "almacenamiento"),
+                   "procesar_en_paralelo": False}, f)
+    os.environ["TABLEROS_CONFIG"] = config_path
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+# Función para precargar el período con tableros ya subidos (CSV + índice de CUILs), como en producción
+def populate_store(app, fecha_carpeta, tableros, rows):
+    upload_datetime = datetime.now().strftime('%d/%m/%Y_%H:%M:%S')
+    for number in range(tableros):
+        filename = tablero_filename(lider=f"Lider Previo {number}")
+        workbook = app.open_workbook(generate_tablero(sheets=1, rows=rows), "streaming")
+        df, _ = app.process_sheet(workbook, workbook.sheet_names[0], filename, upload_datetime)
+        df['CUIL'] = str(BASE_CUIL + 100000 + number)
+        buffer = BytesIO()
+        df.to_csv(buffer, index=False, encoding="utf-8-sig")
+        app.storage.put(f"{fecha_carpeta}/{number:06d}_{filename.split('.')[0]}.csv", buffer.getvalue())
+    app.rebuild_cuil_index(fecha_carpeta)
+
+def timed(stage_times, stage, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    stage_times[stage] = stage_times.get(stage, 0) + time.perf_counter() - start
+    return result
+
+# Función para medir una vez cada etapa de un tablero de "sheets" hojas y "rows" filas
+def run_pipeline(app, content, filename, fecha_carpeta):
+    stage_times = {}
+    upload_datetime = datetime.now().strftime('%d/%m/%Y_%H:%M:%S')
+    leader_name = app.extract_leader_name(filename)
+    fecha, sucursal = app.extract_date_and_sucursal(filename)
+
+    def parse_all():
+        workbook = app.open_workbook(BytesIO(content), app.opciones["lector_excel"])
+        return workbook, {name: workbook.parse(name, header=None) for name in workbook.sheet_names}
+
+    workbook, sheets = timed(stage_times, "lectura", parse_all)
+    if not timed(stage_times, "formulario", app.validate_all_form_cells, workbook, filename):
+        raise RuntimeError("El tablero sintético no pasó la validación del formulario")
+
+    frames = {}
+    for sheet_name, sheet_data in sheets.items():
+        form = app.extract_data_from_form(sheet_data)
+        cargo, cuil, segmento, area, comisiones, hs50, hs100, incentivo, ajuste = form
+        data = timed(stage_times, "reestructura", app.clean_and_restructure_until_empty,
+                     sheet_data, cargo, cuil, segmento, area, leader_name, fecha, sucursal, filename,
+                     upload_datetime, sheet_name, comisiones, hs50, hs100, incentivo, ajuste)
+        frames[sheet_name] = data
+
+    # Ponderaciones, fechas y CUILs de todas las hojas juntas, como en process_sheets_until_empty
+    def validate():
+        data = app.pd.concat(frames, names=['Hoja', None])
+        failing, fechas = app.sheets_failing_validation(data)
+        if failing or not app.validate_unique_cuils(data):
+            raise RuntimeError(f"El tablero sintético no pasó la validación en {sorted(failing) or 'los CUILs'}")
+        data['Ultima Fecha de Actualización'] = fechas
+        return data.reset_index(drop=True)
+    final_data = timed(stage_times, "validacion", validate)
+
+    timed(stage_times, "duplicados", app.check_for_duplicates, final_data['CUIL'].iloc[0], fecha_carpeta, leader_name)
+    timed(stage_times, "duplicados_sin_indice", app.rebuild_cuil_index, fecha_carpeta, False)
+
+    def serialize():
+        buffer = BytesIO()
+        final_data.to_csv(buffer, index=False, encoding="utf-8-sig")
+        return buffer.getvalue()
+    timed(stage_times, "csv", serialize)
+    return stage_times
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide cada etapa del flujo de carga con tableros sintéticos.")
+    parser.add_argument("--hojas", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--filas", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--tableros-previos", type=int, default=100, help="Tableros ya subidos en el período (para los duplicados)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por tamaño (se guarda la mejor de cada etapa)")
+    parser.add_argument("--lector", choices=["streaming", "pandas"], default=None, help="Lector de Excel (por defecto el configurado)")
+    parser.add_argument("--salida", default=os.path.join(ROOT, "benchmarks", "resultados_pipeline.jsonl"))
+    args = parser.parse_args()
+
+    carpeta = tempfile.mkdtemp(prefix="bench_tableros_")
+    try:
+        configure(carpeta)
+        from error_log import ErrorSink
+        import app
+        if args.lector:
+            app.opciones["lector_excel"] = args.lector
+
+        filename = tablero_filename()
+        fecha_carpeta = app.normalize_fecha_to_first_day(filename.split('+')[0])
+        with ErrorSink(None, quiet=True) as sink:
+            populate_store(app, fecha_carpeta, args.tableros_previos, 10)
+
+            commit = git_commit()
+            print(f"{'hojas':>6} {'filas':>6} " + " ".join(f"{stage:>22}" for stage in STAGES) + f" {'total':>10}")
+            with open(args.salida, "a", encoding="utf-8") as salida:
+                for sheets in args.hojas:
+                    for rows in args.filas:
+                        content = generate_tablero(sheets, rows).getvalue()
+                        runs = [run_pipeline(app, content, filename, fecha_carpeta) for _ in range(args.repeat)]
+                        best = {stage: min(run[stage] for run in runs) * 1000 for stage in STAGES}
+                        total = sum(best.values())
+                        print(f"{sheets:>6} {rows:>6} " + " ".join(f"{best[stage]:>22.2f}" for stage in STAGES) + f" {total:>10.2f}")
+                        salida.write(json.dumps({
+                            "fecha": datetime.now().isoformat(timespec="seconds"),
+                            "commit": commit,
+                            "lector": app.opciones["lector_excel"],
+                            "hojas": sheets,
+                            "filas": rows,
+                            "tableros_previos": args.tableros_previos,
+                            "repeticiones": args.repeat,
+                            "etapas_ms": {stage: round(value, 3) for stage, value in best.items()},
+                            "total_ms": round(total, 3),
+                        }) + "\n")
+        if sink.displayed:
+            print(f"Mensajes durante la medición: {sink.displayed[:3]}", file=sys.stderr)
+        print(f"Resultados agregados a {args.salida}")
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import argparse
+from io import BytesIO
+from datetime import datetime, timedelta
+import openpyxl
+
+# Generador de tableros sintéticos con el formato que espera process_sheets_until_empty:
+# formulario B1:B4 (Cargo, CUIL, Segmento, Área), extras K1:K5, tabla desde "Tipo Indicador" cortada por
+# una fila vacía en "Indicadores de Gestion". La variante de vendedores lleva el CUIL en B1,
+# los aceleradores en H2:M2 y una hoja "Resumen RRHH" con el encabezado en la fila 2.
+
+INDICATOR_HEADER = [
+    'Tipo Indicador', 'Tipo Dato', 'Indicadores de Gestion', 'Ponderacion',
+    'Objetivo Aceptable (70%)', 'Objetivo Muy Bueno (90%)', 'Objetivo Excelente (120%)',
+    'Resultado', '% Logro', 'Calificación', 'Ultima Fecha de Actualización',
+    'Lider Revisor', 'Comentario'
+]
+HEADER_ROW = 7
+
+RESUMEN_RRHH_COLUMNS = [
+    'Sucursal', 'Vendedores', 'CUIT', 'LEGAJO', 'Total Ventas', 'Vta PPAA',
+    'Descuentos PPAA', 'COMISION PPAA', '0km', 'Usados', 'Premio Convencional',
+    'Comision Convencional', 'Total a liquidar'
+]
+
+# Variantes inválidas: cada una rompe una sola regla del validador
+INVALID_VARIANTS = {
+    "cuil_invalido": "CUIL del formulario con letras",
+    "formulario_vacio": "Celda B3 vacía",
+    "extra_no_numerico": "K2 con texto",
+    "objetivo_texto": "Objetivo Aceptable con texto",
+    "ponderacion_cero": "Una fila con ponderación 0",
+    "ponderacion_suma": "Ponderaciones que no suman 100%",
+    "fecha_formato": "Fecha de actualización con formato inválido",
+    "fecha_futura": "Fecha de actualización posterior a hoy",
+    "columna_faltante": "Sin la columna 'Lider Revisor'",
+    "cuil_repetido": "El mismo CUIL en dos hojas",
+    "rrhh_faltante": "Tablero de vendedores sin la hoja 'Resumen RRHH'",
+}
+
+BASE_CUIL = 20300000000
+
+# Nombre de archivo válido para el mes anterior (o el indicado): dd-mm-aaaa+sucursal+lider.xlsx
+def tablero_filename(sucursal="Sucursal Centro", lider="Lider Prueba", fecha=None, vendedores=False):
+    if fecha is None:
+        hoy = datetime.now()
+        fecha = (hoy.replace(day=1) - timedelta(days=1)).replace(day=5)
+    if vendedores and "Vendedores" not in sucursal:
+        sucursal = f"Vendedores {sucursal}"
+    return f"{fecha.strftime('%d-%m-%Y')}+{sucursal}+{lider}.xlsx"
+
+def _indicator_rows(sheet, rows, variant):
+    ponderacion = 1 / rows
+    fecha = (datetime.now() - timedelta(days=3)).strftime('%d/%m/%Y')
+    for row in range(rows):
+        values = [
+            'Comercial' if row % 2 else 'Calidad', '%' if row % 3 else 'Número', f'Indicador {row + 1}', ponderacion,
+            0.7, '90%', 1.2, 0.85, 0.95, 'Muy Bueno', fecha, 'Lider Revisor', ''
+        ]
+        if row == 0:
+            if variant == "objetivo_texto":
+                values[4] = 'setenta'
+            elif variant == "ponderacion_cero":
+                values[3] = 0
+            elif variant == "ponderacion_suma":
+                values[3] = ponderacion + 0.5
+            elif variant == "fecha_formato":
+                values[10] = '2025-13-45'
+            elif variant == "fecha_futura":
+                values[10] = (datetime.now() + timedelta(days=40)).strftime('%d/%m/%Y')
+        for column, value in enumerate(values, start=1):
+            sheet.cell(HEADER_ROW + 1 + row, column, value)
+    # Fila vacía que corta la tabla y una fila de totales después, como en las plantillas reales
+    sheet.cell(HEADER_ROW + rows + 2, 1, 'Total')
+    sheet.cell(HEADER_ROW + rows + 2, 4, 1)
+
+def _header(sheet, variant):
+    for column, name in enumerate(INDICATOR_HEADER, start=1):
+        if variant == "columna_faltante" and name == 'Lider Revisor':
+            name = 'Revisor'
+        sheet.cell(HEADER_ROW, column, name)
+
+def _tablero_sheet(book, index, rows, variant):
+    sheet = book.create_sheet(f"Colaborador {index + 1}")
+    cuil = BASE_CUIL if variant == "cuil_repetido" else BASE_CUIL + index
+    form = [('Cargo', 'Asesor Comercial'), ('CUIL', str(cuil)), ('Segmento', 'Segmento A'), ('Área de influencia', 'Zona Norte')]
+    if index == 0 and variant == "cuil_invalido":
+        form[1] = ('CUIL', '20-ABC-1')
+    if index == 0 and variant == "formulario_vacio":
+        form[2] = ('Segmento', None)
+    for row, (label, value) in enumerate(form, start=1):
+        sheet.cell(row, 1, label)
+        sheet.cell(row, 2, value)
+    extras = [('COMISIONES ACCESORIAS', 2), ('HS EXTRAS AL 50', 4.5), ('HS EXTRAS AL 100', 1.5),
+              ('INCENTIVO PRODUCTIVIDAD', 1000), ('AJUSTE INCENTIVO', 0)]
+    for row, (label, value) in enumerate(extras, start=1):
+        sheet.cell(row, 10, label)
+        sheet.cell(row, 11, 'dos' if index == 0 and variant == "extra_no_numerico" and row == 2 else value)
+    _header(sheet, variant)
+    _indicator_rows(sheet, rows, variant if index == 0 else None)
+
+def _vendedor_sheet(book, index, rows, variant):
+    sheet = book.create_sheet(f"Vendedor {index + 1}")
+    cuil = BASE_CUIL if variant == "cuil_repetido" else BASE_CUIL + index
+    sheet.cell(1, 1, 'CUIL')
+    sheet.cell(1, 2, '20-ABC-1' if index == 0 and variant == "cuil_invalido" else str(cuil))
+    sheet.cell(2, 1, 'Segmento')
+    sheet.cell(2, 2, 'Vendedor 0km')
+    for column in range(8, 14):
+        sheet.cell(1, column, f'Acelerador {column - 7}')
+        sheet.cell(2, column, round(0.1 * (column - 7), 2))
+    _header(sheet, variant)
+    _indicator_rows(sheet, rows, variant if index == 0 else None)
+
+def _resumen_rrhh_sheet(book, vendedores):
+    sheet = book.create_sheet("Resumen RRHH")
+    sheet.cell(1, 1, 'Resumen de liquidación')
+    for column, name in enumerate(RESUMEN_RRHH_COLUMNS, start=1):
+        sheet.cell(2, column, name)
+    for row in range(vendedores):
+        values = ['Sucursal Centro', f'Vendedor {row + 1}', str(BASE_CUIL + row), 1000 + row, 5, 2, 0, 1500.0, 3, 2, 800.0, 1200.0, 3500.0]
+        for column, value in enumerate(values, start=1):
+            sheet.cell(3 + row, column, value)
+
+# Función para generar un tablero con "sheets" hojas de "rows" indicadores. Devuelve el .xlsx en memoria
+# variant es None (válido) o una de INVALID_VARIANTS; vendedores=True genera el formato de vendedores
+def generate_tablero(sheets=3, rows=10, variant=None, vendedores=False):
+    if variant is not None and variant not in INVALID_VARIANTS:
+        raise ValueError(f"Variante desconocida: '{variant}'")
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for index in range(sheets):
+        if vendedores:
+            _vendedor_sheet(book, index, rows, variant)
+        else:
+            _tablero_sheet(book, index, rows, variant)
+    if vendedores and variant != "rrhh_faltante":
+        _resumen_rrhh_sheet(book, sheets)
+    buffer = BytesIO()
+    book.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+# Genera en una carpeta un tablero válido y uno por cada variante inválida (para probar con ingest_cli.py)
+def main():
+    parser = argparse.ArgumentParser(description="Genera tableros sintéticos (válidos e inválidos).")
+    parser.add_argument("carpeta", help="Carpeta de salida")
+    parser.add_argument("--hojas", type=int, default=3)
+    parser.add_argument("--filas", type=int, default=10)
+    parser.add_argument("--vendedores", action="store_true", help="Generar el formato de vendedores con 'Resumen RRHH'")
+    parser.add_argument("--invalidos", action="store_true", help="Generar también una variante por cada regla inválida")
+    args = parser.parse_args()
+
+    os.makedirs(args.carpeta, exist_ok=True)
+    variants = [None] + (list(INVALID_VARIANTS) if args.invalidos else [])
+    for number, variant in enumerate(variants):
+        filename = tablero_filename(lider=f"Lider {variant or 'valido'}", vendedores=args.vendedores)
+        with open(os.path.join(args.carpeta, filename), "wb") as f:
+            f.write(generate_tablero(args.hojas, args.filas, variant, args.vendedores).getvalue())
+        print(filename)
+
+if __name__ == "__main__":
+    main()
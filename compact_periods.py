@@ -0,0 +1,25 @@
+import argparse
+from app import storage, opciones, normalize_fecha_to_first_day
+from compaction import compact_period
+
+# Compacta los tableros de uno o más períodos en un Parquet por período (la última subida de cada CUIL).
+# Se puede volver a ejecutar: solo se leen las subidas posteriores a la última compactación.
+# Uso: python compact_periods.py 01-03-2025 01-04-2025
+def main():
+    parser = argparse.ArgumentParser(description="Compacta los tableros de cada período (01-MM-AAAA) en un único Parquet.")
+    parser.add_argument("periodos", nargs="+", help="Fechas de los períodos a compactar (dd-mm-aaaa)")
+    parser.add_argument("--workers", type=int, help="CSV leídos en simultáneo (por defecto s3_max_conexiones)")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar qué se compactaría sin escribir nada")
+    args = parser.parse_args()
+
+    workers = args.workers or opciones["s3_max_conexiones"]
+    for periodo in args.periodos:
+        fecha_carpeta = normalize_fecha_to_first_day(periodo)
+        manifest = compact_period(storage, fecha_carpeta, max_workers=workers, dry_run=args.dry_run)
+        if manifest is None:
+            print(f"{fecha_carpeta}: sin tableros para compactar")
+        else:
+            print(f"{fecha_carpeta}: {manifest['cuils']} CUILs, {manifest['filas']} filas de {len(manifest['fuentes'])} subidas")
+
+if __name__ == "__main__":
+    main()
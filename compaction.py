@@ -0,0 +1,112 @@
+import json
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from storage import StorageKeyNotFound
+from csv_objects import read_csv_object
+from parquet_output import parquet_available, typed_frame
+from metrics import bind_metrics
+from background_uploads import list_pending_keys
+
+# Compactación mensual: junta los CSV de cada subida de un período en un único Parquet tipado, donde para cada
+# CUIL queda solo el tablero de la subida más reciente ("Fecha Horario Subida"). Un manifiesto lista las claves
+# de origen ya incluidas, así que volver a ejecutarla solo lee las subidas nuevas.
+
+COMPACTED_PREFIX = "compactado/"
+UPLOAD_DATE_FORMAT = '%d/%m/%Y_%H:%M:%S'
+SOURCE_COLUMN = 'Clave Origen'
+
+# Clave del dataset compactado de un período
+def compacted_key(fecha_carpeta):
+    return f"{COMPACTED_PREFIX}{fecha_carpeta}/tableros.parquet"
+
+# Clave del manifiesto de un período (se escribe después del dataset)
+def manifest_key(fecha_carpeta):
+    return f"{COMPACTED_PREFIX}{fecha_carpeta}/manifest.json"
+
+# Función para leer el manifiesto de la última compactación de un período (None si nunca se compactó)
+def load_manifest(storage, fecha_carpeta):
+    try:
+        body = storage.get(manifest_key(fecha_carpeta))
+    except StorageKeyNotFound:
+        return None
+    return json.loads(body.decode("utf-8"))
+
+# Función para listar los CSV de las subidas de un período, ordenados por clave (la clave empieza con la fecha de subida).
+# Se omiten los de cargas que todavía no se confirmaron
+def list_upload_keys(storage, fecha_carpeta):
+    pending = list_pending_keys(storage)
+    keys = [obj['Key'] for obj in storage.list(f"{fecha_carpeta}/") if obj['Key'].endswith('.csv') and obj['Key'] not in pending]
+    return sorted(keys)
+
+# Función para leer el CSV de una subida y tiparlo igual que la salida Parquet
+def read_upload(storage, key):
+    df = read_csv_object(storage.get(key), dtype={'CUIL': str})
+    df[SOURCE_COLUMN] = key
+    return typed_frame(df, {'Fecha Horario Subida': UPLOAD_DATE_FORMAT})
+
+# Función para quedarse, por cada CUIL, con las filas de la subida más reciente. Si dos subidas tienen la misma
+# fecha (o no la tienen, en CSV viejos) gana la de clave mayor, que es la subida posterior
+def latest_per_cuil(df):
+    if df.empty:
+        return df
+    subida = df['Fecha Horario Subida'] if 'Fecha Horario Subida' in df.columns else pd.Series(pd.NaT, index=df.index)
+    if not pd.api.types.is_datetime64_any_dtype(subida):
+        subida = pd.to_datetime(subida, format=UPLOAD_DATE_FORMAT, errors='coerce')
+    subidas = pd.DataFrame({'CUIL': df['CUIL'], 'clave': df[SOURCE_COLUMN], 'subida': subida})
+    subidas['subida'] = subidas.groupby('clave')['subida'].transform('max')
+    orden = subidas.drop_duplicates(['CUIL', 'clave']).sort_values(['subida', 'clave'], na_position='first', kind='stable')
+    ganadoras = orden.drop_duplicates('CUIL', keep='last').set_index('CUIL')['clave']
+    mask = df['CUIL'].map(ganadoras).to_numpy() == df[SOURCE_COLUMN].to_numpy()
+    return df[mask].reset_index(drop=True)
+
+# Función para compactar un período. Con dry_run=True no se escribe nada. Devuelve el manifiesto resultante
+def compact_period(storage, fecha_carpeta, max_workers=8, dry_run=False):
+    if not parquet_available():
+        raise RuntimeError("La compactación guarda Parquet y pyarrow no está instalado.")
+
+    manifest = load_manifest(storage, fecha_carpeta)
+    covered = set(manifest["fuentes"]) if manifest else set()
+    keys = list_upload_keys(storage, fecha_carpeta)
+    new_keys = [key for key in keys if key not in covered]
+    if not new_keys:
+        return manifest
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        frames = list(executor.map(bind_metrics(lambda key: read_upload(storage, key)), new_keys))
+
+    if manifest is not None:
+        existing = pd.read_parquet(BytesIO(storage.get(manifest["datos"])), engine="pyarrow")
+        # Si una ejecución anterior se cortó entre el dataset y el manifiesto, esas subidas se vuelven a leer
+        existing = existing[~existing[SOURCE_COLUMN].isin(new_keys)]
+        frames.insert(0, existing)
+
+    frames = [frame for frame in frames if not frame.empty]
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['CUIL', SOURCE_COLUMN])
+    compacted = typed_frame(latest_per_cuil(combined), {'Fecha Horario Subida': UPLOAD_DATE_FORMAT})
+
+    result = {
+        "periodo": fecha_carpeta,
+        "datos": compacted_key(fecha_carpeta),
+        "fuentes": sorted(covered.union(new_keys)),
+        "ultima_clave": keys[-1],
+        "filas": int(len(compacted)),
+        "cuils": int(compacted['CUIL'].nunique()),
+        "generado": datetime.now().isoformat(timespec="seconds"),
+    }
+    if dry_run:
+        return result
+
+    buffer = BytesIO()
+    compacted.to_parquet(buffer, index=False, engine="pyarrow")
+    storage.put(result["datos"], buffer.getvalue(), content_type="application/vnd.apache.parquet")
+    storage.put(manifest_key(fecha_carpeta), json.dumps(result, ensure_ascii=False).encode("utf-8"), content_type="application/json")
+    return result
+
+# Función para leer el dataset compactado de un período (None si nunca se compactó)
+def read_compacted(storage, fecha_carpeta):
+    manifest = load_manifest(storage, fecha_carpeta)
+    if manifest is None:
+        return None
+    return pd.read_parquet(BytesIO(storage.get(manifest["datos"])), engine="pyarrow")
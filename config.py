@@ -1,28 +1,105 @@
-import json
-import os
-import streamlit as st
-
-def cargar_configuracion():
-
-    # # Configuracion Local
-    # # Cargar configuración desde el archivo config.json
-    # with open("../config.json") as config_file:
-    #     config = json.load(config_file)
-
-    # # Desempaquetar las credenciales desde el archivo de configuración
-    # aws_access_key = config["aws_access_key"]
-    # aws_secret_key = config["aws_secret_key"]
-    # region_name = config["region_name"]
-    # bucket_name = config["bucket_name"]
-    # users = config["users"]
-    # passwords = config["passwords"]
-
-    #Configuracion Streamlit
-    aws_access_key = st.secrets["aws_access_key"]
-    aws_secret_key = st.secrets["aws_secret_key"]
-    region_name = st.secrets["region_name"]
-    bucket_name = st.secrets["bucket_name"]
-    users = st.secrets["users"]
-    passwords = st.secrets["passwords"]
-
-    return aws_access_key, aws_secret_key, region_name, bucket_name, users, passwords
\ No newline at end of file
+import json
+import os
+import streamlit as st
+
+# Variable de entorno con la ruta de un config.json (para correr sin Streamlit, por ejemplo desde ingest_cli.py)
+CONFIG_ENV_VAR = "TABLEROS_CONFIG"
+
+# Variables de entorno que se usan si no hay config.json ni secrets de Streamlit
+ENV_VARS = {
+    "aws_access_key": "AWS_ACCESS_KEY_ID",
+    "aws_secret_key": "AWS_SECRET_ACCESS_KEY",
+    "region_name": "AWS_DEFAULT_REGION",
+    "bucket_name": "TABLEROS_BUCKET",
+}
+
+# Función para leer la configuración: config.json indicado en TABLEROS_CONFIG, secrets de Streamlit o variables de entorno
+def cargar_secretos():
+    ruta = os.environ.get(CONFIG_ENV_VAR)
+    if ruta:
+        with open(ruta) as config_file:
+            return json.load(config_file)
+    try:
+        return st.secrets.to_dict()
+    except Exception:
+        # Sin secrets.toml (por ejemplo, fuera de Streamlit)
+        return {clave: os.environ[variable] for clave, variable in ENV_VARS.items() if variable in os.environ}
+
+def cargar_configuracion():
+
+    # # Configuracion Local
+    # # Cargar configuración desde el archivo config.json
+    # with open("../config.json") as config_file:
+    #     config = json.load(config_file)
+
+    # # Desempaquetar las credenciales desde el archivo de configuración
+    # aws_access_key = config["aws_access_key"]
+    # aws_secret_key = config["aws_secret_key"]
+    # region_name = config["region_name"]
+    # bucket_name = config["bucket_name"]
+    # users = config["users"]
+    # passwords = config["passwords"]
+
+    #Configuracion Streamlit (o config.json / variables de entorno, ver cargar_secretos)
+    secretos = cargar_secretos()
+    # Con almacenamiento "local" no hacen falta credenciales de AWS
+    aws_access_key = secretos.get("aws_access_key")
+    aws_secret_key = secretos.get("aws_secret_key")
+    region_name = secretos.get("region_name")
+    bucket_name = secretos.get("bucket_name")
+    users = secretos.get("users", [])
+    passwords = secretos.get("passwords", [])
+
+    return aws_access_key, aws_secret_key, region_name, bucket_name, users, passwords
+
+# Opciones opcionales de la aplicación (si no están en los secrets se usan los valores por defecto)
+def cargar_opciones():
+    secretos = cargar_secretos()
+    return {
+        # Guardar además una copia tipada en Parquet particionada por período y sucursal
+        "escribir_parquet": bool(secretos.get("escribir_parquet", False)),
+        # Lector de Excel: "streaming" (solo las celdas del tablero) o "pandas" (hoja completa con pd.ExcelFile)
+        "lector_excel": secretos.get("lector_excel", "streaming"),
+        # Procesar las hojas en varios procesos cuando el Excel tiene al menos "hojas_minimas_paralelo" hojas.
+        # Desactivado por defecto: el pool usa fork y el servidor de Streamlit tiene varios hilos
+        "procesar_en_paralelo": bool(secretos.get("procesar_en_paralelo", False)),
+        "hojas_minimas_paralelo": int(secretos.get("hojas_minimas_paralelo", 8)),
+        "procesos_hojas": secretos.get("procesos_hojas", None),
+        # Cantidad de archivos que se procesan a la vez en la carga múltiple
+        "cargas_simultaneas": int(secretos.get("cargas_simultaneas", 4)),
+        # Dónde se guardan los tableros: "s3" (bucket_name) o "local" (carpeta_local, mismas claves que en S3)
+        "almacenamiento": secretos.get("almacenamiento", "s3"),
+        "carpeta_local": secretos.get("carpeta_local", "almacenamiento_local"),
+        # Guardar los CSV comprimidos con gzip. Desactivado por defecto: la clave sigue terminando en .csv y, aunque S3
+        # los marca con Content-Encoding: gzip, quien los lea con boto3 o desde la consola recibe los bytes comprimidos
+        "comprimir_csv": bool(secretos.get("comprimir_csv", False)),
+        # Cliente de S3: conexiones simultáneas, reintentos por pedido (modo adaptativo) y timeouts en segundos
+        "s3_max_conexiones": int(secretos.get("s3_max_conexiones", 50)),
+        "s3_reintentos": int(secretos.get("s3_reintentos", 8)),
+        "s3_timeout_conexion": float(secretos.get("s3_timeout_conexion", 5)),
+        "s3_timeout_lectura": float(secretos.get("s3_timeout_lectura", 30)),
+        # Métricas por carga (tiempo por etapa y pedidos al almacenamiento) en un JSONL local y, opcionalmente, en el almacenamiento.
+        # medir_memoria usa tracemalloc (hace más lenta la carga y con cargas simultáneas el pico es aproximado)
+        "registrar_metricas": bool(secretos.get("registrar_metricas", True)),
+        "medir_memoria": bool(secretos.get("medir_memoria", False)),
+        "metricas_archivo": secretos.get("metricas_archivo", "metricas/cargas.jsonl"),
+        "metricas_en_almacenamiento": bool(secretos.get("metricas_en_almacenamiento", False)),
+        # Memoria máxima (MB por sesión) de los tableros ya validados que se guardan para confirmar un Ajuste sin reprocesar
+        "cache_tableros_mb": int(secretos.get("cache_tableros_mb", 64)),
+        # Segundos que la página de reportes reutiliza los listados y consultas antes de volver a leer el almacenamiento
+        "reportes_ttl_segundos": int(secretos.get("reportes_ttl_segundos", 300)),
+        # Guardar los archivos de una carga ya validada en segundo plano (la pantalla no espera a S3) y cuántas a la vez
+        "subir_en_segundo_plano": bool(secretos.get("subir_en_segundo_plano", True)),
+        "subidas_en_segundo_plano": int(secretos.get("subidas_en_segundo_plano", 4)),
+        # Cola de carga: los Excel se encolan en una base SQLite local y los procesan "cola_workers" hilos del proceso.
+        # Desactivada por defecto (cada sesión procesa sus archivos como antes)
+        "cola_de_carga": bool(secretos.get("cola_de_carga", False)),
+        "cola_archivo": secretos.get("cola_archivo", "cola/ingesta.sqlite3"),
+        "cola_workers": int(secretos.get("cola_workers", 2)),
+        # Recorridos completos de un período en el almacenamiento (reconstrucción del índice de CUILs) a la vez por proceso
+        "escaneos_simultaneos": int(secretos.get("escaneos_simultaneos", 2)),
+        # Cache en disco de los tableros ya leídos del almacenamiento (se revalida con el ETag), con un máximo en MB
+        "cache_disco": bool(secretos.get("cache_disco", True)),
+        "cache_disco_carpeta": secretos.get("cache_disco_carpeta", "cache/objetos"),
+        "cache_disco_mb": int(secretos.get("cache_disco_mb", 512)),
+    }
@@ -0,0 +1,31 @@
+import io
+import gzip
+import pandas as pd
+
+# Escritura y lectura de los CSV guardados en el almacenamiento.
+# Los CSV se escriben en streaming (sin armar el archivo completo en memoria) y, si está activado, comprimidos
+# con gzip y Content-Encoding: gzip, así las descargas por HTTP los descomprimen solas. Las claves siguen
+# terminando en .csv; los lectores de la app detectan la compresión por el contenido.
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Filas que pandas serializa por vez al escribir en streaming
+CSV_CHUNK_ROWS = 5000
+
+# Función para escribir un DataFrame como CSV directamente en el almacenamiento. Devuelve los bytes guardados
+def write_csv_object(storage, key, df, compress=False, metadata=None, encoding="utf-8-sig"):
+    with storage.open_writer(key, content_type="text/csv", metadata=metadata,
+                             content_encoding="gzip" if compress else None) as raw:
+        stream = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if compress else raw
+        text = io.TextIOWrapper(stream, encoding=encoding, newline="")
+        df.to_csv(text, index=False, chunksize=CSV_CHUNK_ROWS)
+        text.flush()
+        text.detach()  # Sin cerrar raw: la subida se completa al salir del bloque "with"
+        if compress:
+            stream.close()
+        return raw.bytes_written
+
+# Función para leer un CSV del almacenamiento (comprimido o no); los kwargs se pasan a pd.read_csv
+def read_csv_object(body, **kwargs):
+    compression = "gzip" if body[:2] == GZIP_MAGIC else None
+    return pd.read_csv(io.BytesIO(body), compression=compression, **kwargs)
@@ -0,0 +1,81 @@
+import gzip
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from storage import StorageKeyNotFound, StoragePreconditionFailed
+from csv_objects import read_csv_object
+from compaction import SOURCE_COLUMN, list_upload_keys, latest_per_cuil
+from metrics import bind_metrics
+
+# Vista "tablero vigente por CUIL" de cada período: un único CSV con las filas de la última subida de cada
+# colaborador. Se actualiza después de cada subida (solo se reemplazan los CUILs del tablero subido) con una
+# escritura condicional sobre el ETag leído: si otra carga la cambió en el medio, se vuelve a leer y se reintenta.
+
+VIEW_PREFIX = "vistas/tableros_vigentes/"
+
+# Veces que se reintenta la actualización cuando otra carga escribió la vista al mismo tiempo
+VIEW_UPDATE_ATTEMPTS = 8
+VIEW_RETRY_WAIT = 0.05
+
+# Clave de la vista de un período
+def current_view_key(fecha_carpeta):
+    return f"{VIEW_PREFIX}{fecha_carpeta}.csv"
+
+# Función para leer la vista de un período (None si todavía no existe). Los valores se leen como texto
+def read_current_view(storage, fecha_carpeta):
+    try:
+        body = storage.get(current_view_key(fecha_carpeta))
+    except StorageKeyNotFound:
+        return None
+    return read_csv_object(body, dtype=str, encoding="utf-8-sig")
+
+# Función para serializar la vista como CSV comprimido (se escribe de una vez para poder hacerlo condicional)
+def _view_body(view, compress):
+    data = view.to_csv(index=False).encode("utf-8-sig")
+    return gzip.compress(data, compresslevel=6) if compress else data
+
+# Función para agregar a la vista las filas de una subida; la subida más reciente de cada CUIL reemplaza a las anteriores
+def merge_into_view(view, df, source_key):
+    update = df.astype(str).where(df.notna())
+    update[SOURCE_COLUMN] = source_key
+    if view is None or view.empty:
+        return latest_per_cuil(update)
+    # Solo se comparan los CUILs del tablero nuevo, el resto de la vista queda igual
+    afectados = view['CUIL'].isin(update['CUIL'])
+    merged = latest_per_cuil(pd.concat([view[afectados & (view[SOURCE_COLUMN] != source_key)], update], ignore_index=True))
+    return pd.concat([view[~afectados], merged], ignore_index=True)[list(dict.fromkeys([*view.columns, *update.columns]))]
+
+# Función para armar la vista de un período desde cero con todas sus subidas (solo si todavía no existe)
+def build_current_view(storage, fecha_carpeta, max_workers=8):
+    def read_upload(key):
+        df = read_csv_object(storage.get(key), dtype=str, encoding="utf-8-sig")
+        df[SOURCE_COLUMN] = key
+        return df
+    keys = list_upload_keys(storage, fecha_carpeta)
+    if not keys:
+        return None
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        frames = [frame for frame in executor.map(bind_metrics(read_upload), keys) if not frame.empty]
+    return latest_per_cuil(pd.concat(frames, ignore_index=True)) if frames else None
+
+# Función para actualizar la vista del período con una subida. Devuelve la cantidad de filas de la vista
+def update_current_view(storage, fecha_carpeta, df, source_key, compress=False):
+    key = current_view_key(fecha_carpeta)
+    for attempt in range(VIEW_UPDATE_ATTEMPTS):
+        try:
+            body, etag = storage.get_with_etag(key)
+            view = read_csv_object(body, dtype=str, encoding="utf-8-sig")
+        except StorageKeyNotFound:
+            # Primera subida desde que existe la vista: se arma una vez con las subidas anteriores del período
+            etag = None
+            view = build_current_view(storage, fecha_carpeta)
+        view = merge_into_view(view, df, source_key)
+        try:
+            storage.put_if(key, _view_body(view, compress), etag, content_type="text/csv",
+                           content_encoding="gzip" if compress else None)
+            return len(view)
+        except StoragePreconditionFailed:
+            # Otra carga actualizó la vista: se espera un poco (al azar, para no volver a chocar) y se lee la versión nueva
+            time.sleep(random.uniform(0, VIEW_RETRY_WAIT * 2 ** attempt))
+    raise RuntimeError(f"No se pudo actualizar la vista '{key}' después de {VIEW_UPDATE_ATTEMPTS} intentos.")
@@ -0,0 +1,115 @@
+import threading
+import uuid
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from storage import StorageKeyNotFound
+from csv_objects import read_csv_object
+
+# Log de errores particionado por día: cada carga escribe un objeto nuevo en lugar de reescribir Errores.txt
+ERROR_LOG_PREFIX = "errores/"
+LEGACY_ERROR_LOG = "Errores.txt"
+ERROR_COLUMNS = ["Fecha", "Hora", "Error", "NombreArchivo"]
+
+_local = threading.local()
+
+# Clave de un lote de errores: errores/AAAA-MM-DD/HH-MM-SS_{id}.csv
+def error_log_key(now):
+    return f"{ERROR_LOG_PREFIX}{now.strftime('%Y-%m-%d')}/{now.strftime('%H-%M-%S')}_{uuid.uuid4().hex[:12]}.csv"
+
+# Acumula los errores de una carga y los guarda todos juntos al salir del bloque "with"
+class ErrorSink:
+    def __init__(self, writer, quiet=False):
+        # writer(key, df) es la función que guarda el lote como CSV (S3 u otro almacenamiento).
+        # Con writer=None los errores solo se acumulan en entries (por ejemplo, en un proceso hijo)
+        self.writer = writer
+        self.entries = []
+        # Con quiet=True los mensajes no se muestran en pantalla: se guardan en displayed como (tipo, mensaje)
+        self.quiet = quiet
+        self.displayed = []
+
+    def add(self, error_message, filename):
+        now = datetime.now()
+        self.entries.append({
+            "Fecha": now.strftime('%Y-%m-%d'),
+            "Hora": now.strftime('%H:%M'),
+            "Error": error_message,
+            "NombreArchivo": filename
+        })
+
+    def flush(self):
+        if not self.entries or self.writer is None:
+            return None
+        log_df = pd.DataFrame(self.entries, columns=ERROR_COLUMNS)
+        key = error_log_key(datetime.now())
+        self.writer(key, log_df)
+        self.entries = []
+        return key
+
+    def messages(self):
+        return [entry["Error"] for entry in self.entries]
+
+    def __enter__(self):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.stack.remove(self)
+        self.flush()
+        return False
+
+# Devuelve el acumulador activo en este hilo (None si no hay ninguna carga en curso)
+def current_error_sink():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+# Devuelve func para usar en otros hilos (ThreadPoolExecutor) acumulando en el acumulador de la carga actual
+def bind_error_sink(func):
+    sink = current_error_sink()
+    if sink is None:
+        return func
+    def bound(*args, **kwargs):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(sink)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.stack.remove(sink)
+    return bound
+
+# Función para mostrar un mensaje ("error", "success", "info" o "warning").
+# Dentro de un acumulador silencioso (cargas en lote, procesos hijos) solo se guarda para mostrarlo después
+def notify(kind, message):
+    sink = current_error_sink()
+    if sink is not None and sink.quiet:
+        sink.displayed.append((kind, message))
+        return
+    getattr(st, kind)(message)
+
+# Función para leer los errores guardados y unirlos en la tabla Fecha/Hora/Error/NombreArchivo
+def read_error_log(storage, desde=None, hasta=None, include_legacy=True):
+    frames = []
+    if include_legacy:
+        try:
+            frames.append(read_csv_object(storage.get(LEGACY_ERROR_LOG), encoding="utf-8-sig"))
+        except StorageKeyNotFound:
+            pass
+
+    for obj in storage.list(ERROR_LOG_PREFIX):
+        # La fecha está en la clave, así que se filtra sin descargar el objeto
+        dia = obj['Key'][len(ERROR_LOG_PREFIX):].split('/')[0]
+        if (desde and dia < desde) or (hasta and dia > hasta):
+            continue
+        frames.append(read_csv_object(storage.get(obj['Key']), encoding="utf-8-sig"))
+
+    if not frames:
+        return pd.DataFrame(columns=ERROR_COLUMNS)
+    log_df = pd.concat(frames, ignore_index=True)[ERROR_COLUMNS]
+    if desde:
+        log_df = log_df[log_df["Fecha"] >= desde]
+    if hasta:
+        log_df = log_df[log_df["Fecha"] <= hasta]
+    return log_df.sort_values(["Fecha", "Hora"], kind="stable").reset_index(drop=True)
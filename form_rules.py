@@ -0,0 +1,117 @@
+import re
+from collections import namedtuple
+import pandas as pd
+
+# Filas del formulario que hay que leer de cada hoja (B1:B4 y K1:K5)
+FORM_ROWS = 5
+
+# Regla de una celda del formulario:
+#   cell: referencia ("B2"), kind: "any" o "number", integer_only: solo enteros,
+#   pattern: regex que debe cumplir el texto, required: no puede estar vacía,
+#   message / empty_message: textos de error ("{sheet}" se reemplaza por el nombre de la hoja)
+CellRule = namedtuple("CellRule", ["cell", "kind", "integer_only", "pattern", "required", "message", "empty_message"])
+
+def rule(cell, kind="any", integer_only=False, pattern=None, required=False, message=None, empty_message=None):
+    return CellRule(cell, kind, integer_only, pattern, required, message,
+                    empty_message or f"Error: La celda {cell} en la hoja '{{sheet}}' está vacía.")
+
+# Convierte "K5" en (fila 4, columna 10)
+def cell_position(cell):
+    match = re.fullmatch(r"([A-Z]+)(\d+)", cell)
+    column = 0
+    for letter in match.group(1):
+        column = column * 26 + ord(letter) - ord('A') + 1
+    return int(match.group(2)) - 1, column - 1
+
+# Conjunto de reglas compilado una sola vez (posiciones y regex resueltas al importar)
+class RuleSet:
+    def __init__(self, rules, skip_sheets=()):
+        self.rules = rules
+        self.skip_sheets = set(skip_sheets)
+        self.positions = {r.cell: cell_position(r.cell) for r in rules}
+        self.patterns = {r.cell: re.compile(r.pattern) for r in rules if r.pattern}
+
+    # Tablas hoja x celda con los valores del formulario de cada hoja y con las celdas que quedan fuera de la hoja
+    # (la hoja tiene menos filas o columnas que el formulario; su valor queda en None)
+    def extract_cells(self, sheets):
+        records = {}
+        outside = {}
+        for sheet_name, sheet_data in sheets.items():
+            values = {}
+            missing = {}
+            for cell, (row, column) in self.positions.items():
+                missing[cell] = row >= sheet_data.shape[0] or column >= sheet_data.shape[1]
+                values[cell] = None if missing[cell] else sheet_data.iat[row, column]
+            records[sheet_name] = values
+            outside[sheet_name] = missing
+        columns = list(self.positions)
+        return (pd.DataFrame.from_dict(records, orient="index", columns=columns, dtype=object),
+                pd.DataFrame.from_dict(outside, orient="index", columns=columns, dtype=bool))
+
+    # Función para validar todas las hojas de una vez. Devuelve {hoja: [errores]} solo con las hojas con errores
+    def validate(self, sheets):
+        sheets = {name: data for name, data in sheets.items()
+                  if name not in self.skip_sheets and not data.empty}
+        if not sheets:
+            return {}
+        cells, outside = self.extract_cells(sheets)
+        failures = pd.DataFrame(None, index=cells.index, columns=cells.columns, dtype=object)
+
+        for r in self.rules:
+            column = cells[r.cell]
+            empty = column.isna()
+            invalid = pd.Series(False, index=column.index)
+            if r.kind == "number":
+                is_number = column.map(lambda v: isinstance(v, (int, float)))
+                invalid |= ~empty & ~is_number
+                if r.integer_only:
+                    numbers = pd.to_numeric(column.where(is_number), errors='coerce')
+                    invalid |= ~empty & is_number & (numbers % 1 != 0)
+            if r.pattern:
+                pattern = self.patterns[r.cell]
+                matches = column[~empty].map(lambda v: bool(pattern.match(str(v))))
+                invalid |= (~matches).reindex(column.index, fill_value=False).astype(bool)
+            if r.required:
+                failures.loc[empty, r.cell] = r.empty_message
+            failures.loc[invalid, r.cell] = r.message
+            # Una celda fuera de la hoja no es una celda vacía: es un error de estructura (se informa una vez por hoja)
+            failures.loc[outside[r.cell], r.cell] = None
+
+        report = {}
+        for sheet_name, row in failures.iterrows():
+            errors = [message.format(sheet=sheet_name) for message in row.dropna()]
+            missing = [cell for cell in self.positions if outside.at[sheet_name, cell]]
+            if missing:
+                errors.insert(0, f"Error: La hoja '{sheet_name}' no tiene el formulario completo: faltan las celdas {', '.join(missing)}.")
+            if errors:
+                report[sheet_name] = errors
+        return report
+
+CUIL_PATTERN = r"^\d{11}$"
+
+# Formulario común: B1 a B4 obligatorias y B2 con el CUIL
+FORM_RULES = [
+    rule("B1", required=True),
+    rule("B2", required=True, pattern=CUIL_PATTERN,
+         message="Error: La celda B2 en la hoja '{sheet}' debe contener 11 números."),
+    rule("B3", required=True),
+    rule("B4", required=True),
+]
+
+# Campos de comisiones y horas extra (K1 a K5): números o vacíos
+EXTRA_RULES = [
+    rule("K1", kind="number", integer_only=True, message="Error: La celda K1 en la hoja '{sheet}' debe contener un número entero."),
+    rule("K2", kind="number", message="Error: La celda K2 en la hoja '{sheet}' debe contener solo números."),
+    rule("K3", kind="number", message="Error: La celda K3 en la hoja '{sheet}' debe contener solo números."),
+    rule("K4", kind="number", integer_only=True, message="Error: La celda K4 en la hoja '{sheet}' debe contener un número entero."),
+    rule("K5", kind="number", integer_only=True, message="Error: La celda K5 en la hoja '{sheet}' debe contener un número entero."),
+]
+
+_VENDEDOR_CUIL = "Error: La celda B1 en la hoja '{sheet}' debe contener un CUIL válido (11 dígitos)."
+
+TABLERO_RULES = RuleSet(FORM_RULES + EXTRA_RULES)
+FORM_ONLY_RULES = RuleSet(FORM_RULES)
+VENDEDORES_RULES = RuleSet(
+    [rule("B1", required=True, pattern=CUIL_PATTERN, message=_VENDEDOR_CUIL, empty_message=_VENDEDOR_CUIL)],
+    skip_sheets=["Resumen RRHH"]
+)
@@ -0,0 +1,84 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from io import BytesIO
+
+# Carga por lotes sin interfaz: valida y sube todos los Excel de una carpeta y deja un registro JSONL por archivo.
+# Uso: python ingest_cli.py carpeta/ --config config.json --salida resultados.jsonl [--dry-run]
+# Sin --config se usan los secrets de Streamlit o las variables de entorno (ver config.cargar_secretos)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Valida y sube todos los tableros (.xlsx) de una carpeta.")
+    parser.add_argument("carpeta", help="Carpeta con los archivos Excel")
+    parser.add_argument("--patron", default="*.xlsx", help="Patrón de los archivos a procesar (por defecto *.xlsx)")
+    parser.add_argument("--config", help="Ruta de un config.json con las credenciales y el bucket")
+    parser.add_argument("--workers", type=int, help="Archivos procesados en simultáneo (por defecto cargas_simultaneas)")
+    parser.add_argument("--salida", help="Archivo JSONL de resultados (por defecto, salida estándar)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo validar: no se sube nada ni se guardan errores o índices")
+    parser.add_argument("--subir-ajustes", action="store_true", help="Subir también los tableros que se cargan como ajuste")
+    return parser.parse_args(argv)
+
+# Función para listar los archivos a procesar (se omiten los temporales de Excel "~$")
+def list_workbooks(carpeta, patron):
+    rutas = sorted(glob.glob(os.path.join(carpeta, patron)))
+    return [ruta for ruta in rutas if os.path.isfile(ruta) and not os.path.basename(ruta).startswith("~$")]
+
+# Registro JSON de un archivo procesado
+def result_record(ruta, result, segundos):
+    datos = result.get("datos")
+    return {
+        "archivo": result["archivo"],
+        "ruta": ruta,
+        "estado": result["estado"],
+        "tableros": int(datos['CUIL'].nunique()) if datos is not None else 0,
+        "tipo": result.get("tipo"),
+        "clave": result.get("clave"),
+        "hash": result.get("hash"),
+        "mensajes": result.get("mensajes", []),
+        "segundos": round(segundos, 3),
+    }
+
+# Función para procesar un archivo del disco con el mismo flujo que la carga múltiple de la app
+def ingest_file(app, ruta, subir_ajustes, dry_run):
+    inicio = time.perf_counter()
+    with open(ruta, "rb") as f:
+        file = BytesIO(f.read())
+    try:
+        result = app.process_batch_file(os.path.basename(ruta), file, subir_ajustes=subir_ajustes, dry_run=dry_run)
+    except Exception as e:
+        result = {"archivo": os.path.basename(ruta), "estado": "error", "datos": None,
+                  "mensajes": [f"Error al procesar el archivo Excel: {e}"]}
+    return result_record(ruta, result, time.perf_counter() - inicio)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.config:
+        # Tiene que estar definida antes de importar app, que lee la configuración al importarse
+        os.environ["TABLEROS_CONFIG"] = os.path.abspath(args.config)
+
+    from concurrent.futures import ThreadPoolExecutor
+    import app
+
+    rutas = list_workbooks(args.carpeta, args.patron)
+    workers = args.workers or app.opciones["cargas_simultaneas"]
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    resumen = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            # map conserva el orden de los archivos; cada línea se escribe apenas termina su archivo
+            for record in executor.map(lambda ruta: ingest_file(app, ruta, args.subir_ajustes, args.dry_run), rutas):
+                salida.write(json.dumps(record, ensure_ascii=False) + "\n")
+                salida.flush()
+                resumen[record["estado"]] = resumen.get(record["estado"], 0) + 1
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+    detalle = ", ".join(f"{estado}: {cantidad}" for estado, cantidad in sorted(resumen.items()))
+    print(f"{len(rutas)} archivos procesados ({detalle or 'ninguno'})", file=sys.stderr)
+    return 1 if resumen.get("error") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Cola de carga: los Excel que se suben se guardan en una base SQLite local y los procesa un grupo fijo de hilos,
+# así la cantidad de archivos que se validan y suben a la vez no depende de cuántas sesiones hay abiertas.
+# Cada sesión consulta la posición de sus archivos y el resultado. La base la pueden compartir varios procesos
+# de la app en la misma máquina: un trabajo se toma dentro de una transacción, así lo procesa uno solo.
+
+# Estados de un trabajo: "en cola", "procesando" y, al terminar, el estado de la carga ("subido", "error", ...)
+QUEUED = "en cola"
+RUNNING = "procesando"
+
+# Mientras un trabajo se procesa, el hilo que lo tomó actualiza su "latido" cada HEARTBEAT_SECONDS. Un trabajo
+# "procesando" sin latido en STALE_SECONDS quedó de un proceso que se cortó: se vuelve a encolar. No depende de
+# cuánto tarde el archivo (un trabajo largo pero vivo nunca se procesa dos veces)
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = 180
+
+# Días que se conservan los trabajos terminados
+RETENTION_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    contenido BLOB,
+    subir_ajustes INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL,
+    enviado REAL NOT NULL,
+    inicio REAL,
+    latido REAL,
+    fin REAL,
+    resultado TEXT
+);
+CREATE INDEX IF NOT EXISTS trabajos_estado ON trabajos (estado, enviado);
+"""
+
+class IngestQueue:
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Bases creadas antes de que existiera el latido
+            if "latido" not in [row["name"] for row in conn.execute("PRAGMA table_info(trabajos)")]:
+                conn.execute("ALTER TABLE trabajos ADD COLUMN latido REAL")
+
+    def _connect(self):
+        # Una conexión por operación (se usa desde varios hilos); el bloqueo de SQLite ordena las escrituras
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Closing(conn)
+
+    # Encola un Excel (sus bytes) y devuelve el id del trabajo
+    def submit(self, archivo, contenido, subir_ajustes=False):
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("DELETE FROM trabajos WHERE fin IS NOT NULL AND fin < ?", (time.time() - RETENTION_DAYS * 86400,))
+            conn.execute("INSERT INTO trabajos (id, archivo, contenido, subir_ajustes, estado, enviado) VALUES (?, ?, ?, ?, ?, ?)",
+                         (job_id, archivo, sqlite3.Binary(contenido), int(subir_ajustes), QUEUED, time.time()))
+        return job_id
+
+    # Vuelve a encolar un trabajo terminado como "ajuste_pendiente" para subirlo como ajuste. Devuelve el id nuevo
+    def submit_adjustment(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT archivo, contenido FROM trabajos WHERE id = ? AND estado = 'ajuste_pendiente'", (job_id,)).fetchone()
+            if row is None or row["contenido"] is None:
+                return None
+            conn.execute("UPDATE trabajos SET contenido = NULL, estado = 'descartado' WHERE id = ?", (job_id,))
+        return self.submit(row["archivo"], bytes(row["contenido"]), subir_ajustes=True)
+
+    # Descarta un ajuste pendiente (no se guarda)
+    def discard(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE trabajos SET contenido = NULL, estado = 'descartado' WHERE id = ? AND estado = 'ajuste_pendiente'", (job_id,))
+
+    # Toma el trabajo más antiguo de la cola (None si no hay ninguno)
+    def claim(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE trabajos SET estado = ?, inicio = NULL, latido = NULL WHERE estado = ? AND COALESCE(latido, inicio) < ?",
+                             (QUEUED, RUNNING, time.time() - STALE_SECONDS))
+                row = conn.execute("SELECT id, archivo, contenido, subir_ajustes FROM trabajos WHERE estado = ? "
+                                   "ORDER BY enviado, rowid LIMIT 1", (QUEUED,)).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute("UPDATE trabajos SET estado = ?, inicio = ?, latido = ? WHERE id = ?", (RUNNING, now, now, row["id"]))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row["id"], "archivo": row["archivo"], "contenido": bytes(row["contenido"]),
+                "subir_ajustes": bool(row["subir_ajustes"])}
+
+    # Marca que los trabajos siguen en proceso (ver HEARTBEAT_SECONDS)
+    def heartbeat(self, job_ids):
+        if not job_ids:
+            return
+        with self._connect() as conn:
+            conn.execute(f"UPDATE trabajos SET latido = ? WHERE estado = ? AND id IN ({','.join('?' * len(job_ids))})",
+                         [time.time(), RUNNING, *job_ids])
+
+    # Guarda el resultado de un trabajo. Los bytes del Excel se conservan solo si queda un ajuste por confirmar
+    def finish(self, job_id, resultado):
+        estado = resultado.get("estado", "error")
+        with self._connect() as conn:
+            conn.execute("UPDATE trabajos SET estado = ?, fin = ?, resultado = ?, "
+                         "contenido = CASE WHEN ? = 'ajuste_pendiente' THEN contenido ELSE NULL END WHERE id = ?",
+                         (estado, time.time(), json.dumps(resultado, ensure_ascii=False, default=str), estado, job_id))
+
+    # Estado de varios trabajos: {id: {"archivo", "estado", "posicion", "resultado"}}.
+    # posicion es el lugar en la cola (1 = el próximo) y solo está mientras el trabajo espera
+    def status(self, job_ids):
+        if not job_ids:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id, archivo, estado, enviado, resultado, rowid FROM trabajos WHERE id IN ({','.join('?' * len(job_ids))})",
+                                list(job_ids)).fetchall()
+            statuses = {}
+            for row in rows:
+                posicion = None
+                if row["estado"] == QUEUED:
+                    posicion = 1 + conn.execute("SELECT COUNT(*) FROM trabajos WHERE estado = ? AND (enviado < ? OR (enviado = ? AND rowid < ?))",
+                                                (QUEUED, row["enviado"], row["enviado"], row["rowid"])).fetchone()[0]
+                statuses[row["id"]] = {"archivo": row["archivo"], "estado": row["estado"], "posicion": posicion,
+                                       "resultado": json.loads(row["resultado"]) if row["resultado"] else None}
+        return statuses
+
+    # Cantidad de trabajos esperando y en proceso (de todos los procesos que comparten la base)
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT estado, COUNT(*) FROM trabajos WHERE estado IN (?, ?) GROUP BY estado", (QUEUED, RUNNING)).fetchall()
+        return {estado: cantidad for estado, cantidad in rows}
+
+class _Closing:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.close()
+        return False
+
+# Grupo fijo de hilos que toma trabajos de la cola. process(archivo, contenido, subir_ajustes) procesa un Excel
+# y devuelve el resultado (un diccionario serializable con al menos "estado")
+class IngestWorkers:
+    # Segundos entre consultas a la cola cuando está vacía (los trabajos de este proceso despiertan a los hilos antes)
+    POLL_SECONDS = 1.0
+
+    def __init__(self, queue, process, workers=2):
+        self.queue = queue
+        self.process = process
+        self._wake = threading.Event()
+        # Trabajos que están procesando los hilos de este grupo (el latido los mantiene tomados)
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._loop, name=f"cola-{n}", daemon=True) for n in range(max(1, workers))]
+        self._threads.append(threading.Thread(target=self._heartbeat_loop, name="cola-latido", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    # Encola un Excel y despierta a los hilos
+    def submit(self, archivo, contenido, subir_ajustes=False):
+        job_id = self.queue.submit(archivo, contenido, subir_ajustes)
+        self._wake.set()
+        return job_id
+
+    def submit_adjustment(self, job_id):
+        new_id = self.queue.submit_adjustment(job_id)
+        self._wake.set()
+        return new_id
+
+    def _loop(self):
+        while True:
+            try:
+                job = self.queue.claim()
+            except sqlite3.OperationalError:
+                # La base estuvo bloqueada más que el timeout: se vuelve a intentar
+                job = None
+            if job is None:
+                self._wake.wait(self.POLL_SECONDS)
+                self._wake.clear()
+                continue
+            with self._active_lock:
+                self._active.add(job["id"])
+            try:
+                resultado = self.process(job["archivo"], job["contenido"], job["subir_ajustes"])
+            except Exception as e:
+                resultado = {"estado": "error", "mensajes": [f"Error al procesar el archivo Excel: {e}"]}
+            finally:
+                with self._active_lock:
+                    self._active.discard(job["id"])
+            self.queue.finish(job["id"], resultado)
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(HEARTBEAT_SECONDS)
+            with self._active_lock:
+                active = list(self._active)
+            try:
+                self.queue.heartbeat(active)
+            except sqlite3.OperationalError:
+                # La base estuvo bloqueada: el próximo latido llega mucho antes de STALE_SECONDS
+                pass
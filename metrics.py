@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Métricas de cada carga: tiempo y memoria pico por etapa, y pedidos al almacenamiento por operación.
+# Funciona igual que ErrorSink: la carga abre un bloque "with UploadMetrics(...)" y el código de la app
+# marca etapas con "with stage(...)" sin tener que pasar el objeto de función en función.
+
+METRICS_PREFIX = "metricas/"
+
+_local = threading.local()
+
+# Clave de un registro de métricas: metricas/AAAA-MM-DD/HH-MM-SS_{id}.json
+def metrics_key(now):
+    return f"{METRICS_PREFIX}{now.strftime('%Y-%m-%d')}/{now.strftime('%H-%M-%S')}_{uuid.uuid4().hex[:12]}.json"
+
+class UploadMetrics:
+    def __init__(self, archivo, app, writer=None, trace_memory=False):
+        # writer(record) guarda el registro al salir del bloque "with" (None: solo se acumula, por ejemplo en un proceso hijo)
+        self.archivo = archivo
+        self.app = app
+        self.writer = writer
+        self.trace_memory = trace_memory
+        self.estado = None
+        self.stages = []
+        self.requests = {}
+        self.counters = {}
+        self._open_stages = []
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        # Partes de la carga que siguen en otro hilo (ver hand_off); el registro se guarda cuando terminan todas
+        self._holds = 0
+        self._exited = False
+
+    @contextmanager
+    def stage(self, name, hoja=None):
+        frame = {"baseline": 0, "peak": 0}
+        if self.trace_memory:
+            frame["baseline"] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._open_stages.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._open_stages.pop()
+            peak_kb = None
+            if self.trace_memory:
+                # El pico de una etapa anidada también cuenta para la etapa que la contiene
+                frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                if self._open_stages:
+                    parent = self._open_stages[-1]
+                    parent["peak"] = max(parent["peak"], frame["peak"])
+                tracemalloc.reset_peak()
+                peak_kb = round(max(frame["peak"] - frame["baseline"], 0) / 1024, 1)
+            self.add_stage(name, seconds, peak_kb, hoja)
+
+    def add_stage(self, name, seconds, peak_kb=None, hoja=None):
+        with self._lock:
+            self.stages.append({"etapa": name, "hoja": hoja, "segundos": round(seconds, 6), "memoria_pico_kb": peak_kb})
+
+    # Cuenta un pedido al almacenamiento ("PutObject", "GetObject", "ListObjectsV2", "HeadObject") y sus bytes
+    def record_request(self, operation, sent=0, received=0):
+        with self._lock:
+            counters = self.requests.setdefault(operation, {"pedidos": 0, "bytes_enviados": 0, "bytes_recibidos": 0})
+            counters["pedidos"] += 1
+            counters["bytes_enviados"] += sent
+            counters["bytes_recibidos"] += received
+
+    # Suma uno a un contador de la carga (por ejemplo, "reintentos" o "throttles" del cliente de S3)
+    def count(self, name):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def record(self):
+        return {
+            "archivo": self.archivo,
+            "app": self.app,
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "estado": self.estado,
+            "total_segundos": round(self.total_seconds, 6),
+            "etapas": self.stages,
+            "almacenamiento": self.requests,
+            "contadores": self.counters,
+        }
+
+    def __enter__(self):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(self)
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.inicio = datetime.now()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total_seconds = time.perf_counter() - self._start
+        _local.stack.remove(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+        if exc_type is not None and self.estado is None:
+            self.estado = "excepcion"
+        with self._lock:
+            self._exited = True
+            done = self._holds == 0
+        if done:
+            self._write()
+        return False
+
+    # Deja el registro abierto hasta que se llame a release() (la carga sigue en otro hilo)
+    def hold(self):
+        with self._lock:
+            self._holds += 1
+
+    def release(self):
+        with self._lock:
+            self._holds -= 1
+            done = self._exited and self._holds == 0
+        if done:
+            # El total pasa a incluir lo que tardó la parte en segundo plano
+            self.total_seconds = time.perf_counter() - self._start
+            self._write()
+
+    def _write(self):
+        if self.writer is not None:
+            try:
+                self.writer(self.record())
+            except Exception:
+                # Las métricas nunca deben interrumpir una carga
+                pass
+
+# Devuelve las métricas activas en este hilo (None si no hay ninguna carga en curso)
+def current_metrics():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+# Marca una etapa de la carga en curso (no hace nada si no hay métricas activas)
+@contextmanager
+def stage(name, hoja=None):
+    metrics = current_metrics()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name, hoja):
+        yield
+
+def record_request(operation, sent=0, received=0):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.record_request(operation, sent, received)
+
+def set_upload_status(estado):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.estado = estado
+
+# Devuelve func para usar en otros hilos (ThreadPoolExecutor) registrando en las métricas de la carga actual
+def bind_metrics(func):
+    metrics = current_metrics()
+    if metrics is None:
+        return func
+    def bound(*args, **kwargs):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(metrics)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.stack.remove(metrics)
+    return bound
+
+# Como bind_metrics, para la parte de la carga que termina en segundo plano: registra en las mismas métricas y
+# el registro se guarda una sola vez, cuando terminan tanto el bloque "with" como func
+def hand_off(func):
+    metrics = current_metrics()
+    if metrics is None:
+        return func
+    metrics.hold()
+    bound = bind_metrics(func)
+    def run(*args, **kwargs):
+        try:
+            return bound(*args, **kwargs)
+        finally:
+            metrics.release()
+    return run
+
+# Agrega a la carga en curso las etapas medidas en otro proceso (por ejemplo, las hojas procesadas en el pool)
+def merge_stages(stages):
+    metrics = current_metrics()
+    if metrics is None:
+        return
+    with metrics._lock:
+        metrics.stages.extend(stages)
+
+# Función para agregar un registro al archivo JSONL local (una línea por carga)
+def append_metrics_record(path, record):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+# Función para leer los últimos registros del archivo JSONL local
+def read_metrics_records(path, limit=500):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue  # Línea incompleta (por ejemplo, si se cortó la escritura)
+    return records
+
+# Las "cantidad" cargas más lentas de los registros
+def slowest_uploads(records, cantidad=10):
+    return sorted(records, key=lambda record: record.get("total_segundos") or 0, reverse=True)[:cantidad]
+
+# Tabla resumen de cargas: la etapa más lenta y el total de pedidos al almacenamiento de cada una
+def uploads_table(records):
+    rows = []
+    for record in records:
+        etapas = record.get("etapas") or []
+        lenta = max(etapas, key=lambda etapa: etapa["segundos"], default=None)
+        pedidos = record.get("almacenamiento") or {}
+        rows.append({
+            "Inicio": record.get("inicio"),
+            "Archivo": record.get("archivo"),
+            "App": record.get("app"),
+            "Estado": record.get("estado"),
+            "Segundos": record.get("total_segundos"),
+            "Etapa más lenta": None if lenta is None else (f"{lenta['etapa']} ({lenta['hoja']})" if lenta.get("hoja") else lenta["etapa"]),
+            "Pedidos": sum(counters["pedidos"] for counters in pedidos.values()),
+            "KB transferidos": round(sum(c["bytes_enviados"] + c["bytes_recibidos"] for c in pedidos.values()) / 1024, 1),
+            "Reintentos": (record.get("contadores") or {}).get("reintentos", 0),
+        })
+    return pd.DataFrame(rows)
+
+# Tabla de etapas de una carga, en el orden en que terminaron
+def stages_table(record):
+    return pd.DataFrame(record.get("etapas") or [], columns=["etapa", "hoja", "segundos", "memoria_pico_kb"])
+
+# Tabla de pedidos al almacenamiento de una carga por operación
+def requests_table(record):
+    return pd.DataFrame([dict(operacion=operation, **counters) for operation, counters in (record.get("almacenamiento") or {}).items()],
+                        columns=["operacion", "pedidos", "bytes_enviados", "bytes_recibidos"])
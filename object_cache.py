@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict
+import pandas as pd
+from parquet_output import parquet_available
+from metrics import current_metrics
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Sin pyarrow las tablas se guardan con pickle
+    pq = None
+
+# Cache en disco de los objetos del almacenamiento ya decodificados (DataFrames). Los tableros no se modifican
+# después de subidos, así que una entrada se identifica por clave + ETag + forma de leerla ("variante"): si el
+# objeto cambia, cambia el ETag y la entrada vieja simplemente deja de usarse. El ETag sale del listado que ya
+# hacen los lectores (o de un HEAD). Las tablas se guardan en Parquet (se pueden leer solo algunas columnas)
+# y, sin pyarrow, con pickle. El tamaño total está acotado: se descartan primero las menos usadas.
+
+PARQUET_SUFFIX = ".parquet"
+PICKLE_SUFFIX = ".pkl"
+
+class ObjectCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        # Bytes descargados de cada entrada escrita por este proceso (para calcular lo que ahorra cada acierto)
+        self._downloaded = {}
+        # Archivos de la cache y su tamaño, del menos al más usado (al arrancar, por fecha de último uso)
+        self._entries = OrderedDict()
+        files = []
+        for name in os.listdir(directory):
+            if name.endswith((PARQUET_SUFFIX, PICKLE_SUFFIX)):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+        self._total = sum(self._entries.values())
+
+    def _entry_name(self, key, etag, variant):
+        return hashlib.sha256(f"{variant}\0{key}\0{etag}".encode("utf-8")).hexdigest()
+
+    # Devuelve el DataFrame de la clave en la versión etag. Si no está en la cache, load() lo lee del almacenamiento
+    # y devuelve (DataFrame, bytes descargados). Con columns se devuelven solo esas columnas (las que existan)
+    def frame(self, key, etag, variant, load, columns=None):
+        name = self._entry_name(key, etag, variant)
+        df = self._read(name, columns)
+        if df is not None:
+            return df
+        df, downloaded = load()
+        self._count(False, 0)
+        self._write(name, df, downloaded)
+        return _select(df, columns)
+
+    def _read(self, name, columns):
+        for suffix in (PARQUET_SUFFIX, PICKLE_SUFFIX):
+            path = os.path.join(self.directory, name + suffix)
+            if not os.path.exists(path) or (suffix == PARQUET_SUFFIX and pq is None):
+                continue
+            try:
+                if suffix == PARQUET_SUFFIX:
+                    available = pq.read_schema(path).names
+                    df = pd.read_parquet(path, engine="pyarrow",
+                                         columns=None if columns is None else [c for c in columns if c in available])
+                else:
+                    df = _select(pd.read_pickle(path), columns)
+                os.utime(path)
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                # Otro proceso la descartó mientras se leía, o quedó cortada: se vuelve a descargar
+                continue
+            with self._lock:
+                size = self._entries.pop(name + suffix, None)
+                if size is None:
+                    # La escribió otro proceso que comparte la carpeta
+                    size = os.path.getsize(path)
+                    self._total += size
+                self._entries[name + suffix] = size
+            self._count(True, self._downloaded.get(name + suffix, size))
+            return df
+        return None
+
+    def _write(self, name, df, downloaded):
+        temp = os.path.join(self.directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        suffix = PICKLE_SUFFIX
+        try:
+            if parquet_available():
+                try:
+                    df.to_parquet(temp, index=False, engine="pyarrow")
+                    suffix = PARQUET_SUFFIX
+                except Exception:
+                    # Columnas con tipos mezclados que Parquet no acepta
+                    pass
+            if suffix == PICKLE_SUFFIX:
+                df.to_pickle(temp)
+            path = os.path.join(self.directory, name + suffix)
+            os.replace(temp, path)
+            size = os.path.getsize(path)
+        except OSError:
+            # La cache nunca debe interrumpir una lectura
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+        with self._lock:
+            self._total += size - self._entries.pop(name + suffix, 0)
+            self._entries[name + suffix] = size
+            self._downloaded[name + suffix] = downloaded
+            self._evict()
+
+    # Descarta las entradas menos usadas hasta que el total entre en max_bytes
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            self._downloaded.pop(name, None)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def _count(self, hit, size):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.bytes_saved += size
+            else:
+                self.misses += 1
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.count("cache_aciertos" if hit else "cache_fallos")
+
+    # Aciertos, fallos, proporción de aciertos, bytes que no se descargaron y tamaño actual de la cache
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"aciertos": self.hits, "fallos": self.misses,
+                    "proporcion_aciertos": self.hits / total if total else 0.0,
+                    "bytes_ahorrados": self.bytes_saved, "bytes_en_disco": self._total, "entradas": len(self._entries)}
+
+def _select(df, columns):
+    if columns is None:
+        return df
+    return df[[c for c in columns if c in df.columns]]
+
+# Función para leer un objeto del almacenamiento con la cache: decode(body) arma el DataFrame. Sin etag se pide
+# con un HEAD (los lectores que ya listaron el prefijo pasan el ETag del listado y no hacen ningún pedido extra)
+def cached_frame(cache, storage, key, variant, decode, etag=None, columns=None):
+    if cache is None:
+        return _select(decode(storage.get(key)), columns)
+    if etag is None:
+        head = storage.head(key)
+        if head is None:
+            return _select(decode(storage.get(key)), columns)
+        etag = head["ETag"]
+
+    def load():
+        body = storage.get(key)
+        return decode(body), len(body)
+    return cache.frame(key, etag, variant, load, columns)
+
+# Función para abrir la cache configurada (None si está desactivada)
+def open_object_cache(opciones):
+    if not opciones["cache_disco"]:
+        return None
+    return ObjectCache(opciones["cache_disco_carpeta"], opciones["cache_disco_mb"] * 1024 * 1024)
@@ -0,0 +1,44 @@
+import pandas as pd
+
+OBJETIVO_COLUMNS = [
+    'Objetivo Aceptable (70%)',
+    'Objetivo Muy Bueno (90%)',
+    'Objetivo Excelente (120%)'
+]
+
+# Número entero o decimal (con punto o coma), opcionalmente seguido de "%" (sobre texto ya sin espacios)
+OBJETIVO_PATTERN = r"-?\d+(?:[.,]\d+)?\s*%?"
+
+# Función para convertir las columnas de objetivos a float de una sola vez.
+# Acepta números, "85%", "0,9" y celdas vacías. Devuelve (bloque de floats, máscara de celdas inválidas)
+def parse_objetivos(data, columns=OBJETIVO_COLUMNS):
+    block = data[columns]
+    values = pd.Series(block.to_numpy(dtype=object).ravel(), dtype=object)
+    empty = values.isna()
+    is_text = values.map(type) == str
+    parsed = pd.Series(float('nan'), index=values.index)
+
+    # Celdas numéricas de Excel (int/float)
+    is_number = ~is_text & ~empty
+    if is_number.any():
+        numbers = values[is_number]
+        try:
+            parsed[is_number] = numbers.astype(float)
+        except (TypeError, ValueError):
+            # Hay celdas que no son números (fechas, etc.): esas quedan como inválidas
+            parsed[is_number] = pd.to_numeric(numbers, errors='coerce')
+
+    # Celdas de texto: "85%", "0,9", " 70 "
+    if is_text.any():
+        text = values[is_text].astype(str).str.strip()
+        valid = text.str.fullmatch(OBJETIVO_PATTERN).fillna(False).astype(bool)
+        # Solo quedan textos que cumplen el patrón, así que la conversión a float no puede fallar
+        numbers = text.where(valid).str.rstrip('%').str.rstrip().str.replace(',', '.', regex=False).astype(float)
+        percent = text.str.endswith('%').fillna(False).astype(bool)
+        parsed[is_text] = numbers.where(~percent, numbers / 100)
+
+    invalid = parsed.isna() & ~empty
+    shape = block.shape
+    parsed_block = pd.DataFrame(parsed.to_numpy(dtype=float).reshape(shape), index=block.index, columns=columns)
+    invalid_mask = pd.DataFrame(invalid.to_numpy().reshape(shape), index=block.index, columns=columns)
+    return parsed_block, invalid_mask
@@ -0,0 +1,57 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import tracemalloc
+from error_log import ErrorSink
+from metrics import UploadMetrics
+
+# Trabajo de cada proceso hijo: lo recibe al arrancar (initargs) y, como el pool usa fork, el Excel no se serializa
+_job = None
+
+# Un solo pool a la vez por proceso: cada fork copia el estado de todos los hilos, así que no se crean pools en paralelo
+_pool_lock = threading.Lock()
+
+# Guarda en el proceso hijo el trabajo de su pool
+def _init_job(process_sheet, excel_data, args):
+    global _job
+    _job = (process_sheet, excel_data, args)
+
+# Indica si conviene repartir las hojas en varios procesos
+def should_process_in_parallel(num_sheets, opciones):
+    if not opciones.get("procesar_en_paralelo") or num_sheets < opciones.get("hojas_minimas_paralelo", 8):
+        return False
+    if (opciones.get("procesos_hojas") or os.cpu_count() or 1) < 2:
+        return False
+    # Se necesita fork para que los hijos hereden el Excel ya abierto y las funciones de la app
+    return "fork" in multiprocessing.get_all_start_methods()
+
+# Procesa un bloque de hojas consecutivas en el proceso hijo y guarda los errores de cada hoja por separado
+def _process_chunk(sheet_names):
+    process_sheet, excel_data, args = _job
+    results = []
+    for sheet_name in sheet_names:
+        with ErrorSink(None, quiet=True) as sink, UploadMetrics(None, None, trace_memory=tracemalloc.is_tracing()) as metrics:
+            result = process_sheet(excel_data, sheet_name, *args)
+        results.append((result, sink.messages(), sink.displayed, metrics.stages))
+        if not result[-1]:
+            # Las hojas siguientes del bloque no se usan si esta falla
+            break
+    return results
+
+# Función para procesar las hojas en un pool de procesos.
+# process_sheet(excel_data, sheet_name, *args) debe devolver una tupla cuyo último elemento indica si la hoja es válida.
+# Devuelve [(resultado, errores registrados, mensajes mostrados, etapas medidas)] en el orden de las hojas, cortando en la primera hoja con error.
+def map_sheets_in_pool(process_sheet, excel_data, sheet_names, args, max_workers=None):
+    workers = min(max_workers or os.cpu_count() or 1, len(sheet_names))
+    chunk_size = -(-len(sheet_names) // workers)
+    chunks = [sheet_names[i:i + chunk_size] for i in range(0, len(sheet_names), chunk_size)]
+
+    results = []
+    with _pool_lock, ProcessPoolExecutor(max_workers=len(chunks), mp_context=multiprocessing.get_context("fork"),
+                                         initializer=_init_job, initargs=(process_sheet, excel_data, args)) as executor:
+        for chunk_results in executor.map(_process_chunk, chunks):
+            results.extend(chunk_results)
+            if not chunk_results[-1][0][-1]:
+                break
+    return results
@@ -0,0 +1,81 @@
+from io import BytesIO
+from datetime import datetime
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # La salida Parquet es opcional
+    pyarrow = None
+
+PARQUET_PREFIX = "parquet/"
+
+# Columnas que siempre se guardan como texto aunque parezcan números o estén vacías
+TEXT_COLUMNS = {
+    'Cargo', 'CUIL', 'Segmento', 'Área de influencia', 'Nombre Lider', 'Fecha_Nombre_Archivo', 'Sucursal',
+    'Tipo Indicador', 'Tipo Dato', 'Indicadores de Gestion', 'Lider Revisor', 'Comentario', 'Ajuste',
+    'CUIT', 'LEGAJO', 'Vendedores', 'Lider', 'Fecha'
+}
+
+# Columnas numéricas conocidas: siempre float64, así todos los archivos de un dataset tienen el mismo esquema.
+# Un valor que no es un número queda vacío en el Parquet (el CSV de la subida lo conserva tal cual)
+NUMERIC_COLUMNS = {
+    'Ponderacion', 'Objetivo Aceptable (70%)', 'Objetivo Muy Bueno (90%)', 'Objetivo Excelente (120%)',
+    'Resultado', '% Logro',
+    'COMISIONES ACCESORIAS', 'HS EXTRAS AL 50', 'HS EXTRAS AL 100', 'INCENTIVO PRODUCTIVIDAD', 'AJUSTE INCENTIVO'
+}
+
+# Formatos de fecha conocidos de las columnas de los tableros
+DATE_FORMATS = {
+    'Ultima Fecha de Actualización': '%d/%m/%Y',
+}
+
+# Indica si la salida Parquet se puede usar en este entorno
+def parquet_available():
+    return pyarrow is not None
+
+# Convierte "dd-mm-aaaa" al período "01-mm-aaaa" usado como partición
+def periodo_de(fecha):
+    try:
+        return datetime.strptime(fecha, "%d-%m-%Y").replace(day=1).strftime("%d-%m-%Y")
+    except Exception:
+        return fecha
+
+# Clave particionada: parquet/{dataset}/period=01-MM-AAAA/sucursal={sucursal}/{nombre}.parquet
+def parquet_key(dataset, fecha, sucursal, nombre):
+    sucursal = str(sucursal).replace('/', '-')
+    return f"{PARQUET_PREFIX}{dataset}/period={periodo_de(fecha)}/sucursal={sucursal}/{nombre}.parquet"
+
+# Tipa una columna: las conocidas con su tipo fijo; las demás se convierten a número solo si no se pierde ningún
+# valor, si no quedan como texto
+def _typed_column(name, column, date_format=None):
+    if name in TEXT_COLUMNS:
+        return column.astype("string")
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if name in NUMERIC_COLUMNS:
+        return pd.to_numeric(column, errors='coerce').astype("float64")
+    if column.notna().sum() == 0:
+        # Sin valores no se puede inferir el tipo: se usa texto para no variar el esquema entre archivos
+        return column.astype("string")
+    if date_format:
+        converted = pd.to_datetime(column, format=date_format, errors='coerce')
+    else:
+        # Siempre float64 para que el esquema no cambie entre archivos con y sin decimales
+        converted = pd.to_numeric(column, errors='coerce').astype("float64")
+    if converted.notna().sum() == column.notna().sum():
+        return converted
+    return column.astype("string")
+
+# Función para tipar un DataFrame limpio (números, fechas y texto) antes de guardarlo en Parquet
+def typed_frame(df, date_formats=None):
+    formats = dict(DATE_FORMATS, **(date_formats or {}))
+    typed = pd.DataFrame(index=df.index)
+    for name in df.columns:
+        typed[name] = _typed_column(name, df[name], formats.get(name))
+    return typed
+
+# Función para serializar un DataFrame tipado a Parquet en memoria
+def dataframe_to_parquet(df, date_formats=None):
+    buffer = BytesIO()
+    typed_frame(df, date_formats).to_parquet(buffer, index=False, engine="pyarrow")
+    return buffer.getvalue()
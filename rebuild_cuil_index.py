@@ -0,0 +1,24 @@
+import argparse
+from app import rebuild_cuil_index, reconcile_cuil_index, normalize_fecha_to_first_day
+
+# Reconstruye el índice de CUILs de uno o más períodos a partir de los tableros ya subidos.
+# Uso: python rebuild_cuil_index.py 01-03-2025 01-04-2025
+# Con --verificar solo se reconstruyen los períodos con tableros que faltan en el índice (las cargas no listan
+# el período: este control se corre aparte, por ejemplo una vez por día)
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye el índice de CUILs por período (01-MM-AAAA).")
+    parser.add_argument("periodos", nargs="+", help="Fechas de los períodos a reconstruir (dd-mm-aaaa)")
+    parser.add_argument("--verificar", action="store_true", help="Reconstruir solo si falta algún tablero en el índice")
+    args = parser.parse_args()
+
+    for periodo in args.periodos:
+        fecha_carpeta = normalize_fecha_to_first_day(periodo)
+        if args.verificar:
+            faltantes = reconcile_cuil_index(fecha_carpeta)
+            print(f"{fecha_carpeta}: {len(faltantes)} tableros faltaban en el índice" if faltantes else f"{fecha_carpeta}: índice completo")
+            continue
+        index = rebuild_cuil_index(fecha_carpeta)
+        print(f"{fecha_carpeta}: {len(index)} CUILs indexados")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from csv_objects import read_csv_object
+from compaction import SOURCE_COLUMN, UPLOAD_DATE_FORMAT, latest_per_cuil
+from parquet_output import PARQUET_PREFIX, parquet_available, typed_frame
+from metrics import bind_metrics
+from object_cache import cached_frame
+from background_uploads import list_pending_keys
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.compute as pc
+except ImportError:  # Sin pyarrow se consultan solo los CSV
+    pa = None
+    pq = None
+    pc = None
+
+# Consultas sobre los tableros ya subidos, sin descargar meses enteros:
+# - partición: el período, la sucursal y el líder están en la clave de cada subida
+#   ({periodo}/{fecha}_{dd-mm-aaaa+sucursal+lider}.csv y parquet/tableros/period=.../sucursal=.../{fecha}_{nombre}.parquet),
+#   así que solo se listan los períodos elegidos y solo se descargan las subidas que pueden coincidir;
+# - columnas: de cada objeto se decodifican solo las columnas pedidas (Parquet si existe, si no el CSV).
+# Los filtros de filas (Cargo, Ajuste, Nombre Lider) se aplican con pyarrow.compute antes de pasar a pandas.
+
+REPORT_DATASET = "tableros"
+
+# Columnas que se pueden filtrar
+FILTER_COLUMNS = ['Sucursal', 'Nombre Lider', 'Cargo', 'Ajuste']
+
+# Columnas que se muestran si no se eligen otras
+DEFAULT_COLUMNS = ['Fecha_Nombre_Archivo', 'Sucursal', 'Nombre Lider', 'CUIL', 'Cargo', 'Tipo Indicador',
+                   'Indicadores de Gestion', 'Ponderacion', 'Ajuste', 'Fecha Horario Subida']
+
+# Función para listar los períodos (01-MM-AAAA) de los últimos "meses" meses, del más nuevo al más viejo
+def recent_periods(meses=12, today=None):
+    today = today or datetime.now()
+    year, month = today.year, today.month
+    periods = []
+    for _ in range(meses):
+        periods.append(f"01-{month:02d}-{year}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return periods
+
+# Sucursal y líder a partir del nombre de la subida ("{fecha}_{dd-mm-aaaa+sucursal+lider}")
+def _describe_upload(nombre):
+    partes = nombre.split('_', 2)[-1].split('+')
+    if len(partes) < 3:
+        return None, None
+    return partes[1], partes[-1]
+
+# Función para listar las subidas de un período: una entrada por subida, en Parquet si tiene copia y si no en CSV.
+# Se omiten las de cargas que todavía no se confirmaron
+def list_period_uploads(storage, periodo):
+    uploads = {}
+    pending = list_pending_keys(storage)
+    for obj in storage.list(f"{periodo}/"):
+        if obj['Key'].endswith('.csv') and obj['Key'] not in pending:
+            nombre = obj['Key'].rsplit('/', 1)[-1][:-len('.csv')]
+            uploads[nombre] = {"clave": obj['Key'], "formato": "csv", "bytes": obj['Size'], "etag": obj['ETag']}
+    if parquet_available():
+        for obj in storage.list(f"{PARQUET_PREFIX}{REPORT_DATASET}/period={periodo}/"):
+            nombre = obj['Key'].rsplit('/', 1)[-1][:-len('.parquet')]
+            if obj['Key'].endswith('.parquet') and nombre in uploads:
+                uploads[nombre] = {"clave": obj['Key'], "formato": "parquet", "bytes": obj['Size'], "etag": obj['ETag'],
+                                   "csv": uploads[nombre]["clave"]}
+    entries = []
+    for nombre, upload in sorted(uploads.items()):
+        sucursal, lider = _describe_upload(nombre)
+        entries.append(dict(upload, periodo=periodo, nombre=nombre, sucursal=sucursal, lider=lider))
+    return entries
+
+# Función para quedarse con las subidas que pueden tener filas de las sucursales y líderes elegidos
+def prune_uploads(entries, sucursales=None, lideres=None):
+    return [entry for entry in entries
+            if (not sucursales or entry["sucursal"] in sucursales) and (not lideres or entry["lider"] in lideres)]
+
+# Filtro de filas en pyarrow: cada columna debe tener alguno de los valores elegidos
+def _arrow_filter(table, filtros):
+    mask = None
+    for column, values in filtros.items():
+        if not values or column not in table.column_names:
+            continue
+        condition = pc.is_in(pc.cast(table[column], pa.string()), value_set=pa.array([str(v) for v in values], type=pa.string()))
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table if mask is None else table.filter(pc.fill_null(mask, False))
+
+# Función para decodificar una subida completa (Parquet o CSV) con los tipos de la copia Parquet
+def decode_upload(body, formato):
+    if formato == "parquet":
+        return pd.read_parquet(BytesIO(body), engine="pyarrow")
+    df = read_csv_object(body, dtype=str, encoding="utf-8-sig")
+    return typed_frame(df, {'Fecha Horario Subida': UPLOAD_DATE_FORMAT})
+
+# Función para leer de una subida solo las columnas pedidas y las filas que cumplen los filtros.
+# Con cache (ver object_cache.py) la subida se decodifica una vez y después se leen de disco solo esas columnas
+def read_upload_columns(storage, entry, columns, filtros, cache=None):
+    needed = list(dict.fromkeys([*columns, *[c for c, values in filtros.items() if values]]))
+    if cache is not None:
+        df = cached_frame(cache, storage, entry["clave"], "reporte", lambda body: decode_upload(body, entry["formato"]),
+                          etag=entry.get("etag"), columns=needed)
+        for column, values in filtros.items():
+            if values and column in df.columns:
+                df = df[df[column].astype("string").isin([str(v) for v in values])]
+    elif entry["formato"] == "parquet":
+        body = storage.get(entry["clave"])
+        schema = pq.read_schema(BytesIO(body))
+        table = pq.read_table(BytesIO(body), columns=[c for c in needed if c in schema.names])
+        df = _arrow_filter(table, filtros).to_pandas()
+    else:
+        df = read_csv_object(storage.get(entry["clave"]), usecols=lambda c: c in needed, dtype=str, encoding="utf-8-sig")
+        for column, values in filtros.items():
+            if values and column in df.columns:
+                df = df[df[column].isin([str(v) for v in values])]
+        # Mismos tipos que la copia Parquet, para poder juntar subidas de los dos formatos
+        df = typed_frame(df, {'Fecha Horario Subida': UPLOAD_DATE_FORMAT})
+    # Si un tablero viejo no tiene alguna columna, queda vacía
+    df = df.reindex(columns=needed)
+    df[SOURCE_COLUMN] = entry.get("csv", entry["clave"])
+    return df
+
+def _read_uploads(storage, entries, columns, filtros, max_workers, cache):
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        frames = list(executor.map(bind_metrics(lambda entry: read_upload_columns(storage, entry, columns, filtros, cache)), entries))
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return None
+    return pd.concat([frame.astype({c: "string" for c in frame.columns if c in FILTER_COLUMNS or c == 'CUIL'}) for frame in frames],
+                     ignore_index=True)
+
+# Función para saber, por período y CUIL, cuál es la última subida (sin filtros: un CUIL que cambió de cargo,
+# líder o sucursal sigue teniendo como vigente su último tablero). Solo se leen las columnas CUIL y fecha de subida.
+# Devuelve un DataFrame con las columnas _periodo, CUIL y la clave de la subida
+def latest_upload_per_cuil(storage, entries, max_workers=8, cache=None):
+    df = _read_uploads(storage, entries, ['CUIL', 'Fecha Horario Subida'], {}, max_workers, cache)
+    if df is None:
+        return pd.DataFrame(columns=['_periodo', 'CUIL', SOURCE_COLUMN])
+    df['_periodo'] = df[SOURCE_COLUMN].str.split('/').str[0]
+    vigentes = pd.concat([latest_per_cuil(group) for _, group in df.groupby('_periodo', sort=False)], ignore_index=True)
+    return vigentes[['_periodo', 'CUIL', SOURCE_COLUMN]].drop_duplicates()
+
+# Función para consultar los tableros de los períodos elegidos.
+# filtros: {"Sucursal": [...], "Nombre Lider": [...], "Cargo": [...], "Ajuste": [...]} (vacío = sin filtrar)
+# Con solo_vigentes=True queda, por cada CUIL, solo la última subida de cada período: la última se elige entre
+# todas las subidas (entries debe tener todas las del período) y recién después se aplican los filtros
+def query_tableros(storage, entries, columns=None, filtros=None, solo_vigentes=False, max_workers=8, cache=None):
+    columns = list(columns or DEFAULT_COLUMNS)
+    filtros = {column: values for column, values in (filtros or {}).items() if values}
+    vigentes = None
+    if solo_vigentes:
+        vigentes = latest_upload_per_cuil(storage, entries, max_workers, cache)
+        # Las subidas que ya no son la última de ningún CUIL no se leen
+        claves = set(vigentes[SOURCE_COLUMN])
+        entries = [entry for entry in entries if entry.get("csv", entry["clave"]) in claves]
+    entries = prune_uploads(entries, filtros.get('Sucursal'), filtros.get('Nombre Lider'))
+    if not entries:
+        return pd.DataFrame(columns=columns)
+    needed = list(dict.fromkeys([*columns, 'CUIL'])) if solo_vigentes else columns
+    df = _read_uploads(storage, entries, needed, filtros, max_workers, cache)
+    if df is None:
+        return pd.DataFrame(columns=columns)
+    if solo_vigentes:
+        df['_periodo'] = df[SOURCE_COLUMN].str.split('/').str[0]
+        df = df.merge(vigentes, on=['_periodo', 'CUIL', SOURCE_COLUMN])
+    return df[columns].reset_index(drop=True)
@@ -0,0 +1,76 @@
+import threading
+import boto3
+import streamlit as st
+from botocore.config import Config
+from metrics import current_metrics
+
+# Cliente de S3 compartido por todas las sesiones del proceso: se crea la primera vez que se usa
+# (st.cache_resource) con pool de conexiones configurable, reintentos adaptativos y timeouts.
+
+# Códigos de error de S3 que indican que se está limitando la cantidad de pedidos
+THROTTLE_CODES = {"SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded", "TooManyRequestsException", "RequestThrottled"}
+
+# Contadores del proceso: pedidos, reintentos y respuestas de limitación (throttling)
+class ClientStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pedidos = 0
+        self.reintentos = 0
+        self.throttles = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {"pedidos": self.pedidos, "reintentos": self.reintentos, "throttles": self.throttles}
+
+client_stats = ClientStats()
+
+# Se ejecuta después de cada intento de un pedido (needs-retry): cuenta limitaciones y reintentos
+def _on_attempt(response=None, attempts=None, caught_exception=None, **kwargs):
+    throttled = False
+    if response is not None:
+        error_code = (response[1] or {}).get("Error", {}).get("Code")
+        throttled = error_code in THROTTLE_CODES or response[0].status_code in (429, 503)
+    with client_stats._lock:
+        if attempts == 1:
+            client_stats.pedidos += 1
+        else:
+            client_stats.reintentos += 1
+        if throttled:
+            client_stats.throttles += 1
+    metrics = current_metrics()
+    if metrics is not None:
+        if attempts and attempts > 1:
+            metrics.count("reintentos")
+        if throttled:
+            metrics.count("throttles")
+
+# Configuración del cliente a partir de las opciones (s3_max_conexiones, s3_reintentos, s3_timeout_*)
+def s3_config(opciones):
+    return Config(
+        max_pool_connections=opciones["s3_max_conexiones"],
+        retries={"max_attempts": opciones["s3_reintentos"], "mode": "adaptive"},
+        connect_timeout=opciones["s3_timeout_conexion"],
+        read_timeout=opciones["s3_timeout_lectura"],
+    )
+
+@st.cache_resource(show_spinner=False)
+def _shared_client(aws_access_key, aws_secret_key, region_name, max_pool, max_attempts, connect_timeout, read_timeout):
+    client = boto3.client(
+        's3',
+        aws_access_key_id=aws_access_key,
+        aws_secret_access_key=aws_secret_key,
+        region_name=region_name,
+        config=s3_config({
+            "s3_max_conexiones": max_pool, "s3_reintentos": max_attempts,
+            "s3_timeout_conexion": connect_timeout, "s3_timeout_lectura": read_timeout,
+        })
+    )
+    client.meta.events.register("needs-retry.s3", _on_attempt)
+    return client
+
+# Función para obtener el cliente de S3 del proceso (uno por combinación de credenciales y configuración)
+def get_s3_client(aws_access_key, aws_secret_key, region_name, opciones):
+    return _shared_client(
+        aws_access_key, aws_secret_key, region_name, opciones["s3_max_conexiones"], opciones["s3_reintentos"],
+        opciones["s3_timeout_conexion"], opciones["s3_timeout_lectura"]
+    )
@@ -0,0 +1,405 @@
+import fcntl
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from metrics import record_request
+
+# Almacenamiento de los tableros: S3 o una carpeta local con la misma semántica de claves y prefijos.
+# Las dos clases exponen put, get, list y head; list y head devuelven diccionarios con las mismas
+# claves que boto3 ("Key", "Size", "LastModified", "ETag") para que el código que las usa no cambie.
+# get_with_etag y put_if permiten actualizar un objeto compartido sin pisar la escritura de otro proceso.
+
+# Se lanza cuando la clave no existe (equivale a NoSuchKey de S3)
+class StorageKeyNotFound(Exception):
+    pass
+
+# Se lanza cuando una escritura condicional no se hace porque el objeto cambió o ya existía
+# (equivale a PreconditionFailed / ConditionalRequestConflict de S3)
+class StoragePreconditionFailed(Exception):
+    pass
+
+def _read_body(body):
+    if hasattr(body, "read"):
+        return body.read()
+    return body
+
+# Tamaño de lo que se va a subir (bytes o archivo abierto, sin consumirlo)
+def _body_size(body):
+    if hasattr(body, "getbuffer"):
+        return body.getbuffer().nbytes - body.tell()
+    if hasattr(body, "seek") and hasattr(body, "tell"):
+        position = body.tell()
+        size = body.seek(0, os.SEEK_END) - position
+        body.seek(position)
+        return size
+    return len(body)
+
+# Tamaño de cada parte de una subida multiparte (S3 exige al menos 5 MB salvo en la última)
+PART_SIZE = 8 * 1024 * 1024
+
+# Escritura en streaming a S3: junta los datos en partes de PART_SIZE y las va subiendo (subida multiparte).
+# Si todo entra en una parte se hace un único put_object. Se usa con "with storage.open_writer(...)"
+class S3StreamWriter(io.RawIOBase):
+    def __init__(self, storage, key, extra, part_size=PART_SIZE):
+        self.storage = storage
+        self.key = key
+        self.extra = extra
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.bytes_written += len(data)
+        if len(self.buffer) >= self.part_size:
+            with memoryview(self.buffer) as view:
+                part = view[:self.part_size].tobytes()
+            del self.buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def _upload_part(self, body):
+        client = self.storage.client
+        if self.upload_id is None:
+            record_request("CreateMultipartUpload")
+            self.upload_id = client.create_multipart_upload(Bucket=self.storage.bucket, Key=self.key, **self.extra)['UploadId']
+        number = len(self.parts) + 1
+        record_request("UploadPart", sent=len(body))
+        response = client.upload_part(Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=body)
+        self.parts.append({"ETag": response['ETag'], "PartNumber": number})
+
+    # Completa la subida (o hace el put_object si no se llegó a una parte)
+    def commit(self):
+        if self.upload_id is None:
+            self.storage.put(self.key, bytes(self.buffer), **self._put_args())
+            return
+        if self.buffer:
+            self._upload_part(bytes(self.buffer))
+        record_request("CompleteMultipartUpload")
+        self.storage.client.complete_multipart_upload(
+            Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self):
+        if self.upload_id is not None:
+            record_request("AbortMultipartUpload")
+            self.storage.client.abort_multipart_upload(Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def _put_args(self):
+        return {"content_type": self.extra.get("ContentType"), "metadata": self.extra.get("Metadata"),
+                "content_encoding": self.extra.get("ContentEncoding")}
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        self.close()
+        return False
+
+# Escritura en streaming a la carpeta local: se escribe en un temporal y se renombra al terminar
+class LocalStreamWriter(io.RawIOBase):
+    def __init__(self, storage, key, content_type=None, content_encoding=None, metadata=None):
+        self.storage = storage
+        self.key = key
+        self.path = storage._path(key)
+        self.metadata = dict(metadata or {})
+        if content_encoding:
+            self.metadata["Content-Encoding"] = content_encoding
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=storage.TEMP_SUFFIX)
+        self.file = os.fdopen(fd, "wb")
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.file.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def commit(self):
+        self.file.close()
+        record_request("PutObject", sent=self.bytes_written)
+        self.storage._replace_metadata(self.key, self.metadata)
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        self.close()
+        return False
+
+# Almacenamiento en un bucket de S3 a través de un cliente de boto3.
+# Con client_factory el cliente se crea recién en el primer pedido
+class S3Storage:
+    def __init__(self, client, bucket, client_factory=None):
+        self._client = client
+        self._client_factory = client_factory
+        self.bucket = bucket
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _extra_args(self, content_type=None, metadata=None, content_encoding=None):
+        extra = {"ContentType": content_type} if content_type else {}
+        if metadata:
+            extra["Metadata"] = metadata
+        if content_encoding:
+            extra["ContentEncoding"] = content_encoding
+        return extra
+
+    # Guarda bytes o un archivo abierto. Los archivos se suben con upload_fileobj (multiparte si son grandes).
+    # metadata se guarda como metadatos del objeto (x-amz-meta-*)
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        extra = self._extra_args(content_type, metadata, content_encoding)
+        record_request("PutObject", sent=_body_size(body))
+        if hasattr(body, "read"):
+            self.client.upload_fileobj(body, self.bucket, key, ExtraArgs=extra or None)
+        else:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra)
+
+    # Devuelve un archivo en el que se escribe el objeto en streaming; se guarda al salir del bloque "with"
+    def open_writer(self, key, content_type=None, metadata=None, content_encoding=None):
+        return S3StreamWriter(self, key, self._extra_args(content_type, metadata, content_encoding))
+
+    def get(self, key):
+        return self.get_with_etag(key)[0]
+
+    # Devuelve el contenido y el ETag de la misma versión del objeto (para una escritura condicional posterior)
+    def get_with_etag(self, key):
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.NoSuchKey:
+            record_request("GetObject")
+            raise StorageKeyNotFound(key)
+        body = obj['Body'].read()
+        record_request("GetObject", received=len(body))
+        return body, obj['ETag']
+
+    # Escritura condicional: con etag=None solo se crea si la clave no existe; si no, solo se reemplaza si el
+    # objeto sigue teniendo ese ETag. Si otro proceso lo cambió antes se lanza StoragePreconditionFailed
+    def put_if(self, key, body, etag, content_type=None, content_encoding=None):
+        extra = self._extra_args(content_type, None, content_encoding)
+        if etag is None:
+            extra["IfNoneMatch"] = "*"
+        else:
+            extra["IfMatch"] = etag
+        record_request("PutObject", sent=len(body))
+        try:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=body, **extra)
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise StoragePreconditionFailed(key)
+            raise
+
+    # Borra un objeto (no falla si no existe, igual que S3)
+    def delete(self, key):
+        record_request("DeleteObject")
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    # Objetos cuya clave empieza con prefix, en el orden de S3 (lexicográfico), paginando de a 1000
+    def list(self, prefix=""):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            record_request("ListObjectsV2")
+            for obj in page.get('Contents', []):
+                yield {"Key": obj['Key'], "Size": obj['Size'], "LastModified": obj['LastModified'], "ETag": obj['ETag']}
+
+    # Metadatos de un objeto (None si no existe)
+    def head(self, key):
+        record_request("HeadObject")
+        try:
+            obj = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"Key": key, "Size": obj['ContentLength'], "LastModified": obj['LastModified'],
+                "ETag": obj['ETag'], "ContentType": obj.get('ContentType'), "ContentEncoding": obj.get('ContentEncoding'),
+                "Metadata": obj.get('Metadata', {})}
+
+# ETag de un archivo local sin leer su contenido (listar una carpeta grande no descarga nada). Cada escritura crea
+# un archivo nuevo y lo renombra, así que cambia el inodo además de la fecha de modificación y el tamaño
+def _local_etag(stat):
+    return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+# Almacenamiento en una carpeta local: cada clave es un archivo y las "/" de la clave son subcarpetas.
+# Los metadatos de cada objeto se guardan aparte, en .metadata/{clave}.json, y no aparecen al listar.
+# Sirve para correr y medir todo el flujo de validación y carga sin un bucket
+class LocalStorage:
+    TEMP_SUFFIX = ".tmp-upload"
+    METADATA_DIR = ".metadata"
+    LOCK_SUFFIX = ".lock"
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        parts = key.split("/")
+        if not key or key.startswith("/") or any(part in ("", ".", "..") for part in parts[:-1]) or parts[-1] in (".", ".."):
+            raise ValueError(f"Clave inválida: '{key}'")
+        if parts[0] == self.METADATA_DIR:
+            raise ValueError(f"Clave reservada: '{key}'")
+        return os.path.join(self.root, *parts)
+
+    def _metadata_path(self, key):
+        return os.path.join(self.root, self.METADATA_DIR, *key.split("/")) + ".json"
+
+    # Escritura atómica de un archivo (temporal en la misma carpeta + rename)
+    def _write(self, path, body):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=self.TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # Escribe en un archivo temporal y lo renombra, así una lectura nunca ve un objeto a medio escribir (como en S3)
+    def put(self, key, body, content_type=None, metadata=None, content_encoding=None):
+        path = self._path(key)
+        body = _read_body(body)
+        record_request("PutObject", sent=len(body))
+        metadata = dict(metadata or {})
+        if content_encoding:
+            metadata["Content-Encoding"] = content_encoding
+        self._replace_metadata(key, metadata)
+        self._write(path, body)
+
+    # Igual que S3: un put reemplaza también los metadatos
+    def _replace_metadata(self, key, metadata):
+        metadata_path = self._metadata_path(key)
+        if metadata:
+            self._write(metadata_path, json.dumps(metadata).encode("utf-8"))
+        elif os.path.exists(metadata_path):
+            os.remove(metadata_path)
+
+    def open_writer(self, key, content_type=None, metadata=None, content_encoding=None):
+        return LocalStreamWriter(self, key, content_type, content_encoding, metadata)
+
+    def get(self, key):
+        return self.get_with_etag(key)[0]
+
+    def get_with_etag(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                body = f.read()
+                # Del archivo abierto: el ETag corresponde a lo que se leyó aunque otro proceso lo reemplace
+                etag = _local_etag(os.fstat(f.fileno()))
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            record_request("GetObject")
+            raise StorageKeyNotFound(key)
+        record_request("GetObject", received=len(body))
+        return body, etag
+
+    # Candado de una clave entre hilos y procesos: flock sobre .metadata/{clave}.lock. El sistema lo libera si el
+    # proceso termina, así que nunca queda un candado viejo que haya que romper. El archivo no se borra (otro
+    # proceso podría estar esperando sobre él). Devuelve el descriptor para _release_lock
+    def _acquire_lock(self, key):
+        lock_path = self._metadata_path(key)[:-len(".json")] + self.LOCK_SUFFIX
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def _release_lock(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    # Igual que en S3: la comparación del ETag y el reemplazo se hacen bajo un candado de la clave
+    def put_if(self, key, body, etag, content_type=None, content_encoding=None):
+        path = self._path(key)
+        lock = self._acquire_lock(key)
+        try:
+            current = _local_etag(os.stat(path)) if os.path.isfile(path) else None
+            if current != etag:
+                record_request("PutObject", sent=len(body))
+                raise StoragePreconditionFailed(key)
+            self.put(key, body, content_type=content_type, content_encoding=content_encoding)
+        finally:
+            self._release_lock(lock)
+
+    def delete(self, key):
+        record_request("DeleteObject")
+        for path in (self._path(key), self._metadata_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _describe(self, key, path):
+        stat = os.stat(path)
+        return {"Key": key, "Size": stat.st_size,
+                "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                "ETag": _local_etag(stat)}
+
+    # Igual que S3: el prefijo es un texto, no una carpeta ("01-03" incluye "01-03-2025/..."),
+    # y las claves se devuelven en orden lexicográfico
+    def list(self, prefix=""):
+        base = prefix.rsplit("/", 1)[0] if "/" in prefix else ""
+        start = os.path.join(self.root, *base.split("/")) if base else self.root
+        keys = []
+        for dirpath, dirnames, filenames in os.walk(start):
+            if dirpath == self.root and self.METADATA_DIR in dirnames:
+                dirnames.remove(self.METADATA_DIR)
+            relative = os.path.relpath(dirpath, self.root)
+            for filename in filenames:
+                if filename.endswith(self.TEMP_SUFFIX):
+                    continue
+                key = filename if relative == "." else "/".join(relative.split(os.sep) + [filename])
+                if key.startswith(prefix):
+                    keys.append(key)
+        keys.sort(key=lambda k: k.encode("utf-8"))
+        # Se cuenta como los pedidos que haría S3: una página cada 1000 claves (al menos una)
+        if not keys:
+            record_request("ListObjectsV2")
+        for number, key in enumerate(keys):
+            if number % 1000 == 0:
+                record_request("ListObjectsV2")
+            yield self._describe(key, self._path(key))
+
+    def head(self, key):
+        record_request("HeadObject")
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        metadata = {}
+        if os.path.exists(self._metadata_path(key)):
+            with open(self._metadata_path(key), encoding="utf-8") as f:
+                metadata = json.load(f)
+        content_encoding = metadata.pop("Content-Encoding", None)
+        return dict(self._describe(key, path), ContentType=None, ContentEncoding=content_encoding, Metadata=metadata)
+
+# Función para crear el almacenamiento configurado ("s3" o "local").
+# client_factory crea el cliente de boto3 en el primer pedido (con "local" nunca se crea ni hacen falta credenciales)
+def open_storage(opciones, bucket_name, client_factory):
+    if opciones.get("almacenamiento", "s3") == "local":
+        return LocalStorage(opciones["carpeta_local"])
+    return S3Storage(None, bucket_name, client_factory=client_factory)
@@ -0,0 +1,22 @@
+import json
+import os
+import sys
+import tempfile
+
+# Los módulos de la app están en la raíz del repositorio
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# app.py y app_vendedores.py leen la configuración al importarse: se usa almacenamiento local en una carpeta temporal
+_tmp = tempfile.mkdtemp(prefix="tableros-tests-")
+_config = os.path.join(_tmp, "config.json")
+with open(_config, "w") as f:
+    json.dump({
+        "almacenamiento": "local",
+        "carpeta_local": os.path.join(_tmp, "almacenamiento"),
+        "registrar_metricas": False,
+        "cache_disco_carpeta": os.path.join(_tmp, "cache"),
+        "cola_archivo": os.path.join(_tmp, "cola", "ingesta.sqlite3"),
+    }, f)
+os.environ["TABLEROS_CONFIG"] = _config
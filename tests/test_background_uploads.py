@@ -0,0 +1,62 @@
+import threading
+import pandas as pd
+from storage import LocalStorage
+from background_uploads import commit_upload, list_pending_keys, pending_key, committed_key
+from compaction import list_upload_keys
+from reporting import list_period_uploads
+from metrics import UploadMetrics, stage, set_upload_status, hand_off
+
+PERIODO = "01-09-2026"
+
+def put_csv(storage, key):
+    storage.put(key, pd.DataFrame({"CUIL": ["201"]}).to_csv(index=False).encode("utf-8"))
+    return True
+
+def test_readers_skip_uploads_until_committed(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    visible = f"{PERIODO}/2026-09-05_10-00-00_05-09-2026+Sucursal+Ana.csv"
+    put_csv(storage, visible)
+    key = f"{PERIODO}/2026-09-05_11-00-00_05-09-2026+Sucursal+Beto.csv"
+    seen = {}
+
+    def write():
+        put_csv(storage, key)
+        # La carga todavía no se confirmó: los lectores no ven su archivo
+        seen["pendientes"] = list_pending_keys(storage)
+        seen["compactacion"] = list_upload_keys(storage, PERIODO)
+        seen["reportes"] = [entry["clave"] for entry in list_period_uploads(storage, PERIODO)]
+        return True
+
+    assert commit_upload(storage, "carga", "archivo.xlsx", {key: write}) is not None
+    assert seen == {"pendientes": {key}, "compactacion": [visible], "reportes": [visible]}
+    assert storage.head(pending_key("carga")) is None and storage.head(committed_key("carga")) is not None
+    assert list_upload_keys(storage, PERIODO) == [visible, key]
+
+def test_failed_upload_removes_written_files(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    ok_key, bad_key = f"{PERIODO}/a.csv", f"{PERIODO}/b.csv"
+    assert commit_upload(storage, "carga", "archivo.xlsx", {ok_key: lambda: put_csv(storage, ok_key), bad_key: lambda: False}) is None
+    assert list(storage.list(PERIODO)) == [] and list_pending_keys(storage) == set()
+
+def test_background_part_is_recorded_once():
+    records = []
+    release = threading.Event()
+    with UploadMetrics("archivo.xlsx", "vendedores", records.append) as metrics:
+        with stage("validar"):
+            pass
+        set_upload_status("validado")
+
+        def save():
+            release.wait()
+            with stage("subida"):
+                set_upload_status("subido")
+        thread = threading.Thread(target=hand_off(save))
+        thread.start()
+    # El bloque terminó pero el guardado sigue: todavía no se registra nada
+    assert records == []
+    release.set()
+    thread.join()
+    assert len(records) == 1
+    assert records[0]["estado"] == "subido"
+    assert [s["etapa"] for s in records[0]["etapas"]] == ["validar", "subida"]
+    assert metrics.total_seconds >= 0
@@ -0,0 +1,21 @@
+import pandas as pd
+from csv_objects import write_csv_object, read_csv_object, GZIP_MAGIC
+from storage import LocalStorage
+
+DF = pd.DataFrame({"CUIL": ["20123456786", "27123456780"], "Ponderacion": [0.4, 0.6]})
+
+def test_plain_csv_by_default(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    write_csv_object(storage, "01-09-2026/a.csv", DF)
+    body = storage.get("01-09-2026/a.csv")
+    assert body[:2] != GZIP_MAGIC
+    assert storage.head("01-09-2026/a.csv")["ContentEncoding"] is None
+    assert read_csv_object(body, dtype={"CUIL": str}).equals(DF)
+
+def test_compressed_csv_is_marked_with_content_encoding(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    write_csv_object(storage, "01-09-2026/a.csv", DF, compress=True)
+    body = storage.get("01-09-2026/a.csv")
+    assert body[:2] == GZIP_MAGIC
+    assert storage.head("01-09-2026/a.csv")["ContentEncoding"] == "gzip"
+    assert read_csv_object(body, dtype={"CUIL": str}).equals(DF)
@@ -0,0 +1,111 @@
+import json
+import threading
+import pandas as pd
+import pytest
+import app
+from storage import LocalStorage
+
+@pytest.fixture
+def periodo(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "storage", LocalStorage(str(tmp_path / "almacenamiento")))
+    monkeypatch.setattr(app, "object_cache", None)
+    return "01-09-2026"
+
+# Guarda un tablero del período con un CUIL por fila
+def put_tablero(periodo, stamp, lider, cuils):
+    df = pd.DataFrame({"CUIL": cuils, "Nombre Lider": lider, "Fecha Horario Subida": "05/09/2026_10:00:00"})
+    key = f"{periodo}/{stamp}_05-09-2026+Sucursal+{lider}.csv"
+    app.storage.put(key, df.to_csv(index=False).encode("utf-8"))
+    return key, df
+
+def test_concurrent_updates_keep_every_upload(periodo):
+    uploads = [put_tablero(periodo, f"2026-09-05_10-00-{n:02d}", f"Lider {n}", [f"20{n:02d}"]) for n in range(8)]
+
+    threads = [threading.Thread(target=app.update_cuil_index, args=(periodo, df, key)) for key, df in uploads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    index, _ = app.load_cuil_index(periodo)
+    assert sorted(index["fuentes"]) == sorted(key for key, _ in uploads)
+    assert {cuil: entry["lider"] for cuil, entry in index["cuils"].items()} == {f"20{n:02d}": f"Lider {n}" for n in range(8)}
+
+def test_conflicting_write_is_retried(periodo, monkeypatch):
+    key_a, df_a = put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    key_b, df_b = put_tablero(periodo, "2026-09-05_10-00-01", "Beto", ["202"])
+    app.update_cuil_index(periodo, df_a, key_a)
+
+    # Entre la lectura y la escritura otra carga registra su tablero: la primera escritura falla y se reintenta
+    original = app.save_cuil_index
+    def save_after_other_upload(fecha_carpeta, index, etag):
+        monkeypatch.setattr(app, "save_cuil_index", original)
+        app.update_cuil_index(periodo, df_b, key_b)
+        original(fecha_carpeta, index, etag)
+    monkeypatch.setattr(app, "save_cuil_index", save_after_other_upload)
+    app.update_cuil_index(periodo, df_a.assign(CUIL="203"), key_a)
+
+    index, _ = app.load_cuil_index(periodo)
+    assert set(index["cuils"]) == {"201", "202", "203"}
+
+def test_duplicate_check_reads_only_the_index(periodo, monkeypatch):
+    key_a, df_a = put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    app.update_cuil_index(periodo, df_a, key_a)
+    monkeypatch.setattr(app.storage, "list", lambda prefix="": pytest.fail(f"se listó '{prefix}'"))
+    assert app.check_for_duplicates("201", "05-09-2026", "Beto") == (True, "Ana", "201")
+
+def test_failed_update_marks_the_index_for_a_scan(periodo, monkeypatch):
+    key_a, df_a = put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    app.update_cuil_index(periodo, df_a, key_a)
+    # El tablero se guardó pero el índice no se pudo actualizar
+    key_b, df_b = put_tablero(periodo, "2026-09-05_10-00-01", "Beto", ["202"])
+    def fail(*args, **kwargs):
+        raise RuntimeError("sin conexión")
+    with monkeypatch.context() as patch:
+        patch.setattr(app, "modify_cuil_index", fail)
+        app.update_cuil_index(periodo, df_b, key_b)
+
+    assert app.check_for_duplicates("202", "05-09-2026", "Ana") == (True, "Beto", "202")
+    index, _ = app.load_cuil_index(periodo)
+    assert not app.cuil_index_needs_scan(index) and set(index["cuils"]) == {"201", "202"}
+
+def test_reconcile_finds_uploads_missing_from_the_index(periodo):
+    key_a, df_a = put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    app.update_cuil_index(periodo, df_a, key_a)
+    assert app.reconcile_cuil_index(periodo) == []
+    # Un tablero que quedó guardado sin registrarse en el índice
+    key_b, _ = put_tablero(periodo, "2026-09-05_10-00-01", "Beto", ["202"])
+
+    assert app.reconcile_cuil_index(periodo) == [key_b]
+    index, _ = app.load_cuil_index(periodo)
+    assert "202" in index["cuils"]
+    assert app.reconcile_cuil_index(periodo) == []
+
+def test_unreadable_csv_does_not_leave_the_index_incomplete(periodo, monkeypatch):
+    put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    roto = f"{periodo}/2026-09-05_10-00-01_05-09-2026+Sucursal+Roto.csv"
+    app.storage.put(roto, b"\x1f\x8b\x08 no es gzip")
+
+    assert app.reconcile_cuil_index(periodo) != []
+    index, _ = app.load_cuil_index(periodo)
+    assert index["ignorados"] == [roto] and set(index["cuils"]) == {"201"}
+    # Ya no se vuelve a recorrer el período
+    monkeypatch.setattr(app, "scan_cuil_index", lambda fecha_carpeta: pytest.fail("se recorrió el período"))
+    assert app.reconcile_cuil_index(periodo) == []
+
+def test_previous_index_format_is_rebuilt(periodo):
+    put_tablero(periodo, "2026-09-05_10-00-00", "Ana", ["201"])
+    legacy = {"201": {"lider": "Otro", "archivo": "x", "subida": None}}
+    app.storage.put(app.cuil_index_key(periodo), json.dumps(legacy).encode("utf-8"))
+
+    assert app.check_for_duplicates("201", "05-09-2026", "Ana") == (False, None, None)
+    index, _ = app.load_cuil_index(periodo)
+    assert index["cuils"]["201"]["lider"] == "Ana"
+
+def test_older_upload_does_not_replace_newer_entry(periodo):
+    key_old, df_old = put_tablero(periodo, "2026-09-05_09-00-00", "Ana", ["201"])
+    key_new, df_new = put_tablero(periodo, "2026-09-05_10-00-00", "Beto", ["201"])
+    app.update_cuil_index(periodo, df_new, key_new)
+    app.update_cuil_index(periodo, df_old, key_old)
+    index, _ = app.load_cuil_index(periodo)
+    assert index["cuils"]["201"]["lider"] == "Beto"
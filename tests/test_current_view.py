@@ -0,0 +1,66 @@
+import threading
+import pandas as pd
+import pytest
+import current_view
+from current_view import update_current_view, read_current_view, current_view_key, SOURCE_COLUMN
+from storage import LocalStorage, StoragePreconditionFailed
+
+PERIODO = "01-09-2026"
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path))
+
+def tablero(stamp, lider, cuils):
+    df = pd.DataFrame({"CUIL": cuils, "Nombre Lider": lider, "Fecha Horario Subida": f"05/09/2026_{stamp}"})
+    return df, f"{PERIODO}/2026-09-05_{stamp.replace(':', '-')}_05-09-2026+Sucursal+{lider}.csv"
+
+def view_sources(storage):
+    view = read_current_view(storage, PERIODO)
+    return dict(zip(view["CUIL"], view[SOURCE_COLUMN]))
+
+def test_concurrent_updates_keep_every_upload(storage):
+    uploads = [tablero(f"10:00:{n:02d}", f"Lider {n}", [f"20{n:02d}"]) for n in range(8)]
+    threads = [threading.Thread(target=update_current_view, args=(storage, PERIODO, df, key)) for df, key in uploads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert view_sources(storage) == {df["CUIL"][0]: key for df, key in uploads}
+
+def test_conflicting_write_is_retried(storage, monkeypatch):
+    df_a, key_a = tablero("10:00:00", "Ana", ["201", "202"])
+    df_b, key_b = tablero("11:00:00", "Beto", ["202", "203"])
+    update_current_view(storage, PERIODO, df_a, key_a)
+
+    # Entre la lectura y la escritura otra carga actualiza la vista: la escritura falla y se reintenta
+    original = storage.put_if
+    calls = []
+    def put_if(key, body, etag, **kwargs):
+        calls.append(etag)
+        if len(calls) == 1:
+            storage.put(key, storage.get(key))
+        return original(key, body, etag, **kwargs)
+    monkeypatch.setattr(storage, "put_if", put_if)
+    monkeypatch.setattr(current_view, "VIEW_RETRY_WAIT", 0)
+
+    assert update_current_view(storage, PERIODO, df_b, key_b) == 3
+    assert len(calls) == 2 and calls[0] != calls[1]
+    assert view_sources(storage) == {"201": key_a, "202": key_b, "203": key_b}
+
+def test_gives_up_after_the_last_attempt(storage, monkeypatch):
+    def put_if(key, body, etag, **kwargs):
+        raise StoragePreconditionFailed(key)
+    monkeypatch.setattr(storage, "put_if", put_if)
+    monkeypatch.setattr(current_view, "VIEW_RETRY_WAIT", 0)
+    df, key = tablero("10:00:00", "Ana", ["201"])
+    with pytest.raises(RuntimeError):
+        update_current_view(storage, PERIODO, df, key)
+    assert storage.head(current_view_key(PERIODO)) is None
+
+def test_first_update_builds_the_view_from_earlier_uploads(storage):
+    df_a, key_a = tablero("10:00:00", "Ana", ["201"])
+    storage.put(key_a, df_a.to_csv(index=False).encode("utf-8-sig"))
+    df_b, key_b = tablero("11:00:00", "Beto", ["202"])
+    update_current_view(storage, PERIODO, df_b, key_b)
+    assert view_sources(storage) == {"201": key_a, "202": key_b}
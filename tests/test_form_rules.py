@@ -0,0 +1,50 @@
+import pandas as pd
+from form_rules import TABLERO_RULES, VENDEDORES_RULES, cell_position
+
+def form(b=("Asesor", "20300000001", "Segmento A", "Zona Norte"), k=(2, 4.5, 1.5, 1000, 0), columns=11):
+    rows = []
+    for n in range(5):
+        row = [None] * columns
+        row[0] = f"Etiqueta {n + 1}"
+        if n < len(b):
+            row[1] = b[n]
+        if columns > 10:
+            row[9] = f"Extra {n + 1}"
+            row[10] = k[n]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def test_cell_position():
+    assert cell_position("B2") == (1, 1)
+    assert cell_position("K5") == (4, 10)
+    assert cell_position("AA1") == (0, 26)
+
+def test_valid_forms_have_no_errors():
+    assert TABLERO_RULES.validate({"Hoja 1": form(), "Hoja 2": form(k=(None,) * 5)}) == {}
+
+def test_every_error_of_every_sheet_is_reported():
+    report = TABLERO_RULES.validate({
+        "Bien": form(),
+        "Mal": form(b=("Asesor", "20-ABC-1", None, "Zona"), k=(2.5, "dos", 1, 3, 4)),
+    })
+    assert report == {"Mal": [
+        "Error: La celda B2 en la hoja 'Mal' debe contener 11 números.",
+        "Error: La celda B3 en la hoja 'Mal' está vacía.",
+        "Error: La celda K1 en la hoja 'Mal' debe contener un número entero.",
+        "Error: La celda K2 en la hoja 'Mal' debe contener solo números.",
+    ]}
+
+def test_cells_outside_the_sheet_are_a_structural_error():
+    # Sin la columna K y con solo 3 filas: no son celdas vacías (que K acepta), falta el formulario
+    sheet = form(columns=10).iloc[:3]
+    assert TABLERO_RULES.validate({"Corta": sheet}) == {"Corta": [
+        "Error: La hoja 'Corta' no tiene el formulario completo: faltan las celdas B4, K1, K2, K3, K4, K5.",
+    ]}
+
+def test_vendedores_rules_skip_resumen_rrhh():
+    vendedor = pd.DataFrame([["CUIL", "20300000001"], ["Segmento", "Vendedor 0km"]])
+    sin_cuil = pd.DataFrame([["CUIL", None], ["Segmento", "Vendedor 0km"]])
+    resumen = pd.DataFrame([["Resumen de liquidación", None]])
+    assert VENDEDORES_RULES.validate({"Vendedor 1": vendedor, "Resumen RRHH": resumen}) == {}
+    assert VENDEDORES_RULES.validate({"Vendedor 1": sin_cuil}) == {
+        "Vendedor 1": ["Error: La celda B1 en la hoja 'Vendedor 1' debe contener un CUIL válido (11 dígitos)."]}
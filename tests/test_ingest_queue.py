@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+import time
+import ingest_queue
+from ingest_queue import IngestQueue, IngestWorkers, QUEUED, RUNNING
+
+def make_queue(tmp_path):
+    return IngestQueue(str(tmp_path / "cola" / "ingesta.sqlite3"))
+
+def test_claim_takes_oldest_and_positions_follow_submission(tmp_path):
+    queue = make_queue(tmp_path)
+    ids = [queue.submit(f"{n}.xlsx", b"x") for n in range(3)]
+    assert [queue.status(ids)[job_id]["posicion"] for job_id in ids] == [1, 2, 3]
+
+    job = queue.claim()
+    assert job["id"] == ids[0] and job["contenido"] == b"x"
+    statuses = queue.status(ids)
+    assert statuses[ids[0]]["estado"] == RUNNING and statuses[ids[0]]["posicion"] is None
+    assert [statuses[job_id]["posicion"] for job_id in ids[1:]] == [1, 2]
+    assert queue.counts() == {QUEUED: 2, RUNNING: 1}
+
+def test_each_job_is_claimed_once(tmp_path):
+    queue = make_queue(tmp_path)
+    ids = {queue.submit(f"{n}.xlsx", b"x") for n in range(20)}
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(ids)
+
+def test_stale_running_job_is_requeued(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("a.xlsx", b"x")
+    assert queue.claim()["id"] == job_id
+    # Mientras no pase STALE_SECONDS el trabajo sigue tomado
+    assert queue.claim() is None
+    later = time.time() + ingest_queue.STALE_SECONDS + 1
+    monkeypatch.setattr(ingest_queue.time, "time", lambda: later)
+    assert queue.claim()["id"] == job_id
+
+def test_long_job_with_heartbeat_is_not_requeued(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_queue, "HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(ingest_queue, "STALE_SECONDS", 0.3)
+    queue = make_queue(tmp_path)
+    calls = []
+    release = threading.Event()
+
+    def process(archivo, contenido, subir_ajustes):
+        calls.append(archivo)
+        release.wait(10)
+        return {"estado": "subido"}
+
+    workers = IngestWorkers(queue, process, workers=2)
+    job_id = workers.submit("grande.xlsx", b"x")
+    while not calls:
+        time.sleep(0.01)
+    # El trabajo tarda varias veces STALE_SECONDS: otro proceso que consulta la cola no lo vuelve a tomar
+    deadline = time.time() + 1.2
+    while time.time() < deadline:
+        assert queue.claim() is None
+        time.sleep(0.05)
+    release.set()
+    while queue.status([job_id])[job_id]["estado"] == RUNNING:
+        time.sleep(0.02)
+    assert calls == ["grande.xlsx"] and queue.status([job_id])[job_id]["estado"] == "subido"
+
+def test_database_without_heartbeat_column_is_upgraded(tmp_path):
+    path = tmp_path / "vieja.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(ingest_queue.SCHEMA.replace("    latido REAL,\n", ""))
+    queue = IngestQueue(str(path))
+    job_id = queue.submit("a.xlsx", b"x")
+    assert queue.claim()["id"] == job_id
+
+def test_finish_keeps_workbook_only_for_pending_adjustment(tmp_path):
+    queue = make_queue(tmp_path)
+    ajuste, subido = queue.submit("a.xlsx", b"a"), queue.submit("b.xlsx", b"b")
+    queue.claim(), queue.claim()
+    queue.finish(ajuste, {"estado": "ajuste_pendiente"})
+    queue.finish(subido, {"estado": "subido"})
+    with sqlite3.connect(queue.path) as conn:
+        contenido = dict(conn.execute("SELECT id, contenido IS NOT NULL FROM trabajos").fetchall())
+    assert contenido == {ajuste: 1, subido: 0}
+
+    nuevo = queue.submit_adjustment(ajuste)
+    assert queue.status([ajuste])[ajuste]["estado"] == "descartado"
+    job = queue.claim()
+    assert job["id"] == nuevo and job["subir_ajustes"] and job["contenido"] == b"a"
+
+def test_workers_process_jobs_and_record_errors(tmp_path):
+    queue = make_queue(tmp_path)
+
+    def process(archivo, contenido, subir_ajustes):
+        if archivo == "roto.xlsx":
+            raise ValueError("roto")
+        return {"estado": "subido", "mensajes": []}
+
+    workers = IngestWorkers(queue, process, workers=2)
+    ids = [workers.submit("a.xlsx", b"a"), workers.submit("roto.xlsx", b"b")]
+    deadline = time.time() + 10
+    while time.time() < deadline and any(s["estado"] in (QUEUED, RUNNING) for s in queue.status(ids).values()):
+        time.sleep(0.02)
+    statuses = queue.status(ids)
+    assert statuses[ids[0]]["estado"] == "subido"
+    assert statuses[ids[1]]["estado"] == "error"
+    assert "roto" in statuses[ids[1]]["resultado"]["mensajes"][0]
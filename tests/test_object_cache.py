@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from object_cache import ObjectCache, cached_frame
+from csv_objects import read_csv_object
+from storage import LocalStorage
+
+KEY = "01-09-2026/a.csv"
+
+def decode(body):
+    return read_csv_object(body, dtype={"CUIL": str})
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path / "almacenamiento"))
+    storage.put(KEY, b"CUIL,Nombre Lider\n201,Ana\n")
+    return storage
+
+@pytest.fixture
+def cache(tmp_path):
+    return ObjectCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+
+def test_unchanged_object_is_not_downloaded_again(storage, cache, monkeypatch):
+    first = cached_frame(cache, storage, KEY, "v", decode)
+    monkeypatch.setattr(storage, "get", lambda key: pytest.fail("se volvió a descargar"))
+    pd.testing.assert_frame_equal(cached_frame(cache, storage, KEY, "v", decode), first)
+    assert cache.stats()["aciertos"] == 1 and cache.stats()["fallos"] == 1
+
+def test_changed_etag_invalidates_the_entry(storage, cache):
+    cached_frame(cache, storage, KEY, "v", decode)
+    storage.put(KEY, b"CUIL,Nombre Lider\n201,Beto\n")
+    assert cached_frame(cache, storage, KEY, "v", decode)["Nombre Lider"].tolist() == ["Beto"]
+    # Con el ETag del listado pasa lo mismo
+    [obj] = storage.list("01-09-2026/")
+    assert cached_frame(cache, storage, KEY, "v", decode, etag=obj["ETag"])["Nombre Lider"].tolist() == ["Beto"]
+    assert cache.stats()["fallos"] == 2
+
+def test_variants_and_columns(storage, cache):
+    cached_frame(cache, storage, KEY, "v", decode)
+    assert cached_frame(cache, storage, KEY, "v", decode, columns=["CUIL", "Falta"]).columns.tolist() == ["CUIL"]
+    cached_frame(cache, storage, KEY, "otra", decode)
+    assert cache.stats()["fallos"] == 2
+
+def test_entries_are_evicted_over_the_limit(storage, tmp_path):
+    cache = ObjectCache(str(tmp_path / "chica"), 1)
+    cached_frame(cache, storage, KEY, "v", decode)
+    assert cache.stats()["entradas"] == 0 and cache.stats()["bytes_en_disco"] == 0
+
+def test_entries_survive_a_restart(storage, cache, tmp_path, monkeypatch):
+    cached_frame(cache, storage, KEY, "v", decode)
+    reopened = ObjectCache(cache.directory, cache.max_bytes)
+    monkeypatch.setattr(storage, "get", lambda key: pytest.fail("se volvió a descargar"))
+    assert cached_frame(reopened, storage, KEY, "v", decode)["CUIL"].tolist() == ["201"]
@@ -0,0 +1,42 @@
+import multiprocessing
+import threading
+import pytest
+from parallel_sheets import map_sheets_in_pool
+
+pytestmark = pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="el pool usa fork")
+
+# Hoja de prueba: devuelve el nombre del libro, la hoja y la etiqueta recibida; la hoja "mala" no es válida
+def fake_process_sheet(excel_data, sheet_name, tag):
+    return (excel_data["nombre"], sheet_name, tag, sheet_name != "mala")
+
+def test_results_in_sheet_order():
+    libro = {"nombre": "A"}
+    sheets = [f"h{i}" for i in range(8)]
+    results = map_sheets_in_pool(fake_process_sheet, libro, sheets, ("a",), max_workers=3)
+    assert [result[1] for result, _, _, _ in results] == sheets
+    assert {result[0] for result, _, _, _ in results} == {"A"}
+
+def test_stops_after_first_invalid_sheet():
+    sheets = ["h0", "h1", "mala", "h3", "h4", "h5"]
+    results = map_sheets_in_pool(fake_process_sheet, {"nombre": "A"}, sheets, ("a",), max_workers=2)
+    assert [result[1] for result, _, _, _ in results][-1] == "mala"
+
+def test_concurrent_calls_keep_their_own_workbook():
+    outputs = {}
+
+    def run(nombre):
+        for _ in range(3):
+            sheets = [f"{nombre}{i}" for i in range(8)]
+            results = map_sheets_in_pool(fake_process_sheet, {"nombre": nombre}, sheets, (nombre.lower(),), max_workers=2)
+            outputs.setdefault(nombre, []).extend(result for result, _, _, _ in results)
+
+    threads = [threading.Thread(target=run, args=(nombre,)) for nombre in ("A", "B")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for nombre in ("A", "B"):
+        assert len(outputs[nombre]) == 24
+        assert all(libro == nombre and sheet.startswith(nombre) and tag == nombre.lower()
+                   for libro, sheet, tag, _ in outputs[nombre])
@@ -0,0 +1,18 @@
+from io import BytesIO
+import pandas as pd
+import pyarrow.parquet as pq
+from parquet_output import dataframe_to_parquet
+
+def schema(df):
+    return pq.read_schema(BytesIO(dataframe_to_parquet(df)))
+
+def test_files_share_the_schema_of_known_columns():
+    numeros = pd.DataFrame({"CUIL": ["201"], "Resultado": [0.8], "% Logro": [95], "Ponderacion": [0.5]})
+    texto = pd.DataFrame({"CUIL": ["202"], "Resultado": ["S/D"], "% Logro": [None], "Ponderacion": ["0,5"]})
+    assert schema(numeros) == schema(texto)
+    assert str(schema(texto).field("Resultado").type) == "double"
+
+def test_values_that_are_not_numbers_are_left_empty():
+    df = pd.read_parquet(BytesIO(dataframe_to_parquet(pd.DataFrame({"Resultado": ["S/D", "12.5"]}))))
+    assert df["Resultado"].isna().tolist() == [True, False]
+    assert df["Resultado"].iloc[1] == 12.5
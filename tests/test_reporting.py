@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+from reporting import list_period_uploads, query_tableros
+from storage import LocalStorage
+
+PERIODO = "01-09-2026"
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    put_tablero(storage, "2026-09-05_10-00-00", "Centro", "Ana", {"201": "Asesor", "202": "Asesor"})
+    # Después el CUIL 201 pasa a otro líder y a otro cargo
+    put_tablero(storage, "2026-09-20_10-00-00", "Norte", "Beto", {"201": "Gerente"})
+    return storage
+
+def put_tablero(storage, stamp, sucursal, lider, cargos):
+    dia, hora = stamp.split("_")
+    df = pd.DataFrame({"CUIL": list(cargos), "Cargo": list(cargos.values()), "Nombre Lider": lider, "Sucursal": sucursal,
+                       "Ajuste": "NO", "Fecha Horario Subida": f"{'/'.join(reversed(dia.split('-')))}_{hora.replace('-', ':')}"})
+    key = f"{PERIODO}/{stamp}_05-09-2026+{sucursal}+{lider}.csv"
+    storage.put(key, df.to_csv(index=False).encode("utf-8-sig"))
+
+def query(storage, **filtros):
+    df = query_tableros(storage, list_period_uploads(storage, PERIODO), ["CUIL", "Cargo", "Nombre Lider"], filtros, solo_vigentes=True)
+    return sorted(map(tuple, df.astype(str).values.tolist()))
+
+def test_latest_upload_is_chosen_before_filtering(storage):
+    assert query(storage) == [("201", "Gerente", "Beto"), ("202", "Asesor", "Ana")]
+    # El último tablero de 201 es de Gerente: el de Asesor ya no es el vigente
+    assert query(storage, Cargo=["Asesor"]) == [("202", "Asesor", "Ana")]
+    assert query(storage, **{"Nombre Lider": ["Ana"]}) == [("202", "Asesor", "Ana")]
+    assert query(storage, Sucursal=["Norte"]) == [("201", "Gerente", "Beto")]
+
+def test_all_uploads_without_solo_vigentes(storage):
+    df = query_tableros(storage, list_period_uploads(storage, PERIODO), ["CUIL", "Cargo"], {"Cargo": ["Asesor"]})
+    assert sorted(df["CUIL"]) == ["201", "202"]
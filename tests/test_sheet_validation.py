@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+import app
+from error_log import ErrorSink
+from workbook_reader import open_workbook
+from tableros_sinteticos import generate_tablero, tablero_filename
+
+FILENAME = tablero_filename()
+UPLOAD = "05/10/2026_10:00:00"
+
+def run(workbook):
+    with ErrorSink(None, quiet=True) as sink:
+        data, ok = app.process_sheets_until_empty(open_workbook(workbook), FILENAME, UPLOAD)
+    return data, ok, sink.displayed
+
+# Lo que mostraría validar hoja por hoja, como antes de la validación conjunta
+def per_sheet_messages(workbook):
+    excel_data = open_workbook(workbook)
+    with ErrorSink(None, quiet=True) as sink:
+        for sheet_name in excel_data.sheet_names:
+            df, ok = app.process_sheet(excel_data, sheet_name, FILENAME, UPLOAD)
+            if not ok or not app.validate_sheet_rows(df, sheet_name, FILENAME):
+                break
+    return sink.displayed
+
+def test_valid_workbook():
+    data, ok, displayed = run(generate_tablero(3, 4))
+    assert ok and displayed == []
+    assert len(data) == 12 and data['CUIL'].nunique() == 3
+    assert pd.api.types.is_datetime64_any_dtype(data['Ultima Fecha de Actualización'])
+
+@pytest.mark.parametrize("variant", ["ponderacion_cero", "ponderacion_suma", "fecha_formato", "fecha_futura"])
+def test_failing_sheet_is_revalidated_with_the_original_messages(variant):
+    data, ok, displayed = run(generate_tablero(3, 4, variant))
+    assert not ok and data.empty
+    assert displayed and displayed == per_sheet_messages(generate_tablero(3, 4, variant))
+
+def test_only_the_broken_sheet_is_flagged():
+    excel_data = open_workbook(generate_tablero(3, 4, "ponderacion_suma"))
+    frames = {name: app.process_sheet(excel_data, name, FILENAME, UPLOAD)[0] for name in excel_data.sheet_names}
+    failing, _ = app.sheets_failing_validation(pd.concat(frames, names=['Hoja', None]))
+    assert failing == {"Colaborador 1"}
+
+@pytest.mark.parametrize("variant", ["objetivo_texto", "cuil_repetido", "cuil_invalido", "columna_faltante"])
+def test_other_errors_still_stop_the_upload(variant):
+    data, ok, displayed = run(generate_tablero(3, 4, variant))
+    assert not ok and data.empty
+    assert any(kind == "error" for kind, _ in displayed)
@@ -0,0 +1,70 @@
+import builtins
+import pytest
+from storage import LocalStorage, StoragePreconditionFailed
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path))
+
+def test_list_and_head_do_not_read_the_files(storage, monkeypatch):
+    storage.put("01-09-2026/a.csv", b"CUIL\n201\n")
+    opened = []
+    original = builtins.open
+    monkeypatch.setattr(builtins, "open", lambda path, *args, **kwargs: opened.append(path) or original(path, *args, **kwargs))
+    [listed] = storage.list("01-09-2026/")
+    assert storage.head("01-09-2026/a.csv")["ETag"] == listed["ETag"]
+    assert opened == []
+
+def test_etag_matches_across_operations_and_changes_on_write(storage):
+    storage.put("indice.json", b"{}")
+    body, etag = storage.get_with_etag("indice.json")
+    assert etag == storage.head("indice.json")["ETag"] == next(storage.list("indice"))["ETag"]
+    # Mismo contenido y mismo tamaño: igual es otra versión
+    storage.put("indice.json", b"{}")
+    assert storage.head("indice.json")["ETag"] != etag
+
+def test_put_if_rejects_stale_etag(storage):
+    with pytest.raises(StoragePreconditionFailed):
+        storage.put_if("indice.json", b"{}", '"no-existe"')
+    storage.put_if("indice.json", b"{}", None)
+    with pytest.raises(StoragePreconditionFailed):
+        storage.put_if("indice.json", b"{}", None)
+
+    _, etag = storage.get_with_etag("indice.json")
+    storage.put_if("indice.json", b'{"a": 1}', etag)
+    with pytest.raises(StoragePreconditionFailed):
+        storage.put_if("indice.json", b'{"a": 2}', etag)
+    assert storage.get("indice.json") == b'{"a": 1}'
+
+def _increment(root, times):
+    storage = LocalStorage(root)
+    for _ in range(times):
+        while True:
+            body, etag = storage.get_with_etag("contador")
+            try:
+                storage.put_if("contador", str(int(body) + 1).encode(), etag)
+                break
+            except StoragePreconditionFailed:
+                continue
+
+def test_put_if_is_atomic_across_processes_and_threads(storage):
+    import multiprocessing
+    import threading
+    storage.put("contador", b"0")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_increment, args=(storage.root, 25)) for _ in range(4)]
+    workers += [threading.Thread(target=_increment, args=(storage.root, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert storage.get("contador") == b"200"
+
+def test_leftover_lock_file_does_not_block(storage):
+    import os
+    lock_path = storage._metadata_path("indice.json")[:-len(".json")] + storage.LOCK_SUFFIX
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    # Archivo de un proceso que terminó: el candado lo tenía el sistema, no el archivo
+    open(lock_path, "w").close()
+    storage.put_if("indice.json", b"{}", None)
+    assert storage.get("indice.json") == b"{}"
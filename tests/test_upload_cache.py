@@ -0,0 +1,52 @@
+from io import BytesIO
+import pandas as pd
+import app
+from upload_cache import PreparedCache, session_prepared_cache
+from storage import LocalStorage
+from tableros_sinteticos import generate_tablero, tablero_filename
+
+def result(rows):
+    return {"estado": "ajuste_pendiente", "datos": pd.DataFrame({"CUIL": [str(n) for n in range(rows)]})}
+
+def test_least_recently_used_entries_are_dropped():
+    cache = PreparedCache(10 * 1024 * 1024, max_items=2)
+    cache.put("a", "a.xlsx", result(1))
+    cache.put("b", "b.xlsx", result(1))
+    assert cache.get("a", "a.xlsx") is not None
+    cache.put("c", "c.xlsx", result(1))
+    assert cache.get("b", "b.xlsx") is None
+    assert cache.get("a", "a.xlsx") is not None and cache.get("c", "c.xlsx") is not None
+
+def test_size_limit_and_filename_are_respected():
+    cache = PreparedCache(1)
+    cache.put("a", "a.xlsx", result(100))
+    assert cache.get("a", "a.xlsx") is None and cache.total_bytes() == 0
+    cache = PreparedCache(10 * 1024 * 1024)
+    cache.put("a", "a.xlsx", result(1))
+    # Los mismos bytes con otro nombre son otro tablero (el nombre tiene la fecha, la sucursal y el líder)
+    assert cache.get("a", "otro.xlsx") is None
+    cache.discard("a", "a.xlsx")
+    assert cache.get("a", "a.xlsx") is None and cache.total_bytes() == 0
+
+def test_session_cache_is_reused_until_the_limit_changes():
+    session = {}
+    cache = session_prepared_cache(session, 100)
+    assert session_prepared_cache(session, 100) is cache
+    assert session_prepared_cache(session, 200) is not cache
+
+def test_rerun_before_confirming_an_ajuste_does_not_process_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "storage", LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(app, "object_cache", None)
+    monkeypatch.setattr(app.st, "session_state", {})
+    calls = []
+    original = app.prepare_excel
+    monkeypatch.setattr(app, "prepare_excel", lambda *args, **kwargs: calls.append(args[1]) or original(*args, **kwargs))
+
+    # Archivo del mes anterior: queda como ajuste esperando la confirmación (cada clic vuelve a ejecutar la página)
+    filename = tablero_filename()
+    contenido = generate_tablero(2, 3).getvalue()
+    for _ in range(2):
+        app.process_and_upload_excel(BytesIO(contenido), filename)
+    assert calls == [filename]
+    # Sin el clic en "Guardar" no se subió nada
+    assert [obj["Key"] for obj in app.storage.list() if obj["Key"].endswith(".csv") and not obj["Key"].startswith("errores/")] == []
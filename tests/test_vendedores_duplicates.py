@@ -0,0 +1,48 @@
+from datetime import datetime
+import pandas as pd
+import pytest
+import app_vendedores
+from storage import LocalStorage
+
+FECHA = "05-10-2026"
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(app_vendedores, "storage", storage)
+    monkeypatch.setattr(app_vendedores, "object_cache", None)
+    return storage
+
+def put_tablero(storage, key, lider, cuils, fecha=FECHA):
+    df = pd.DataFrame({"CUIL": cuils, "Nombre Lider": lider, "Fecha_Nombre_Archivo": fecha})
+    storage.put(key, df.to_csv(index=False).encode("utf-8-sig"))
+
+def test_lists_only_the_months_of_the_file_date(storage, monkeypatch):
+    listed = []
+    original = storage.list
+    monkeypatch.setattr(storage, "list", lambda prefix="": listed.append(prefix) or original(prefix))
+    app_vendedores.check_for_duplicates(["201"], FECHA, "Ana")
+    assert "" not in listed
+    assert "2026-09-" in listed and "2026-10-" in listed
+
+def test_other_leader_with_same_cuil_is_a_duplicate(storage):
+    put_tablero(storage, f"2026-10-05_10-00-00_{FECHA}+Vendedores Sucursal+Beto.csv", "Beto", ["201", "202"])
+    # Otro mes y el mismo líder no cuentan
+    put_tablero(storage, "2026-09-05_10-00-00_05-09-2026+Vendedores Sucursal+Carla.csv", "Carla", ["203"], "05-09-2026")
+    put_tablero(storage, f"2026-10-05_11-00-00_{FECHA}+Vendedores Sucursal+Ana.csv", "Ana", ["204"])
+
+    assert app_vendedores.check_for_duplicates(["300", "202"], FECHA, "Ana") == (True, "Beto", "202")
+    assert app_vendedores.check_for_duplicates(["203", "204"], FECHA, "Ana") == (False, None, None)
+
+def test_upload_is_blocked_when_another_leader_has_the_cuils(storage, monkeypatch):
+    # Se guarda en el momento, así la segunda carga ya ve la primera
+    monkeypatch.setitem(app_vendedores.opciones, "subir_en_segundo_plano", False)
+    from tableros_sinteticos import generate_tablero
+    # Solo se aceptan archivos del mes en curso
+    fecha = datetime.now().replace(day=1).strftime('%d-%m-%Y')
+    app_vendedores.process_and_upload_excel(generate_tablero(2, vendedores=True), f"{fecha}+Vendedores Sucursal+Ana.xlsx")
+    subidos = [obj["Key"] for obj in storage.list() if app_vendedores.TABLERO_KEY_PATTERN.match(obj["Key"])]
+    assert any(key.endswith("+Ana.csv") for key in subidos)
+
+    app_vendedores.process_and_upload_excel(generate_tablero(2, vendedores=True), f"{fecha}+Vendedores Sucursal+Beto.xlsx")
+    assert [obj["Key"] for obj in storage.list() if app_vendedores.TABLERO_KEY_PATTERN.match(obj["Key"])] == subidos
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+import app
+import app_vendedores
+from error_log import ErrorSink
+from workbook_reader import StreamingWorkbook, open_workbook
+from tableros_sinteticos import INVALID_VARIANTS, generate_tablero, tablero_filename
+
+UPLOAD = "05/10/2026_10:00:00"
+
+def process(module, workbook, lector, *args):
+    filename = tablero_filename(vendedores=bool(args))
+    with ErrorSink(None, quiet=True) as sink:
+        result = module.process_sheets_until_empty(open_workbook(workbook, lector), filename, UPLOAD, *args)
+    return result, sink.displayed
+
+def assert_same_result(expected, actual):
+    (expected, expected_messages), (actual, actual_messages) = expected, actual
+    assert actual_messages == expected_messages
+    assert len(actual) == len(expected)
+    for expected_item, actual_item in zip(expected, actual):
+        if isinstance(expected_item, pd.DataFrame):
+            pd.testing.assert_frame_equal(actual_item, expected_item)
+        else:
+            assert actual_item == expected_item
+
+@pytest.mark.parametrize("variant", [None] + sorted(set(INVALID_VARIANTS) - {"rrhh_faltante"}))
+def test_tableros_match_pandas(variant):
+    expected = process(app, generate_tablero(3, 5, variant), "pandas")
+    assert_same_result(expected, process(app, generate_tablero(3, 5, variant), "streaming"))
+
+@pytest.mark.parametrize("variant", [None, "cuil_invalido", "ponderacion_suma", "fecha_futura", "cuil_repetido"])
+def test_vendedores_match_pandas(variant):
+    expected = process(app_vendedores, generate_tablero(3, 5, variant, vendedores=True), "pandas", True)
+    assert_same_result(expected, process(app_vendedores, generate_tablero(3, 5, variant, vendedores=True), "streaming", True))
+
+def test_form_and_full_sheet_views_match_pandas():
+    workbook = generate_tablero(2, 5, vendedores=True)
+    streaming, excel = StreamingWorkbook(workbook), pd.ExcelFile(generate_tablero(2, 5, vendedores=True))
+    assert streaming.sheet_names == excel.sheet_names
+    pd.testing.assert_frame_equal(streaming.parse("Vendedor 1", header=None, nrows=5),
+                                  excel.parse("Vendedor 1", header=None, nrows=5).iloc[:, :13])
+    pd.testing.assert_frame_equal(streaming.parse("Resumen RRHH", header=1), excel.parse("Resumen RRHH", header=1))
+
+def test_each_sheet_is_read_once():
+    workbook = StreamingWorkbook(generate_tablero(2, 5))
+    for _ in range(2):
+        workbook.parse("Colaborador 1", header=None, nrows=5)
+        workbook.parse("Colaborador 1", header=None)
+    assert workbook.stats["lecturas"] == 2 and workbook.stats["aciertos"] == 2
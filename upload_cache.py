@@ -0,0 +1,65 @@
+import hashlib
+from collections import OrderedDict
+
+# Cache de tableros ya validados, para que al confirmar un Ajuste (que vuelve a ejecutar el script de Streamlit)
+# no se lea, valide y verifique duplicados de nuevo: se sube directamente el resultado ya calculado.
+
+# Función para calcular el hash del contenido del archivo subido (identifica el mismo Excel entre ejecuciones)
+def workbook_hash(file):
+    if hasattr(file, "getvalue"):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.sha256(file.read()).hexdigest()
+    file.seek(position)
+    return digest
+
+# Memoria aproximada de un resultado de prepare_excel (el DataFrame es lo que ocupa)
+def _result_size(result):
+    datos = result.get("datos")
+    if datos is None:
+        return 0
+    return int(datos.memory_usage(deep=True).sum())
+
+# Cache LRU acotada por cantidad de entradas y por memoria; las entradas menos usadas se descartan primero
+class PreparedCache:
+    def __init__(self, max_bytes, max_items=20):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.sizes = {}
+
+    def get(self, content_hash, filename):
+        key = (content_hash, filename)
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, content_hash, filename, result):
+        key = (content_hash, filename)
+        size = _result_size(result)
+        self.discard(content_hash, filename)
+        if size > self.max_bytes:
+            return  # No entra aunque se vacíe la cache
+        self.entries[key] = result
+        self.sizes[key] = size
+        while len(self.entries) > self.max_items or self.total_bytes() > self.max_bytes:
+            oldest, _ = self.entries.popitem(last=False)
+            del self.sizes[oldest]
+
+    def discard(self, content_hash, filename):
+        key = (content_hash, filename)
+        self.entries.pop(key, None)
+        self.sizes.pop(key, None)
+
+    def total_bytes(self):
+        return sum(self.sizes.values())
+
+# Función para obtener la cache de la sesión (una por usuario, se crea la primera vez)
+def session_prepared_cache(session_state, max_bytes, max_items=20, key="tableros_preparados"):
+    cache = session_state.get(key)
+    if cache is None or cache.max_bytes != max_bytes:
+        cache = PreparedCache(max_bytes, max_items)
+        session_state[key] = cache
+    return cache
@@ -0,0 +1,148 @@
+import math
+import time
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+from metrics import current_metrics
+
+# Columnas A:M: formulario (B1:B4, K1:K5, H2:M2) y la tabla de indicadores que empieza en "Tipo Indicador"
+TABLERO_COLUMNS = 13
+INDICATOR_COLUMN = 2
+INDICATOR_HEADER = "Indicadores de Gestion"
+
+# Convierte una celda igual que el lector openpyxl de pandas para que los validadores reciban los mismos valores
+def _convert_cell(cell):
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return math.nan
+    if cell.data_type == TYPE_NUMERIC:
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+def _is_empty(value):
+    return value == "" or (isinstance(value, float) and math.isnan(value))
+
+# Arma la grilla que recibe TextParser a partir de las filas ya convertidas, igual que pandas: con max_col se
+# cortan las columnas, con stop_after_indicators se corta en la primera fila vacía de "Indicadores de Gestion",
+# se quitan las filas vacías al final y se completan las filas al ancho máximo
+def _shape_rows(rows, max_col=None, stop_after_indicators=False):
+    data = []
+    last_row_with_data = -1
+    in_indicators = False
+    for row_number, row in enumerate(rows):
+        converted_row = list(row[:max_col] if max_col else row)
+        indicador = converted_row[INDICATOR_COLUMN] if len(converted_row) > INDICATOR_COLUMN else ""
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+        data.append(converted_row)
+        if stop_after_indicators:
+            if in_indicators and _is_empty(indicador):
+                # La fila vacía se conserva aunque no tenga datos: count_rows_until_empty la usa como corte
+                last_row_with_data = row_number
+                break
+            if indicador == INDICATOR_HEADER:
+                in_indicators = True
+
+    data = data[:last_row_with_data + 1]
+    if data:
+        max_width = max(len(data_row) for data_row in data)
+        data = [data_row + [""] * (max_width - len(data_row)) for data_row in data]
+    return data
+
+# Filas de una hoja leídas hasta ahora. El XML se recorre una sola vez y solo hasta donde lo pidió alguna vista
+class _SheetRows:
+    def __init__(self, sheet):
+        sheet.reset_dimensions()
+        self.rows = []
+        self._iterator = sheet.iter_rows()
+        self.complete = False
+        # Búsqueda incremental del corte de la tabla de indicadores (índice de la fila vacía)
+        self._scanned = 0
+        self._in_indicators = False
+        self.indicator_cut = None
+
+    def scan_indicators(self, max_col):
+        while self.indicator_cut is None and self._scanned < len(self.rows):
+            row = self.rows[self._scanned][:max_col]
+            indicador = row[INDICATOR_COLUMN] if len(row) > INDICATOR_COLUMN else ""
+            if self._in_indicators and _is_empty(indicador):
+                self.indicator_cut = self._scanned
+            elif indicador == INDICATOR_HEADER:
+                self._in_indicators = True
+            self._scanned += 1
+        return self.indicator_cut is not None
+
+    # Lee filas hasta que enough() se cumple o se termina la hoja. Devuelve la cantidad de filas leídas del XML
+    def read_until(self, enough):
+        read = 0
+        while not self.complete and not enough():
+            row = next(self._iterator, None)
+            if row is None:
+                self.complete = True
+                break
+            self.rows.append([_convert_cell(cell) for cell in row])
+            read += 1
+        return read
+
+# Lector de solo lectura que recorre cada hoja en streaming y deja de leer en la primera fila vacía de
+# "Indicadores de Gestion" (el mismo corte que count_rows_until_empty). Se usa en lugar de pd.ExcelFile.
+# Las celdas leídas de cada hoja quedan guardadas: el formulario (nrows), el tablero (header=None) y la hoja
+# completa con encabezado (header=1, por ejemplo "Resumen RRHH") salen de la misma lectura del XML
+class StreamingWorkbook:
+    def __init__(self, file, max_col=TABLERO_COLUMNS):
+        if hasattr(file, "seek"):
+            file.seek(0)
+        self.book = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+        self.sheet_names = self.book.sheetnames
+        self.max_col = max_col
+        self._sheets = {}
+        # aciertos: vistas armadas sin leer el XML; lecturas: vistas que tuvieron que leer filas nuevas
+        self.stats = {"lecturas": 0, "aciertos": 0, "filas_leidas": 0, "segundos_lectura": 0.0}
+
+    def _rows(self, sheet_name, enough):
+        sheet_rows = self._sheets.get(sheet_name)
+        if sheet_rows is None:
+            sheet_rows = self._sheets[sheet_name] = _SheetRows(self.book[sheet_name])
+        start = time.perf_counter()
+        read = sheet_rows.read_until(lambda: enough(sheet_rows))
+        outcome = "lecturas" if read else "aciertos"
+        self.stats[outcome] += 1
+        if read:
+            self.stats["filas_leidas"] += read
+            self.stats["segundos_lectura"] += time.perf_counter() - start
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.count(f"hojas_{outcome}")
+        return sheet_rows
+
+    # Misma interfaz que pd.ExcelFile.parse: header=None lee solo el rango del tablero, otro header lee la hoja completa.
+    # Con nrows se leen solo las primeras filas (por ejemplo, el formulario)
+    def parse(self, sheet_name, header=None, nrows=None):
+        if nrows is not None:
+            sheet_rows = self._rows(sheet_name, lambda rows: len(rows.rows) >= nrows)
+            data = _shape_rows(sheet_rows.rows[:nrows], self.max_col)
+        elif header is None:
+            sheet_rows = self._rows(sheet_name, lambda rows: rows.scan_indicators(self.max_col))
+            data = _shape_rows(sheet_rows.rows, self.max_col, stop_after_indicators=True)
+        else:
+            sheet_rows = self._rows(sheet_name, lambda rows: False)
+            data = _shape_rows(sheet_rows.rows)
+        if not data:
+            return pd.DataFrame()
+        return TextParser(data, header=header, skip_blank_lines=False).read()
+
+    def close(self):
+        self.book.close()
+
+# Función para abrir el Excel con el lector configurado ("streaming" o "pandas")
+def open_workbook(file, lector="streaming"):
+    if lector == "pandas":
+        return pd.ExcelFile(file)
+    return StreamingWorkbook(file)